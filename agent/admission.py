@@ -0,0 +1,215 @@
+"""Deadline-aware admission control with priority classes.
+
+Requests run in at most ``max_concurrent`` slots. When every slot is busy
+they wait in a queue ordered by priority class and then by deadline. Work is
+refused as early as possible: at arrival when the estimated queue wait plus
+service time already overruns the deadline, and again when a slot frees up
+for a request that can no longer finish in time, so expired requests never
+reach the LLM or tools.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .stats import summarize_ms
+
+# Priority classes, most important first
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+
+_QUEUED, _GRANTED, _EXPIRED, _ABANDONED = range(4)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed or expires before it starts.
+
+    ``reason`` is ``"queue_full"``, ``"deadline"`` (shed at arrival because
+    it could not finish in time) or ``"expired"`` (deadline passed, or could
+    no longer be met, while queued).
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionConfig(BaseModel):
+    """Concurrency, queue and deadline settings for admission control"""
+
+    max_concurrent: int = Field(default=16, ge=1)
+    max_queue: int = Field(default=256, ge=0)
+    default_timeout: float = Field(default=30.0, gt=0.0)
+    # Smoothing factor for the service time estimate
+    ewma_alpha: float = Field(default=0.2, gt=0.0, le=1.0)
+    window: int = Field(default=1024, ge=1)
+
+
+class _Waiter:
+    __slots__ = ("level", "deadline", "event", "state")
+
+    def __init__(self, level: int, deadline: float):
+        self.level = level
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.state = _QUEUED
+
+
+class AdmissionController:
+    """Priority queue with deadlines in front of a request handler"""
+
+    def __init__(
+        self,
+        config: Optional[AdmissionConfig] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.config = config or AdmissionConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[int, float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._depth = [0] * len(PRIORITIES)
+        self._service_time: Optional[float] = None
+        self._waits: Deque[float] = deque(maxlen=self.config.window)
+        self._counters = {
+            "admitted": 0,
+            "completed": 0,
+            "rejected_queue_full": 0,
+            "shed_deadline": 0,
+            "expired": 0,
+            "late": 0,
+        }
+
+    def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: str = DEFAULT_PRIORITY,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """Run fn once admitted; raises AdmissionRejected if it cannot start.
+
+        ``deadline`` is an absolute time on the controller's clock; otherwise
+        ``timeout`` (or the configured default) from now is used.
+        """
+        level = self._level(priority)
+        now = self._clock()
+        if deadline is None:
+            deadline = now + (
+                timeout if timeout is not None else self.config.default_timeout
+            )
+
+        waiter = self._admit(level, deadline, now)
+        if waiter is not None:
+            self._wait(waiter)
+        started = self._clock()
+        with self._lock:
+            self._waits.append(started - now)
+            self._counters["admitted"] += 1
+        try:
+            return fn(*args)
+        finally:
+            self._release(started, deadline)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, slot usage, shedding counters and queue wait times"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["active"] = self._active
+            stats["queue_depth"] = sum(self._depth)
+            stats["queue_depth_by_priority"] = dict(zip(PRIORITIES, self._depth))
+            waits = list(self._waits)
+            service = self._service_time
+        stats["queue_wait_ms"] = summarize_ms(waits)
+        stats["service_time_ms"] = 1000.0 * service if service is not None else None
+        stats["max_concurrent"] = self.config.max_concurrent
+        stats["max_queue"] = self.config.max_queue
+        return stats
+
+    @staticmethod
+    def _level(priority: str) -> int:
+        try:
+            return PRIORITIES.index(priority)
+        except ValueError:
+            raise ValueError(
+                f"Unknown priority '{priority}', expected one of {PRIORITIES}"
+            ) from None
+
+    def _admit(self, level: int, deadline: float, now: float) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or enqueue a waiter"""
+        config = self.config
+        with self._lock:
+            queued = sum(self._depth)
+            if self._active < config.max_concurrent and not queued:
+                self._active += 1
+                return None
+            if queued >= config.max_queue:
+                self._counters["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue_full", "Server is overloaded")
+
+            # Requests of equal or higher priority are served first
+            ahead = sum(self._depth[: level + 1])
+            service = self._service_time or 0.0
+            expected_wait = (ahead + 1) * service / config.max_concurrent
+            if now + expected_wait + service > deadline:
+                self._counters["shed_deadline"] += 1
+                raise AdmissionRejected(
+                    "deadline",
+                    f"Request cannot finish before its deadline "
+                    f"(expected wait {expected_wait:.3f}s)",
+                )
+
+            waiter = _Waiter(level, deadline)
+            heapq.heappush(self._heap, (level, deadline, next(self._seq), waiter))
+            self._depth[level] += 1
+            return waiter
+
+    def _wait(self, waiter: _Waiter) -> None:
+        waiter.event.wait(max(0.0, waiter.deadline - self._clock()))
+        with self._lock:
+            if waiter.state == _GRANTED:
+                return
+            if waiter.state == _QUEUED:
+                # Timed out in the queue; the heap entry is skipped lazily
+                waiter.state = _ABANDONED
+                self._depth[waiter.level] -= 1
+                self._counters["expired"] += 1
+        raise AdmissionRejected("expired", "Request deadline expired while queued")
+
+    def _release(self, started: float, deadline: float) -> None:
+        now = self._clock()
+        elapsed = now - started
+        alpha = self.config.ewma_alpha
+        with self._lock:
+            self._counters["completed"] += 1
+            if now > deadline:
+                self._counters["late"] += 1
+            if self._service_time is None:
+                self._service_time = elapsed
+            else:
+                self._service_time += alpha * (elapsed - self._service_time)
+
+            self._active -= 1
+            while self._heap:
+                _, _, _, waiter = heapq.heappop(self._heap)
+                if waiter.state != _QUEUED:
+                    continue
+                self._depth[waiter.level] -= 1
+                if waiter.deadline <= now + self._service_time:
+                    # Drop work that can no longer finish before it reaches
+                    # the LLM
+                    waiter.state = _EXPIRED
+                    self._counters["expired"] += 1
+                    waiter.event.set()
+                    continue
+                waiter.state = _GRANTED
+                self._active += 1
+                waiter.event.set()
+                break
@@ -1,52 +1,343 @@
+import contextlib
 import logging
+import time
+from typing import Any, Dict, NamedTuple, Optional, Union
 
+from . import logs, profiling
+from .answer_cache import AnswerCache, AnswerCacheConfig
+from .batching import BatchConfig
+from .deadline import Deadline
 from .llm import LLMService
+from .memory import MemoryConfig, MemoryTracker
 from .parser import ResponseParser
+from .profiling import Profiler
+from .replay import TraceRecorder
 from .schemas import ToolPlan, ToolResult
+from .sessions import Prompt, PromptPrefixCache, SessionStore
+from .speculation import Speculation, Speculator
+from .telemetry import OK_OUTCOMES, TelemetryConfig, TelemetryLog
 from .tool_registry import ToolRegistry
+from .tools.base import validator_cache_size
 
 logger = logging.getLogger(__name__)
 
 
+class Answer(NamedTuple):
+    """An answer with how it was produced"""
+
+    text: str
+    status: str  # one of telemetry.OUTCOMES
+    tool: Optional[str] = None
+    path: Optional[str] = None  # parse path
+
+    @property
+    def ok(self) -> bool:
+        """False for timeouts, tool failures and internal errors"""
+        return self.status in OK_OUTCOMES
+
+
 class Agent:
     """Main agent class that orchestrates LLM calls and tool execution"""
 
-    def __init__(self, use_fake_llm: bool = True):
-        self.llm_service = LLMService(use_fake_llm=use_fake_llm)
+    def __init__(
+        self,
+        use_fake_llm: bool = True,
+        seed: Optional[int] = None,
+        profiler: Optional[Profiler] = None,
+        session_store: Optional[SessionStore] = None,
+        batching: Optional[BatchConfig] = None,
+        speculate: bool = False,
+        snapshot_path: Optional[str] = None,
+        plugins: bool = False,
+        answer_cache: Optional[AnswerCacheConfig] = None,
+        telemetry: Optional[TelemetryConfig] = None,
+        recorder: Optional[TraceRecorder] = None,
+        memory: Optional[MemoryConfig] = None,
+    ):
+        self.llm_service = LLMService(
+            use_fake_llm=use_fake_llm, seed=seed, batching=batching
+        )
         self.parser = ResponseParser()
         self.tool_registry = ToolRegistry()
+        if plugins:
+            self.tool_registry.load_plugins()
+        # Tool data served from a memory-mapped prebuilt snapshot
+        self.snapshot = (
+            self.tool_registry.load_snapshot(snapshot_path) if snapshot_path else None
+        )
+        self.profiler = profiler if profiler is not None else Profiler.from_env()
+        self.sessions = session_store or SessionStore()
+        self.prompt_prefix = PromptPrefixCache(self.tool_registry.catalog_json)
+        # Prefetch likely tool calls while the LLM call is in flight
+        self.speculator = Speculator(self.tool_registry) if speculate else None
+        # Answers of near-duplicate questions, outside of sessions
+        self.answer_cache = (
+            AnswerCache(answer_cache) if answer_cache is not None else None
+        )
+        # Binary per-request records for capacity planning
+        self.telemetry = TelemetryLog(telemetry) if telemetry is not None else None
+        # Trace of raw LLM responses and tool results for offline replay
+        self.recorder = recorder
+        # Sampled tracemalloc accounting per stage and tool
+        self.memory = MemoryTracker(memory) if memory is not None else None
+
+    def answer(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Answer a question using LLM and tools.
+
+        With a ``session_id`` the question is answered in the context of the
+        earlier turns of that conversation. ``deadline`` (on
+        ``time.monotonic()``) or ``timeout`` (seconds) bounds the request: the
+        remaining budget is passed to the LLM call and the tool, and once it
+        runs out the answer is a timeout error instead of a late result.
+        """
+        return self._run(question, session_id, deadline, timeout, None)
 
-    def answer(self, question: str) -> str:
-        """Answer a question using LLM and tools"""
+    def respond(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> Answer:
+        """Like ``answer``, but also reports whether the request succeeded.
+
+        Failures (timeouts, tool errors, ...) are still answered with an
+        error message, so only the status tells them apart.
+        """
+        outcome = _Outcome()
+        text = self._run(question, session_id, deadline, timeout, outcome)
+        return Answer(text, outcome.status, outcome.tool, outcome.path)
+
+    def _run(
+        self,
+        question: str,
+        session_id: Optional[str],
+        deadline: Optional[float],
+        timeout: Optional[float],
+        outcome: Optional["_Outcome"],
+    ) -> str:
+        budget = Deadline.resolve(deadline, timeout)
+        telemetry, recorder, memory = self.telemetry, self.recorder, self.memory
+        timed = telemetry is not None or recorder is not None
+        if outcome is None and (
+            timed or memory is not None or self.answer_cache is not None
+        ):
+            outcome = _Outcome()
+        started, start = time.time(), time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            stages = stack.enter_context(profiling.timings()) if timed else None
+            sample = stack.enter_context(memory.request()) if memory else None
+            if self.profiler is not None:
+                stack.enter_context(self.profiler.request())
+            result = self._respond(question, session_id, budget, outcome)
+            if session_id is not None:
+                self.sessions.record(session_id, question, result)
+            if sample is not None:
+                sample.tool = outcome.tool
+        if timed:
+            total = time.perf_counter() - start
+            if telemetry is not None:
+                telemetry.record(
+                    question,
+                    total,
+                    stages,
+                    tool=outcome.tool,
+                    path=outcome.path,
+                    outcome=outcome.status,
+                    ts=started,
+                )
+            if recorder is not None:
+                recorder.record(
+                    question, session_id, result, outcome, total, stages, started
+                )
+        return result
+
+    def _respond(
+        self,
+        question: str,
+        session_id: Optional[str],
+        budget: Optional[Deadline],
+        outcome: Optional["_Outcome"] = None,
+    ) -> str:
+        cache = self.answer_cache
+        # Follow-ups depend on the conversation, so sessions bypass the cache
+        if cache is None or session_id is not None:
+            return self._answer(question, session_id, budget, outcome)
+
+        with profiling.stage("cache"):
+            hit = cache.get(question)
+        if hit is not None and not hit.verify:
+            outcome.status, outcome.path = "cache_hit", "cache"
+            return hit.answer
+        result = self._answer(question, None, budget, outcome)
+        if hit is not None:
+            cache.check(hit, result)
+        elif outcome.cacheable:
+            cache.put(question, result, outcome.tool)
+        return result
+
+    def _answer(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        budget: Optional[Deadline] = None,
+        outcome: Optional["_Outcome"] = None,
+    ) -> str:
+        speculation = None
+        if self.speculator is not None:
+            speculation = self.speculator.start(question)
         try:
-            llm_response = self.llm_service.call_llm(question)
+            prompt: Union[str, Prompt] = question
+            if session_id is not None:
+                prompt = self.sessions.build_prompt(
+                    session_id, question, self.prompt_prefix.get(question)
+                )
+            try:
+                with profiling.stage("llm"):
+                    if budget is None:
+                        llm_response = self.llm_service.call_llm(prompt)
+                    else:
+                        llm_response = self.llm_service.call_llm(
+                            prompt, timeout=budget.remaining()
+                        )
+            except TimeoutError:
+                if outcome is not None:
+                    outcome.status = "timeout"
+                return self._format_tool_result(_timeout_result("llm"))
+            if outcome is not None:
+                outcome.response = llm_response
             if llm_response is None:
+                if outcome is not None:
+                    outcome.status = "no_response"
                 return "I'm sorry, I couldn't process your request."
 
             # Parse the response
-            parsed_response = self.parser.parse_response(llm_response)
+            with profiling.stage("parse"):
+                parsed_response, path = self.parser.parse(
+                    llm_response,
+                    backend=self.llm_service.backend_name,
+                    tools=self.tool_registry,
+                )
+            if outcome is not None:
+                outcome.path = path
 
             if isinstance(parsed_response, ToolPlan):
                 # Execute tool
-                return self._execute_tool_plan(parsed_response)
+                return self._execute_tool_plan(
+                    parsed_response, budget, speculation, outcome
+                )
             elif isinstance(parsed_response, str):
+                # A direct answer needs no tool, so it is returned even when
+                # the budget is nearly used up
+                if outcome is not None:
+                    outcome.cacheable = True
+                    outcome.status = "ok"
                 return parsed_response
             else:
+                if outcome is not None:
+                    outcome.status = "unparsed"
                 return "I'm sorry, I couldn't understand the response format."
 
         except Exception as e:
-            logger.error(f"Error processing question '{question}': {e}")
+            logger.error("Error processing question '%s': %s", question, e)
+            if outcome is not None:
+                outcome.status = "error"
             return f"An error occurred while processing your request: {str(e)}"
+        finally:
+            if speculation is not None:
+                speculation.discard()
+
+    def warmup(self) -> None:
+        """Load tool data and indexes so the first request pays no setup cost"""
+        self.tool_registry.warmup()
 
-    def _execute_tool_plan(self, plan: ToolPlan) -> str:
+    def metrics(self) -> Dict[str, Any]:
+        """Runtime metrics from the agent's components"""
+        metrics = {
+            "tools": self.tool_registry.bulkhead_stats(),
+            "parser": self.parser.strategy_stats(self.llm_service.backend_name),
+            "sessions": self.sessions.stats(),
+            "llm": self.llm_service.stats(),
+            "logging": logs.stats(),
+        }
+        if self.speculator is not None:
+            metrics["speculation"] = self.speculator.stats()
+        if self.snapshot is not None:
+            metrics["snapshot"] = self.snapshot.stats()
+        if self.answer_cache is not None:
+            metrics["answer_cache"] = self.answer_cache.stats()
+        if self.telemetry is not None:
+            metrics["telemetry"] = self.telemetry.stats()
+        if self.memory is not None:
+            metrics["memory"] = dict(self.memory.stats(), caches=self.cache_sizes())
+        return metrics
+
+    def cache_sizes(self) -> Dict[str, Any]:
+        """Current size of every cache and buffer the agent holds on to"""
+        sessions = self.sessions.stats()
+        caches: Dict[str, Any] = {
+            "sessions": {
+                "entries": sessions["sessions"],
+                "bytes": sessions["bytes"],
+                "max_bytes": sessions["max_bytes"],
+            },
+            "prompt_prefix": self.prompt_prefix.cache_stats(),
+            "tool_catalog": self.tool_registry.catalog_cache_stats(),
+            "arg_validators": {"entries": validator_cache_size()},
+            "log_queue": {"entries": logs.stats().get("queued", 0)},
+        }
+        if self.answer_cache is not None:
+            caches["answer_cache"] = {
+                "entries": len(self.answer_cache),
+                "max_entries": self.answer_cache.config.capacity,
+            }
+        if self.telemetry is not None:
+            caches["telemetry_pending"] = {"entries": self.telemetry.stats()["pending"]}
+        return caches
+
+    def _execute_tool_plan(
+        self,
+        plan: ToolPlan,
+        budget: Optional[Deadline] = None,
+        speculation: Optional[Speculation] = None,
+        outcome: Optional["_Outcome"] = None,
+    ) -> str:
         """Execute a tool plan and return formatted result"""
-        tool = self.tool_registry.get_tool(plan.tool.value)
+        tool = self.tool_registry.get_tool(plan.tool)
+        if outcome is not None:
+            outcome.plan = plan
 
         if tool is None:
-            return f"Tool '{plan.tool.value}' is not available."
+            if outcome is not None:
+                outcome.status = "unknown_tool"
+            return f"Tool '{plan.tool}' is not available."
 
-        result = tool.execute(plan.args)
-        return self._format_tool_result(result)
+        timeout = budget.remaining() if budget is not None else None
+        result = None
+        if speculation is not None:
+            with profiling.stage("tool"):
+                result = speculation.resolve(tool.name, plan.args, timeout)
+        if result is None:
+            if budget is not None and budget.expired():
+                result = _timeout_result(tool.name)
+            else:
+                with profiling.stage("tool"):
+                    result = self.tool_registry.execute(
+                        tool, plan.args, timeout=timeout
+                    )
+        if outcome is not None:
+            outcome.tool = tool.name
+            outcome.cacheable = result.success
+            outcome.status = "ok" if result.success else _failure_status(result)
+            outcome.result = result
+        with profiling.stage("format"):
+            return self._format_tool_result(result)
 
     def _format_tool_result(self, result: ToolResult) -> str:
         """Format tool result for user display"""
@@ -66,6 +357,36 @@ class Agent:
             return str(result.result)
 
 
+class _Outcome:
+    """How an answer was produced, for caching, telemetry and recording"""
+
+    __slots__ = ("tool", "cacheable", "path", "status", "response", "plan", "result")
+
+    def __init__(self):
+        self.tool: Optional[str] = None
+        self.cacheable = False
+        self.path: Optional[str] = None  # parse path
+        self.status = "error"  # one of telemetry.OUTCOMES
+        self.response: Any = None  # raw LLM response
+        self.plan: Optional[ToolPlan] = None
+        self.result: Optional[ToolResult] = None
+
+
+def _failure_status(result: ToolResult) -> str:
+    error = result.error or ""
+    return "timeout" if "timed out" in error or "out of time" in error else "tool_error"
+
+
+def _timeout_result(stage: str) -> ToolResult:
+    """Fallback result for a request whose budget ran out during ``stage``"""
+    return ToolResult.model_construct(
+        success=False,
+        result="",
+        error=f"Request timed out (out of time in '{stage}')",
+        tool_used=stage,
+    )
+
+
 # For backward compatibility
 def answer(question: str) -> str:
     """Backward compatible function"""
@@ -0,0 +1,303 @@
+"""Semantic answer cache for near-duplicate questions.
+
+Questions are embedded with a hashed bag of words and character trigrams
+(stopwords dropped, so "weather in Paris?" and "Paris weather" embed the
+same) and compared by cosine similarity against a bounded set of recent
+questions. With NumPy installed the vectors are rows of one dense matrix
+scored with a single matrix-vector product; without it an inverted index of
+features is used. A cached answer is only reused when the numbers and
+operators of the two questions match exactly, so "2 + 3" never answers
+"2 + 4".
+
+A small sample of hits is answered again anyway and compared with the cached
+answer; mismatches are counted as false hits and evict the entry, which
+gives a running estimate of how often the threshold is too loose.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .tool_index import terms
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Numbers and arithmetic operators, which must match for a cached answer
+_GUARD = re.compile(r"\d+(?:\.\d+)?|[+\-*/%]")
+
+# Character trigrams count for less than whole words
+_TRIGRAM_WEIGHT = 0.5
+
+# False hits kept for inspection in the stats
+_RECENT_FALSE_HITS = 20
+
+
+class AnswerCacheConfig(BaseModel):
+    """Size, similarity threshold and expiry of the semantic answer cache"""
+
+    capacity: int = Field(default=1024, ge=1)
+    threshold: float = Field(default=0.9, gt=0.0, le=1.0)
+    dim: int = Field(default=1024, ge=16)  # hashed feature space
+    ttl: Optional[float] = Field(default=None, gt=0.0)  # None: no expiry
+    # Per-tool expiry for answers that go stale; 0 disables caching them
+    volatile_ttl: Dict[str, float] = Field(default_factory=lambda: {"weather": 300.0})
+    # Words folded together before embedding
+    synonyms: Dict[str, str] = Field(default_factory=lambda: {"temperature": "weather"})
+    # Fraction of hits answered again to measure false hits
+    sample_rate: float = Field(default=0.01, ge=0.0, le=1.0)
+    seed: Optional[int] = None
+
+
+class CacheHit(NamedTuple):
+    answer: str
+    question: str  # the cached question that matched
+    similarity: float
+    verify: bool  # answer it again and report the outcome via ``check``
+    entry: Any
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "key", "guard", "expires")
+
+    def __init__(self, question, answer, key, guard, expires):
+        self.question = question
+        self.answer = answer
+        self.key = key
+        self.guard = guard
+        self.expires = expires
+
+
+class HashedVectorizer:
+    """Hashed, L2-normalized bag of words and within-word character trigrams"""
+
+    def __init__(self, dim: int = 1024, synonyms: Optional[Dict[str, str]] = None):
+        self.dim = dim
+        self.synonyms = dict(synonyms or {})
+
+    def words(self, text: str) -> Tuple[str, ...]:
+        synonyms = self.synonyms
+        return tuple(synonyms.get(word, word) for word in terms(text))
+
+    def vector(self, words: Tuple[str, ...]) -> Dict[int, float]:
+        """Sparse vector {feature index: weight} with unit length"""
+        vec: Dict[int, float] = {}
+        dim = self.dim
+        for word in words:
+            index = zlib.crc32(word.encode()) % dim
+            vec[index] = vec.get(index, 0.0) + 1.0
+            padded = f" {word} "
+            for end in range(3, len(padded) + 1):
+                start = end - 3
+                gram = padded[start:end]
+                index = zlib.crc32(gram.encode(), 1) % dim
+                vec[index] = vec.get(index, 0.0) + _TRIGRAM_WEIGHT
+        norm = sum(w * w for w in vec.values()) ** 0.5
+        return {i: w / norm for i, w in vec.items()} if norm else vec
+
+
+class _DenseRows:
+    """Vectors as rows of a NumPy matrix"""
+
+    name = "numpy"
+
+    def __init__(self, capacity: int, dim: int):
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+
+    def set(self, row: int, vec: Dict[int, float]) -> None:
+        self._matrix[row] = 0.0
+        if vec:
+            self._matrix[row, list(vec)] = list(vec.values())
+
+    def clear(self, row: int) -> None:
+        self._matrix[row] = 0.0
+
+    def search(
+        self, vec: Dict[int, float], threshold: float
+    ) -> List[Tuple[int, float]]:
+        if not vec:
+            return []
+        columns = list(vec)
+        query = np.asarray(list(vec.values()), dtype=np.float32)
+        scores = self._matrix[:, columns] @ query
+        rows = np.flatnonzero(scores >= threshold)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(int(row), float(scores[row])) for row in rows]
+
+
+class _SparseRows:
+    """Vectors in an inverted index of features, used without NumPy"""
+
+    name = "python"
+
+    def __init__(self, capacity: int, dim: int):
+        self._rows: Dict[int, Dict[int, float]] = {}
+        self._postings: Dict[int, Dict[int, float]] = {}
+
+    def set(self, row: int, vec: Dict[int, float]) -> None:
+        self.clear(row)
+        self._rows[row] = vec
+        for index, weight in vec.items():
+            self._postings.setdefault(index, {})[row] = weight
+
+    def clear(self, row: int) -> None:
+        for index in self._rows.pop(row, ()):
+            postings = self._postings[index]
+            del postings[row]
+            if not postings:
+                del self._postings[index]
+
+    def search(
+        self, vec: Dict[int, float], threshold: float
+    ) -> List[Tuple[int, float]]:
+        scores: Dict[int, float] = {}
+        for index, weight in vec.items():
+            for row, other in self._postings.get(index, {}).items():
+                scores[row] = scores.get(row, 0.0) + weight * other
+        found = [(row, s) for row, s in scores.items() if s >= threshold - 1e-6]
+        found.sort(key=lambda item: -item[1])
+        return found
+
+
+class AnswerCache:
+    """Bounded LRU cache of answers, looked up by question similarity"""
+
+    def __init__(
+        self,
+        config: Optional[AnswerCacheConfig] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.config = config or AnswerCacheConfig()
+        self.vectorizer = HashedVectorizer(self.config.dim, self.config.synonyms)
+        rows = _DenseRows if np is not None else _SparseRows
+        self._rows = rows(self.config.capacity, self.config.dim)
+        self._clock = clock
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._entries: List[Optional[_Entry]] = [None] * self.config.capacity
+        self._free = list(range(self.config.capacity - 1, -1, -1))
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        # Exact matches after normalization skip the similarity search
+        self._exact: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], int] = {}
+        self._false_hits: Deque[Dict[str, Any]] = deque(maxlen=_RECENT_FALSE_HITS)
+        self._counters = {
+            "lookups": 0,
+            "hits": 0,
+            "expired": 0,
+            "evictions": 0,
+            "verified": 0,
+            "false_hits": 0,
+        }
+
+    def _embed(self, question: str):
+        words = self.vectorizer.words(question)
+        guard = tuple(_GUARD.findall(question))
+        return (words, guard), words, guard
+
+    def get(self, question: str) -> Optional[CacheHit]:
+        """Cached answer of the most similar earlier question, if any"""
+        key, words, guard = self._embed(question)
+        now = self._clock()
+        with self._lock:
+            self._counters["lookups"] += 1
+            row = self._exact.get(key)
+            if row is not None:
+                candidates = [(row, 1.0)]
+            else:
+                vec = self.vectorizer.vector(words)
+                candidates = self._rows.search(vec, self.config.threshold)
+            for row, similarity in candidates:
+                entry = self._entries[row]
+                if entry.guard != guard:
+                    continue
+                if entry.expires is not None and entry.expires <= now:
+                    self._counters["expired"] += 1
+                    self._drop(row)
+                    continue
+                self._lru.move_to_end(row)
+                self._counters["hits"] += 1
+                verify = self._rng.random() < self.config.sample_rate
+                return CacheHit(
+                    entry.answer, entry.question, min(similarity, 1.0), verify, entry
+                )
+        return None
+
+    def put(self, question: str, answer: str, tool: Optional[str] = None) -> None:
+        """Cache ``answer``, expiring it by the ttl of the ``tool`` it came from"""
+        ttl = self.config.volatile_ttl.get(tool, self.config.ttl)
+        if ttl is not None and ttl <= 0:
+            return
+        key, words, guard = self._embed(question)
+        vec = self.vectorizer.vector(words)
+        expires = self._clock() + ttl if ttl is not None else None
+        entry = _Entry(question, answer, key, guard, expires)
+        with self._lock:
+            row = self._exact.get(key)
+            if row is None:
+                if not self._free:
+                    oldest, _ = self._lru.popitem(last=False)
+                    self._drop(oldest)
+                    self._counters["evictions"] += 1
+                row = self._free.pop()
+                self._rows.set(row, vec)
+                self._exact[key] = row
+            self._entries[row] = entry
+            self._lru[row] = None
+            self._lru.move_to_end(row)
+
+    def check(self, hit: CacheHit, fresh: str) -> bool:
+        """Compare a sampled hit with a fresh answer; a mismatch evicts it"""
+        with self._lock:
+            self._counters["verified"] += 1
+            if fresh == hit.answer:
+                return True
+            self._counters["false_hits"] += 1
+            self._false_hits.append(
+                {
+                    "cached_question": hit.question,
+                    "similarity": round(hit.similarity, 4),
+                    "cached_answer": hit.answer,
+                    "fresh_answer": fresh,
+                }
+            )
+            row = self._exact.get(hit.entry.key)
+            if row is not None and self._entries[row] is hit.entry:
+                self._drop(row)
+        return False
+
+    def clear(self) -> None:
+        with self._lock:
+            for row in list(self._lru):
+                self._drop(row)
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["size"] = len(self._lru)
+            recent = list(self._false_hits)
+        lookups, verified = stats["lookups"], stats["verified"]
+        stats["capacity"] = self.config.capacity
+        stats["backend"] = self._rows.name
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["false_hit_rate"] = stats["false_hits"] / verified if verified else 0.0
+        stats["recent_false_hits"] = recent
+        return stats
+
+    def _drop(self, row: int) -> None:
+        entry = self._entries[row]
+        self._entries[row] = None
+        self._lru.pop(row, None)
+        self._exact.pop(entry.key, None)
+        self._rows.clear(row)
+        self._free.append(row)
@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from .stats import summarize_ms
+
+logger = logging.getLogger(__name__)
+
+BatchFn = Callable[[List[Any]], Sequence[Any]]
+
+
+class BatchConfig(BaseModel):
+    """Limits for grouping concurrent calls into one backend request"""
+
+    max_batch_size: int = Field(default=16, ge=1)
+    max_wait: float = Field(default=0.005, ge=0.0)
+    max_inflight: int = Field(default=4, ge=1)
+    window: int = Field(default=1024, ge=1)
+
+
+class MicroBatcher:
+    """Collects concurrent calls and sends them to a batch endpoint together.
+
+    A batch is dispatched when it reaches ``max_batch_size`` or when its
+    oldest call has waited ``max_wait`` seconds. At most ``max_inflight``
+    batches run at once; while they are all busy new calls keep queueing, so
+    batches grow with load. Worker threads start on first use, which keeps
+    the batcher safe to create before forking.
+    """
+
+    def __init__(
+        self, batch_fn: BatchFn, config: Optional[BatchConfig] = None, name: str = "llm"
+    ):
+        self.batch_fn = batch_fn
+        self.config = config or BatchConfig()
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue: Deque[Tuple[Any, Future, float]] = deque()
+        self._slots = threading.BoundedSemaphore(self.config.max_inflight)
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Deque[int] = deque(maxlen=self.config.window)
+        self._queue_delays: Deque[float] = deque(maxlen=self.config.window)
+        self._counters = {
+            "calls": 0,
+            "batches": 0,
+            "errors": 0,
+            "cancelled": 0,
+            "max_batch_size": 0,
+        }
+
+    def submit(self, item: Any) -> Future:
+        """Queue one call; the future resolves to its own response"""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Batcher '{self.name}' is closed")
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name=f"batch-{self.name}", daemon=True
+                )
+                self._dispatcher.start()
+            self._queue.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def call(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Queue one call and wait up to ``timeout`` for its response.
+
+        On timeout the call is cancelled, so it is left out of its batch if
+        the batch has not been sent yet, and TimeoutError is raised.
+        """
+        future = self.submit(item)
+        try:
+            return future.result(timeout=timeout)
+        except futures.TimeoutError:
+            if future.cancel():
+                with self._stats_lock:
+                    self._counters["cancelled"] += 1
+            raise TimeoutError(f"Batched call timed out after {timeout:.3f}s") from None
+
+    def close(self) -> None:
+        """Flush queued calls and stop the dispatcher"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            dispatcher = self._dispatcher
+        if dispatcher is not None:
+            dispatcher.join(timeout=5.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch size and queueing delay over the recent window"""
+        with self._stats_lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            sizes = list(self._batch_sizes)
+            delays = list(self._queue_delays)
+        with self._cond:
+            stats["queued"] = len(self._queue)
+        stats["mean_batch_size"] = sum(sizes) / len(sizes) if sizes else 0.0
+        stats["queue_delay_ms"] = summarize_ms(delays)
+        stats["max_wait_ms"] = 1000.0 * self.config.max_wait
+        stats["max_batch_size_limit"] = self.config.max_batch_size
+        return stats
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+
+            # Wait for a free slot before forming the batch so that calls
+            # arriving meanwhile join it instead of queueing behind it.
+            self._slots.acquire()
+            batch = self._take_batch()
+            threading.Thread(
+                target=self._run_batch,
+                args=(batch,),
+                name=f"batch-{self.name}-run",
+                daemon=True,
+            ).start()
+
+    def _take_batch(self) -> List[Tuple[Any, Future, float]]:
+        limit = self.config.max_batch_size
+        with self._cond:
+            deadline = self._queue[0][2] + self.config.max_wait
+            while len(self._queue) < limit and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(limit, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run_batch(self, batch: List[Tuple[Any, Future, float]]) -> None:
+        started = time.perf_counter()
+        try:
+            # Callers that gave up while queued are not sent to the backend
+            batch = [
+                entry for entry in batch if entry[1].set_running_or_notify_cancel()
+            ]
+            if not batch:
+                return
+            self._record(batch, started)
+            try:
+                results = self.batch_fn([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"Batch endpoint returned {len(results)} results "
+                        f"for {len(batch)} calls"
+                    )
+            except Exception as e:
+                logger.warning("Batch of %d calls failed: %s", len(batch), e)
+                with self._stats_lock:
+                    self._counters["errors"] += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def _record(self, batch: List[Tuple[Any, Future, float]], started: float) -> None:
+        with self._stats_lock:
+            self._counters["calls"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["max_batch_size"] = max(
+                self._counters["max_batch_size"], len(batch)
+            )
+            self._batch_sizes.append(len(batch))
+            self._queue_delays.extend(started - queued for _, _, queued in batch)
@@ -0,0 +1,297 @@
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel, Field, model_validator
+
+# Threads shared by every bulkhead that is not given its own executor. They
+# are started on demand, so the cap only matters when this many calls run at
+# once; each bulkhead still admits at most ``max_concurrent`` of them.
+SHARED_WORKERS = 512
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_lock = threading.Lock()
+
+
+def shared_executor() -> ThreadPoolExecutor:
+    """The process-wide pool bulkheads run their calls on by default"""
+    global _shared_executor
+    if _shared_executor is None:
+        with _shared_lock:
+            if _shared_executor is None:
+                _shared_executor = ThreadPoolExecutor(
+                    max_workers=SHARED_WORKERS, thread_name_prefix="tool"
+                )
+    return _shared_executor
+
+
+class BulkheadFull(Exception):
+    """Raised when a bulkhead has no free slot or queue space"""
+
+
+class BulkheadClosed(Exception):
+    """Raised when submitting to a bulkhead that has been shut down"""
+
+
+class _Execution:
+    """When a submitted call started running and how long it ran"""
+
+    __slots__ = ("started", "seconds")
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.seconds: Optional[float] = None
+
+
+def execution_time(future: Future) -> Optional[float]:
+    """Seconds a finished bulkhead call spent running, excluding queueing"""
+    execution = getattr(future, "execution", None)
+    return execution.seconds if execution is not None else None
+
+
+class BulkheadConfig(BaseModel):
+    """Concurrency, queueing and timeout limits for a single tool"""
+
+    max_concurrent: int = Field(default=4, ge=1)
+    max_queue: int = Field(default=8, ge=0)
+    initial_timeout: float = Field(default=5.0, gt=0.0)
+    min_timeout: float = Field(default=0.05, gt=0.0)
+    max_timeout: float = Field(default=30.0, gt=0.0)
+    timeout_multiplier: float = Field(default=3.0, ge=1.0)
+    percentile: float = Field(default=0.99, gt=0.0, le=1.0)
+    min_samples: int = Field(default=20, ge=1)
+    window: int = Field(default=256, ge=1)
+
+    @model_validator(mode="after")
+    def _check_bounds(self) -> "BulkheadConfig":
+        if self.min_timeout > self.max_timeout:
+            raise ValueError("min_timeout must not exceed max_timeout")
+        return self
+
+
+class Bulkhead:
+    """Concurrency and queue limits for one tool with a latency-adaptive timeout.
+
+    At most ``max_concurrent`` calls run at once, on a thread pool shared
+    with other bulkheads; up to ``max_queue`` more wait in the bulkhead's own
+    queue. The adaptive timeout is learned from execution times and bounds
+    the wait for a free worker and the run itself separately, so a call
+    queued behind a slow one fails fast instead of waiting ``max_timeout``.
+    """
+
+    # Recompute the adaptive timeout every N completed calls
+    _RECOMPUTE_EVERY = 16
+
+    def __init__(
+        self,
+        name: str,
+        config: Optional[BulkheadConfig] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        self.name = name
+        self.config = config or BulkheadConfig()
+        self._executor = executor or shared_executor()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pending = 0  # queued plus running
+        self._running = 0
+        self._queue: deque = deque()
+        self._latencies = deque(maxlen=self.config.window)
+        self._since_recompute = 0
+        self._timeout = self.config.initial_timeout
+        self._counters = {
+            "calls": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "timed_out": 0,
+        }
+
+    @property
+    def capacity(self) -> int:
+        return self.config.max_concurrent + self.config.max_queue
+
+    def current_timeout(self) -> float:
+        """Timeout applied to the next call"""
+        return self._timeout
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Queue a call, failing fast with BulkheadFull when saturated.
+
+        Raises BulkheadClosed once the bulkhead has been shut down.
+        """
+        future = self._accept(fn, args, queue=True)
+        if future is None:
+            raise BulkheadFull(f"Tool '{self.name}' is at capacity")
+        return future
+
+    def try_submit(self, fn: Callable[..., Any], *args: Any) -> Optional[Future]:
+        """Start a call only if a worker slot is free right now.
+
+        Returns None instead of queueing, so optional work never takes a
+        queue slot or delays a queued call. Raises BulkheadClosed once the
+        bulkhead has been shut down.
+        """
+        return self._accept(fn, args, queue=False)
+
+    def _accept(
+        self, fn: Callable[..., Any], args: Tuple, queue: bool
+    ) -> Optional[Future]:
+        future: Future = Future()
+        future.execution = _Execution()
+        with self._lock:
+            if self._closed:
+                raise BulkheadClosed(f"Tool '{self.name}' bulkhead is shut down")
+            if queue:
+                full = self._pending >= self.capacity
+            else:
+                full = bool(self._queue) or (
+                    self._running >= self.config.max_concurrent
+                )
+            if full:
+                if queue:  # optional work turned away is not a rejection
+                    self._counters["rejected"] += 1
+                return None
+            self._pending += 1
+            self._counters["calls"] += 1
+            self._queue.append((future, fn, args))
+        future.add_done_callback(self._release)
+        self._dispatch()
+        return future
+
+    def call(
+        self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None
+    ) -> Any:
+        """Run fn in the bulkhead and wait up to the adaptive timeout.
+
+        ``timeout`` (the caller's remaining budget) shortens the wait further.
+        Raises BulkheadFull when saturated and TimeoutError when the call does
+        not finish in time. A timed-out call keeps its slot until it returns,
+        so a hung backend cannot grow past the bulkhead's limits.
+        """
+        return self.wait(self.submit(fn, *args), timeout)
+
+    def wait(self, future: Future, timeout: Optional[float] = None) -> Any:
+        """Wait for a submitted call up to the adaptive timeout (or ``timeout``).
+
+        Waiting for a free worker and running each get up to the adaptive
+        timeout; ``timeout`` bounds the two together. A call still queued when
+        its wait runs out is cancelled and never runs.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        queue_wait = self._timeout if timeout is None else min(self._timeout, timeout)
+        if not future.execution.started.wait(queue_wait):
+            # Still queued: give up the slot rather than run it for nobody
+            future.cancel()
+            with self._lock:
+                self._counters["timed_out"] += 1
+            raise TimeoutError(
+                f"Tool '{self.name}' timed out after {queue_wait:.3f}s "
+                "waiting for a free worker"
+            )
+        run_timeout = self._timeout
+        if deadline is not None:
+            run_timeout = max(0.0, min(run_timeout, deadline - time.perf_counter()))
+        try:
+            return future.result(timeout=run_timeout)
+        except futures.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            raise TimeoutError(
+                f"Tool '{self.name}' timed out after {run_timeout:.3f}s"
+            ) from None
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of bulkhead counters and limits"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_flight"] = self._pending
+        stats["timeout"] = self._timeout
+        stats["max_concurrent"] = self.config.max_concurrent
+        stats["max_queue"] = self.config.max_queue
+        return stats
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Refuse new calls; queued calls still run.
+
+        With ``wait``, block until every accepted call has finished.
+        """
+        with self._lock:
+            self._closed = True
+        if wait:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        return
+                time.sleep(0.01)
+
+    def _dispatch(self) -> None:
+        """Start queued calls while fewer than ``max_concurrent`` run"""
+        while True:
+            with self._lock:
+                if not self._queue or self._running >= self.config.max_concurrent:
+                    return
+                call = self._queue.popleft()
+                self._running += 1
+            try:
+                self._executor.submit(self._run, call)
+            except RuntimeError:  # the pool is shut down, e.g. at exit
+                with self._lock:
+                    self._running -= 1
+                if call[0].set_running_or_notify_cancel():
+                    call[0].set_exception(
+                        BulkheadClosed(f"Tool '{self.name}' has no worker threads")
+                    )
+
+    def _run(self, call: Tuple[Future, Callable[..., Any], Tuple]) -> None:
+        future, fn, args = call
+        try:
+            # False if the caller gave up on it while it was queued
+            if future.set_running_or_notify_cancel():
+                execution = future.execution
+                start = time.perf_counter()
+                execution.started.set()
+                try:
+                    result = fn(*args)
+                except BaseException as e:
+                    self._finish(execution, start)
+                    future.set_exception(e)
+                else:
+                    self._finish(execution, start)
+                    future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._dispatch()
+
+    def _finish(self, execution: _Execution, start: float) -> None:
+        # Set before the future completes, so done callbacks can read it
+        execution.seconds = time.perf_counter() - start
+        self._record(execution.seconds)
+
+    def _release(self, future: Future) -> None:
+        outcome = "cancelled" if future.cancelled() else "completed"
+        with self._lock:
+            self._pending -= 1
+            self._counters[outcome] += 1
+
+    def _record(self, elapsed: float) -> None:
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._since_recompute += 1
+            if (
+                len(self._latencies) < self.config.min_samples
+                or self._since_recompute < self._RECOMPUTE_EVERY
+            ):
+                return
+            self._since_recompute = 0
+            samples = sorted(self._latencies)
+
+        index = min(len(samples) - 1, int(self.config.percentile * len(samples)))
+        timeout = samples[index] * self.config.timeout_multiplier
+        self._timeout = min(
+            max(timeout, self.config.min_timeout), self.config.max_timeout
+        )
@@ -0,0 +1,79 @@
+"""Request time budgets.
+
+A :class:`Deadline` is an absolute point on the monotonic clock, so it can be
+handed across threads and turned into a remaining timeout at every hop (LLM
+call, tool bulkhead, tool run). Code that loops for a while can call
+:func:`check` to stop cooperatively once the current request is out of time.
+"""
+
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("agent_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request runs out of its time budget"""
+
+
+class Deadline:
+    """Absolute deadline on ``time.monotonic()``"""
+
+    __slots__ = ("at",)
+
+    def __init__(self, at: float):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    @classmethod
+    def resolve(
+        cls, deadline: Optional[float] = None, timeout: Optional[float] = None
+    ) -> Optional["Deadline"]:
+        """Deadline from an absolute time and/or a relative timeout (earliest wins)"""
+        candidates = []
+        if deadline is not None:
+            candidates.append(deadline)
+        if timeout is not None:
+            candidates.append(time.monotonic() + timeout)
+        return cls(min(candidates)) if candidates else None
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def check(self, what: str = "Request") -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"{what} ran out of time")
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+@contextlib.contextmanager
+def scope(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Make ``deadline`` the current one for the enclosed code"""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[Deadline]:
+    """Deadline of the request running in this context, if any"""
+    return _current.get()
+
+
+def check(what: str = "Request") -> None:
+    """Raise DeadlineExceeded if the current request is out of time"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check(what)
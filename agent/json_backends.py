@@ -0,0 +1,129 @@
+"""Pluggable JSON decoders for parsing LLM responses.
+
+orjson and msgspec decode straight from ``bytes`` or a ``memoryview`` over a
+network buffer and are several times faster than the stdlib ``json`` module,
+which is used when neither is installed. Every backend returns what
+``json.loads`` would and raises ``ValueError`` on malformed input: input a
+fast decoder rejects but the stdlib accepts (lone surrogates, NaN, Infinity)
+is handed to the stdlib. One difference remains: orjson decodes integers
+beyond 64 bits as floats. Set ``AGENT_JSON_BACKEND`` to force one.
+"""
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+Buffer = Union[str, bytes, bytearray, memoryview]
+
+ENV_BACKEND = "AGENT_JSON_BACKEND"
+
+# Tried in order when no backend is named
+PREFERENCE = ("orjson", "msgspec", "json")
+
+
+class JSONBackend:
+    """A named ``loads`` accepting str or any bytes-like object"""
+
+    def __init__(self, name: str, loads: Callable[[Buffer], Any]):
+        self.name = name
+        self.loads = loads
+
+    def __repr__(self) -> str:
+        return f"JSONBackend({self.name!r})"
+
+
+def _stdlib_loads(data: Buffer) -> Any:
+    # json.loads accepts bytes but not a memoryview
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# Constructs the stdlib accepts and the fast decoders reject: NaN and
+# (-)Infinity, lone surrogate escapes and floats too large for a double
+_STDLIB_ONLY = re.compile(r"NaN|Infinity|\\u[dD][89abAB]|\d[eE][+]?\d{3}")
+_STDLIB_ONLY_BYTES = re.compile(rb"NaN|Infinity|\\u[dD][89abAB]|\d[eE][+]?\d{3}")
+
+
+def _with_stdlib_fallback(fast_loads: Callable[[Buffer], Any]) -> Callable:
+    """``fast_loads``, with input only the stdlib accepts handed to it.
+
+    Input is decoded once: a rejected document is checked for the constructs
+    above and re-decoded by the stdlib only if it has one, so malformed
+    responses fail after a single pass.
+    """
+
+    def loads(data: Buffer) -> Any:
+        try:
+            return fast_loads(data)
+        except ValueError:
+            pattern = _STDLIB_ONLY if isinstance(data, str) else _STDLIB_ONLY_BYTES
+            if pattern.search(data) is None:
+                raise
+            return _stdlib_loads(data)
+
+    return loads
+
+
+def _load_orjson() -> Optional[JSONBackend]:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError (a ValueError)
+    return JSONBackend("orjson", _with_stdlib_fallback(orjson.loads))
+
+
+def _load_msgspec() -> Optional[JSONBackend]:
+    try:
+        import msgspec
+    except ImportError:
+        return None
+
+    decode = msgspec.json.decode
+
+    def loads(data: Buffer) -> Any:
+        try:
+            return decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from None
+
+    return JSONBackend("msgspec", _with_stdlib_fallback(loads))
+
+
+_LOADERS: Dict[str, Callable[[], Optional[JSONBackend]]] = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+    "json": lambda: JSONBackend("json", _stdlib_loads),
+}
+
+_cache: Dict[str, Optional[JSONBackend]] = {}
+
+
+def available() -> List[str]:
+    """Names of the backends that can be used here, fastest first"""
+    return [name for name in PREFERENCE if _load(name) is not None]
+
+
+def get_backend(name: Optional[str] = None) -> JSONBackend:
+    """Backend by name, or the fastest installed one.
+
+    ``name`` defaults to ``AGENT_JSON_BACKEND``; raises ValueError for an
+    unknown or uninstalled backend.
+    """
+    name = name or os.environ.get(ENV_BACKEND) or None
+    if name is None:
+        return _load(available()[0])
+    if name not in _LOADERS:
+        raise ValueError(f"Unknown JSON backend: {name}")
+    backend = _load(name)
+    if backend is None:
+        raise ValueError(f"JSON backend '{name}' is not installed")
+    return backend
+
+
+def _load(name: str) -> Optional[JSONBackend]:
+    if name not in _cache:
+        _cache[name] = _LOADERS[name]()
+    return _cache[name]
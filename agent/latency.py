@@ -0,0 +1,68 @@
+import itertools
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Sequence, Union
+
+
+class LatencyModel(ABC):
+    """Base class for simulated LLM response latencies"""
+
+    @abstractmethod
+    def sample(self, rng: random.Random) -> float:  # pragma: no cover
+        """Return a latency in seconds"""
+        pass
+
+
+class FixedLatency(LatencyModel):
+    """Constant latency for every call"""
+
+    def __init__(self, seconds: float = 0.0):
+        if seconds < 0:
+            raise ValueError("Latency must be non-negative")
+        self.seconds = seconds
+
+    def sample(self, rng: random.Random) -> float:
+        return self.seconds
+
+
+class LognormalLatency(LatencyModel):
+    """Lognormal latency, the usual shape of real LLM response times"""
+
+    def __init__(self, median: float, sigma: float = 0.5, cap: float = 60.0):
+        if median <= 0:
+            raise ValueError("Median latency must be positive")
+        if sigma < 0:
+            raise ValueError("Sigma must be non-negative")
+        self.median = median
+        self.sigma = sigma
+        self.cap = cap
+        self._mu = math.log(median)
+
+    def sample(self, rng: random.Random) -> float:
+        return min(rng.lognormvariate(self._mu, self.sigma), self.cap)
+
+
+class TraceLatency(LatencyModel):
+    """Replays recorded latencies in order, wrapping around at the end"""
+
+    def __init__(self, samples: Sequence[float]):
+        if not samples:
+            raise ValueError("Latency trace is empty")
+        if any(s < 0 for s in samples):
+            raise ValueError("Latency trace contains negative values")
+        self.samples: List[float] = [float(s) for s in samples]
+        self._counter = itertools.count()
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "TraceLatency":
+        """Load a trace from a JSON list or a file with one value per line"""
+        text = Path(path).read_text()
+        if text.lstrip().startswith("["):
+            return cls(json.loads(text))
+        return cls([float(line) for line in text.split() if line])
+
+    def sample(self, rng: random.Random) -> float:
+        return self.samples[next(self._counter) % len(self.samples)]
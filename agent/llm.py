@@ -1,57 +1,276 @@
+import itertools
 import logging
 import random
-from typing import Optional, Union
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
 
+from pydantic import BaseModel, Field, model_validator
+
+from .batching import BatchConfig, MicroBatcher
+from .deadline import Deadline, DeadlineExceeded
+from .latency import FixedLatency, LatencyModel
 from .schemas import ToolPlan, ToolType
+from .sessions import Prompt
 
 logger = logging.getLogger(__name__)
 
+# Words the fake LLM routes on; follow-ups without any of them inherit context
+_INTENT_KEYWORDS = (
+    "translate",
+    "spanish",
+    "french",
+    "german",
+    "weather",
+    "temperature",
+    "%",
+    "add",
+    "+",
+    "-",
+    "*",
+    "/",
+    "who is",
+    "knowledge",
+)
+
+
+class ResponseProfile(BaseModel):
+    """Mix of response kinds produced by the fake LLM"""
+
+    tool_plan: float = Field(default=0.35, ge=0.0)
+    malformed: float = Field(default=0.25, ge=0.0)
+    structured: float = Field(default=0.20, ge=0.0)
+    direct: float = Field(default=0.20, ge=0.0)
+
+    @model_validator(mode="after")
+    def _check_total(self) -> "ResponseProfile":
+        if self.tool_plan + self.malformed + self.structured + self.direct <= 0:
+            raise ValueError("Response profile weights must not all be zero")
+        return self
+
+    def thresholds(self) -> tuple:
+        """Cumulative upper bounds for tool plan, malformed and structured rolls"""
+        total = self.tool_plan + self.malformed + self.structured + self.direct
+        first = self.tool_plan / total
+        second = first + self.malformed / total
+        third = second + self.structured / total
+        return first, second, third
+
 
 class LLMService:
     """Service for handling LLM interactions"""
 
-    def __init__(self, use_fake_llm: bool = True):
+    def __init__(
+        self,
+        use_fake_llm: bool = True,
+        seed: Optional[int] = None,
+        profile: Optional[ResponseProfile] = None,
+        latency: Optional[LatencyModel] = None,
+        tokens_per_second: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        batching: Optional[BatchConfig] = None,
+    ):
+        if tokens_per_second is not None and tokens_per_second <= 0:
+            raise ValueError("tokens_per_second must be positive")
         self.use_fake_llm = use_fake_llm
+        self.seed = seed
+        self.profile = profile or ResponseProfile()
+        self.latency = latency or FixedLatency(0.0)
+        self.tokens_per_second = tokens_per_second
+        self._sleep = sleep
+        self._local = threading.local()
+        self._streams = itertools.count()
+        self._thresholds = self.profile.thresholds()
+        self.batcher = (
+            MicroBatcher(self.call_llm_batch, batching)
+            if batching is not None
+            else None
+        )
+
+    @property
+    def _rng(self) -> random.Random:
+        """This thread's generator, so concurrent calls share no RNG state.
+
+        The first thread to draw gets ``Random(seed)``, so single-threaded
+        runs replay exactly; each later thread gets its own seeded stream.
+        """
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            stream = next(self._streams)
+            if self.seed is None:
+                rng = random.Random()
+            elif stream == 0:
+                rng = random.Random(self.seed)
+            else:
+                rng = random.Random(f"{self.seed}/{stream}")
+            self._local.rng = rng
+        return rng
+
+    @property
+    def backend_name(self) -> str:
+        """Name used to key per-backend statistics such as parser hit rates"""
+        return "fake" if self.use_fake_llm else "llm"
+
+    def call_llm(
+        self, prompt: Union[str, Prompt], timeout: Optional[float] = None
+    ) -> Optional[Union[str, ToolPlan]]:
+        """Call LLM and return either a direct response or a tool plan.
 
-    def call_llm(self, prompt: str) -> Optional[Union[str, ToolPlan]]:
-        """Call LLM and return either a direct response or a tool plan"""
+        ``prompt`` is either a bare question or a session Prompt; a real
+        backend would send ``Prompt.render()``. With batching enabled the
+        call is grouped with concurrent calls into one batch request. Raises
+        TimeoutError when no response arrives within ``timeout`` seconds.
+        """
+        if self.batcher is not None:
+            return self.batcher.call(prompt, timeout=timeout)
         if self.use_fake_llm:
-            return self._fake_llm_call(prompt)
+            budget = Deadline.after(timeout) if timeout is not None else None
+            response = self._fake_llm_call(prompt)
+            self._simulate_latency(response, budget)
+            return response
+
+    def call_llm_batch(
+        self, prompts: List[Union[str, Prompt]]
+    ) -> List[Optional[Union[str, ToolPlan]]]:
+        """Batch endpoint: one response per prompt, in order.
+
+        The fake backend charges one round trip for the whole batch plus the
+        generation time of its longest response, as a batching server would.
+        """
+        if not self.use_fake_llm:
+            return [None] * len(prompts)
+        responses = [self._fake_llm_call(prompt) for prompt in prompts]
+        delay = self.latency.sample(self._rng)
+        if self.tokens_per_second:
+            longest = max(
+                (
+                    len(self._tokenize(self._response_text(r)))
+                    for r in responses
+                    if r is not None
+                ),
+                default=0,
+            )
+            delay += longest / self.tokens_per_second
+        self._wait(delay)
+        return responses
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend statistics, including batching when enabled"""
+        stats: Dict[str, Any] = {"backend": self.backend_name}
+        if self.batcher is not None:
+            stats["batching"] = self.batcher.stats()
+        return stats
+
+    def close(self) -> None:
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def stream_llm(
+        self, prompt: Union[str, Prompt], timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        """Stream the response text token by token at the configured rate.
+
+        Stops with TimeoutError once ``timeout`` seconds have passed, after
+        yielding the tokens generated so far.
+        """
+        if not self.use_fake_llm:
+            return
+        budget = Deadline.after(timeout) if timeout is not None else None
+        response = self._fake_llm_call(prompt)
+        if response is None:
+            return
+
+        self._wait(self.latency.sample(self._rng), budget)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for token in self._tokenize(self._response_text(response)):
+            self._wait(delay, budget)
+            yield token
+
+    def _simulate_latency(
+        self,
+        response: Optional[Union[str, ToolPlan]],
+        budget: Optional[Deadline] = None,
+    ) -> None:
+        """Sleep for time-to-first-token plus token generation time"""
+        delay = self.latency.sample(self._rng)
+        if self.tokens_per_second and response is not None:
+            tokens = len(self._tokenize(self._response_text(response)))
+            delay += tokens / self.tokens_per_second
+        self._wait(delay, budget)
+
+    def _wait(self, seconds: float, budget: Optional[Deadline] = None) -> None:
+        if budget is not None:
+            remaining = budget.remaining()
+            if seconds > remaining:
+                # Give up at the deadline instead of finishing the call
+                if remaining > 0:
+                    self._sleep(remaining)
+                raise DeadlineExceeded("LLM call ran out of time")
+        if seconds > 0:
+            self._sleep(seconds)
+
+    @staticmethod
+    def _response_text(response: Union[str, ToolPlan]) -> str:
+        if isinstance(response, ToolPlan):
+            return response.model_dump_json()
+        return response
+
+    @staticmethod
+    def _tokenize(text: str) -> list:
+        """Split text into whitespace-preserving tokens (roughly one per word)"""
+        tokens = []
+        start = 0
+        for i in range(1, len(text)):
+            if text[i] == " " and text[i - 1] != " ":
+                tokens.append(text[start:i])
+                start = i
+        if text:
+            tokens.append(text[start:])
+        return tokens
 
-    def _fake_llm_call(self, prompt: str) -> Optional[Union[str, ToolPlan]]:
+    def _fake_llm_call(
+        self, prompt: Union[str, Prompt]
+    ) -> Optional[Union[str, ToolPlan]]:
         """Fake LLM that simulates real-world behavior including errors"""
+        context = None
+        if isinstance(prompt, Prompt):
+            prompt, context = prompt.question, prompt.last_question
         p = prompt.lower()
-        roll = random.random()
+        if context and not any(word in p for word in _INTENT_KEYWORDS):
+            # Follow-up such as "and in London?": route using the previous turn
+            p = f"{context.lower()} {p}"
+        roll = self._rng.random()
+        tool_plan_bound, malformed_bound, structured_bound = self._thresholds
 
-        # 35% chance of returning a proper tool plan
-        if roll < 0.35:
+        # 35% chance (by default) of returning a proper tool plan
+        if roll < tool_plan_bound:
             try:
                 return self._generate_tool_plan(p, prompt)
             except Exception as e:  # pragma: no cover
-                logger.warning(f"Error generating tool plan: {e}")
+                logger.warning("Error generating tool plan: %s", e)
                 return None
 
         # 25% chance of malformed JSON (simulate real LLM flakiness)
-        if roll < 0.60:
+        if roll < malformed_bound:
             try:
                 return self._generate_malformed_response()
             except Exception as e:  # pragma: no cover
-                logger.warning(f"Error generating malformed response: {e}")
+                logger.warning("Error generating malformed response: %s", e)
                 return None
 
         # 20% chance of completely wrong format
-        if roll < 0.80:
+        if roll < structured_bound:
             try:
                 return 'TOOL:calc EXPR="12.5% of 243"'
             except Exception as e:  # pragma: no cover
-                logger.warning(f"Error generating structured response: {e}")
+                logger.warning("Error generating structured response: %s", e)
                 return None
 
         # 20% chance of direct answer
         try:
             return self._generate_direct_answer(p, prompt)
         except Exception as e:  # pragma: no cover
-            logger.warning(f"Error generating direct answer: {e}")
+            logger.warning("Error generating direct answer: %s", e)
         return None
 
     def _generate_tool_plan(self, p: str, prompt: str) -> Optional[ToolPlan]:
@@ -94,7 +313,7 @@ class LLMService:
             # Default fallback
             return ToolPlan(tool=ToolType.WEATHER, args={"city": "paris"})
         except Exception as e:
-            logger.warning(f"Error generating tool plan: {e}")
+            logger.warning("Error generating tool plan: %s", e)
             return None
 
     def _generate_malformed_response(self) -> str:
@@ -105,7 +324,7 @@ class LLMService:
             '{"tool": "weather" "args": {"city": "london"}}',  # Missing comma
             'tool: "calc", args: {expr: "2+2"}',  # Invalid JSON format
         ]
-        return random.choice(malformed_responses)
+        return self._rng.choice(malformed_responses)
 
     def _generate_direct_answer(self, p: str, prompt: str) -> str:
         """Generate direct answers for some queries"""
@@ -0,0 +1,292 @@
+"""Open-loop load generator for an in-process Agent or the HTTP API.
+
+Requests are sent on a precomputed schedule (Poisson or constant-rate
+arrivals) regardless of how quickly earlier ones finish, which is how real
+users behave. Latency is measured from each request's *scheduled* send time,
+not from when a worker thread got around to sending it, so any time spent
+queued behind a slow system is counted (no coordinated omission). Requests
+scheduled during the warmup phase are sent but left out of the report.
+"""
+
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel, Field, model_validator
+
+from .stats import percentile
+from .telemetry import OK_OUTCOMES
+
+REPORT_PERCENTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p99.9", 0.999))
+
+
+class QueryClass(BaseModel):
+    """A kind of question and its share of the traffic"""
+
+    name: str
+    weight: float = Field(gt=0.0)
+    questions: List[str] = Field(min_length=1)
+
+
+DEFAULT_MIX = [
+    QueryClass(
+        name="calc",
+        weight=0.3,
+        questions=["What is 12.5% of 243?", "What is 2 + 3?", "Add 10 to 5"],
+    ),
+    QueryClass(
+        name="weather",
+        weight=0.25,
+        questions=["Weather in Paris", "What's the temperature in London?"],
+    ),
+    QueryClass(
+        name="kb",
+        weight=0.2,
+        questions=["Who is Ada Lovelace?", "Who is Alan Turing?"],
+    ),
+    QueryClass(
+        name="translate",
+        weight=0.15,
+        questions=["Translate hello to Spanish", "Translate thank you to French"],
+    ),
+    QueryClass(
+        name="direct",
+        weight=0.1,
+        questions=["Tell me something interesting", "How are you today?"],
+    ),
+]
+
+
+class LoadConfig(BaseModel):
+    """Arrival process, phases and query mix of a load test"""
+
+    rate: float = Field(default=20.0, gt=0.0)  # requests per second
+    arrival: Literal["poisson", "constant"] = "poisson"
+    warmup: float = Field(default=2.0, ge=0.0)  # seconds
+    duration: float = Field(default=10.0, gt=0.0)  # steady-state seconds
+    concurrency: int = Field(default=256, ge=1)  # max requests in flight
+    seed: Optional[int] = None
+    mix: List[QueryClass] = Field(default_factory=lambda: list(DEFAULT_MIX))
+
+    @model_validator(mode="after")
+    def _check_mix(self) -> "LoadConfig":
+        if not self.mix:
+            raise ValueError("Query mix must not be empty")
+        return self
+
+
+class Sample(NamedTuple):
+    query_class: str
+    scheduled: float
+    started: float
+    finished: float
+    error: Optional[str]
+    warmup: bool
+
+
+Target = Callable[[str], Any]
+
+
+class FailedAnswer(Exception):
+    """Raised by a target for an answer the agent reports as a failure"""
+
+    def __init__(self, status: str):
+        super().__init__(f"Request failed: {status}")
+        self.status = status
+
+
+class AgentTarget:
+    """Sends questions to an in-process Agent"""
+
+    def __init__(self, agent: Any):
+        self.agent = agent
+
+    def __call__(self, question: str) -> str:
+        answer = self.agent.respond(question)
+        if not answer.ok:
+            raise FailedAnswer(answer.status)
+        return answer.text
+
+
+class HTTPTarget:
+    """POSTs questions to ``<url>/answer`` over one keep-alive connection per thread"""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path.rstrip("/") + "/answer"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self, question: str) -> str:
+        body = json.dumps({"question": question})
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+            self._local.conn = conn
+        try:
+            conn.request("POST", self.path, body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if resp.status != 200:
+            raise RuntimeError(f"HTTP {resp.status}")
+        payload = json.loads(data)
+        outcome = payload.get("outcome")
+        if outcome is not None and outcome not in OK_OUTCOMES:
+            raise FailedAnswer(outcome)
+        return payload["answer"]
+
+
+class LoadGenerator:
+    """Drives a target with open-loop arrivals and reports latency percentiles"""
+
+    def __init__(
+        self,
+        target: Target,
+        config: Optional[LoadConfig] = None,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.target = target
+        self.config = config or LoadConfig()
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.samples: List[Sample] = []
+
+    def schedule(self) -> List[tuple]:
+        """(offset seconds, query class, question) for every request"""
+        config = self.config
+        rng = random.Random(config.seed)
+        weights = [c.weight for c in config.mix]
+        end = config.warmup + config.duration
+        mean_gap = 1.0 / config.rate
+
+        arrivals = []
+        offset = 0.0
+        while True:
+            if config.arrival == "poisson":
+                offset += rng.expovariate(config.rate)
+            else:
+                offset += mean_gap
+            if offset >= end:
+                return arrivals
+            query_class = rng.choices(config.mix, weights)[0]
+            arrivals.append(
+                (offset, query_class.name, rng.choice(query_class.questions))
+            )
+
+    def run(self) -> Dict[str, Any]:
+        """Run the test and return the report"""
+        arrivals = self.schedule()
+        warmup = self.config.warmup
+        with ThreadPoolExecutor(
+            max_workers=self.config.concurrency, thread_name_prefix="loadgen"
+        ) as pool:
+            start = self._clock()
+            for offset, name, question in arrivals:
+                scheduled = start + offset
+                delay = scheduled - self._clock()
+                if delay > 0:
+                    self._sleep(delay)
+                pool.submit(self._send, name, question, scheduled, offset < warmup)
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        """Throughput, error rate and latency percentiles per query class"""
+        steady = [s for s in self.samples if not s.warmup]
+        by_class: Dict[str, List[Sample]] = {}
+        for sample in steady:
+            by_class.setdefault(sample.query_class, []).append(sample)
+
+        config = self.config
+        return {
+            "config": {
+                "rate": config.rate,
+                "arrival": config.arrival,
+                "warmup": config.warmup,
+                "duration": config.duration,
+                "concurrency": config.concurrency,
+            },
+            "overall": _summarize(steady, config.duration),
+            "classes": {
+                name: _summarize(samples, config.duration)
+                for name, samples in sorted(by_class.items())
+            },
+        }
+
+    def _send(self, name: str, question: str, scheduled: float, warmup: bool) -> None:
+        started = self._clock()
+        error = None
+        try:
+            self.target(question)
+        except FailedAnswer as e:
+            error = e.status
+        except Exception as e:
+            error = type(e).__name__
+        sample = Sample(name, scheduled, started, self._clock(), error, warmup)
+        with self._lock:
+            self.samples.append(sample)
+
+
+def _summarize(samples: List[Sample], duration: float) -> Dict[str, Any]:
+    # Latency counts from the scheduled send time, so time spent waiting for
+    # a free worker (the system falling behind) is included.
+    latencies = sorted(s.finished - s.scheduled for s in samples)
+    lags = [s.started - s.scheduled for s in samples]
+    errors = sum(1 for s in samples if s.error is not None)
+    summary: Dict[str, Any] = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput": (len(samples) - errors) / duration,
+        "latency_ms": {
+            label: 1000.0 * percentile(latencies, fraction)
+            for label, fraction in REPORT_PERCENTILES
+        },
+        "max_ms": 1000.0 * latencies[-1] if latencies else 0.0,
+        "max_send_lag_ms": 1000.0 * max(lags) if lags else 0.0,
+    }
+    summary["latency_ms"]["mean"] = (
+        1000.0 * sum(latencies) / len(latencies) if latencies else 0.0
+    )
+    return summary
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable table of a load test report"""
+    config = report["config"]
+    lines = [
+        f"{config['arrival']} arrivals at {config['rate']:g} req/s, "
+        f"{config['warmup']:g}s warmup + {config['duration']:g}s steady state",
+        "",
+        f"{'class':<10} {'reqs':>6} {'err%':>6} {'req/s':>8} "
+        + " ".join(f"{label:>9}" for label, _ in REPORT_PERCENTILES)
+        + f" {'max':>9}",
+    ]
+    rows = list(report["classes"].items()) + [("overall", report["overall"])]
+    for name, summary in rows:
+        latency = summary["latency_ms"]
+        lines.append(
+            f"{name:<10} {summary['requests']:>6} "
+            f"{100.0 * summary['error_rate']:>6.2f} {summary['throughput']:>8.2f} "
+            + " ".join(f"{latency[label]:>9.2f}" for label, _ in REPORT_PERCENTILES)
+            + f" {summary['max_ms']:>9.2f}"
+        )
+    lines.append("")
+    lines.append("Latencies in ms, measured from each request's scheduled send time.")
+    return "\n".join(lines)
@@ -0,0 +1,282 @@
+"""Non-blocking logging setup.
+
+Request threads only put records on a bounded in-memory queue; a background
+listener thread formats and writes them. Messages use lazy ``%``-style
+arguments, so formatting happens on the writer thread and only for records
+that are actually emitted. Repetitive warnings (e.g. the parser's malformed
+response warnings) are rate limited per message template, and the number of
+suppressed records is reported with the next one that gets through.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Union
+
+ENV_LEVEL = "AGENT_LOG_LEVEL"
+ENV_FORMAT = "AGENT_LOG_FORMAT"
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most ``burst`` records per message template through every
+    ``interval`` seconds. Records above ``max_level`` are never limited.
+    """
+
+    # Forget idle templates once this many are tracked
+    _MAX_KEYS = 1024
+
+    def __init__(
+        self,
+        burst: int = 10,
+        interval: float = 60.0,
+        max_level: int = logging.WARNING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        if burst < 1 or interval <= 0:
+            raise ValueError("burst and interval must be positive")
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        self.suppressed_total = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (logger, level, template) -> [window start, passed, suppressed]
+        self._windows: Dict[Tuple[str, int, str], List[Any]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        msg = record.msg if isinstance(record.msg, str) else repr(record.msg)
+        key = (record.name, record.levelno, msg)
+        now = self._clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is None and len(self._windows) >= self._MAX_KEYS:
+                    self._prune(now)
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                self._windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            self.suppressed_total += 1
+            return False
+
+    def summaries(self) -> List[logging.LogRecord]:
+        """Records reporting suppressed counts not yet reported, then reset"""
+        records = []
+        with self._lock:
+            for (name, level, msg), window in self._windows.items():
+                if window[2]:
+                    records.append(
+                        logging.LogRecord(
+                            name,
+                            level,
+                            __file__,
+                            0,
+                            "Suppressed %d similar messages: %s",
+                            (window[2], msg),
+                            None,
+                        )
+                    )
+                    window[2] = 0
+        return records
+
+    def _prune(self, now: float) -> None:
+        stale = [
+            key
+            for key, window in self._windows.items()
+            if now - window[0] >= self.interval and not window[2]
+        ]
+        for key in stale:
+            del self._windows[key]
+
+
+class AsyncLogHandler(QueueHandler):
+    """Queue handler that never blocks and never formats on the caller's thread.
+
+    Records are enqueued as-is (arguments are merged later by the writer), so
+    callers should pass immutable values as log arguments. When the queue is
+    full the record is dropped and counted.
+    """
+
+    def __init__(self, queue_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text lines noting how many similar records were suppressed"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line = f"{line} ({suppressed} similar messages suppressed)"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _Writer(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Called from stop(); wait for room rather than fail on a full queue
+        self.queue.put(self._sentinel)
+
+
+class AsyncLogging:
+    """Owns the queue handler and the background writer thread"""
+
+    def __init__(
+        self,
+        target: logging.Handler,
+        queue_size: int = 10000,
+        rate_limit: Optional[RateLimitFilter] = None,
+    ):
+        self.target = target
+        self.rate_limit = rate_limit
+        self.handler = AsyncLogHandler(queue_size)
+        if rate_limit is not None:
+            self.handler.addFilter(rate_limit)
+        self._listener: Optional[_Writer] = None
+
+    def start(self) -> None:
+        self._listener = _Writer(
+            self.handler.queue, self.target, respect_handler_level=True
+        )
+        self._listener.start()
+
+    def stop(self) -> None:
+        """Flush queued records and suppressed-count summaries"""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+        if self.rate_limit is not None:
+            for record in self.rate_limit.summaries():
+                self.target.handle(record)
+        self.target.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.handler.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "suppressed": self.rate_limit.suppressed_total if self.rate_limit else 0,
+        }
+
+    def _after_fork_in_child(self) -> None:
+        # The writer thread does not survive fork and the old queue's lock may
+        # have been held by it, so start over with a fresh queue and thread.
+        if self._listener is None:
+            return
+        self.handler.queue = queue.Queue(maxsize=self.handler.queue_size)
+        self.start()
+
+
+_active: Optional[AsyncLogging] = None
+_atexit_registered = False
+
+
+def _after_fork_in_child() -> None:
+    if _active is not None:
+        _active._after_fork_in_child()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def configure_logging(
+    level: Union[int, str, None] = None,
+    json_format: Optional[bool] = None,
+    stream: Optional[TextIO] = None,
+    queue_size: int = 10000,
+    burst: int = 10,
+    interval: float = 60.0,
+) -> AsyncLogging:
+    """Route the root logger through a background writer.
+
+    ``level`` and ``json_format`` default to AGENT_LOG_LEVEL (INFO) and
+    AGENT_LOG_FORMAT (``text`` or ``json``). Replaces any handlers on the root
+    logger, like ``basicConfig(force=True)``.
+    """
+    global _active, _atexit_registered
+    if level is None:
+        level = os.environ.get(ENV_LEVEL, "INFO").upper()
+    if json_format is None:
+        json_format = os.environ.get(ENV_FORMAT, "text").lower() == "json"
+
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter() if json_format else TextFormatter(TEXT_FORMAT))
+    async_logging = AsyncLogging(
+        target, queue_size, RateLimitFilter(burst=burst, interval=interval)
+    )
+
+    root = logging.getLogger()
+    if _active is not None:
+        _active.stop()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(async_logging.handler)
+    root.setLevel(level)
+
+    async_logging.start()
+    _active = async_logging
+    if not _atexit_registered:
+        # One hook flushes whichever setup is active at exit
+        atexit.register(shutdown)
+        _atexit_registered = True
+    return async_logging
+
+
+def shutdown() -> None:
+    """Stop the background writer after flushing queued records"""
+    if _active is not None:
+        _active.stop()
+
+
+def stats() -> Dict[str, int]:
+    """Queue, drop and suppression counters of the active setup, if any"""
+    return _active.stats() if _active is not None else {}
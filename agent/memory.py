@@ -0,0 +1,273 @@
+"""Opt-in per-request memory accounting and heap growth reports.
+
+While enabled, :mod:`tracemalloc` traces every allocation in the process.
+One in ``every`` requests is accounted: for the request and for each of its
+pipeline stages, the peak traced memory above the level at entry and the
+bytes still allocated at exit (retained) are recorded, per stage and per
+tool. Tracing is process-wide, so allocations made by concurrent requests
+are included; only one request is accounted at a time to keep them apart
+from each other.
+
+A background thread takes a heap snapshot every ``snapshot_interval``
+seconds and compares it with the previous one. Allocation sites that keep
+growing over consecutive intervals are the usual suspects for a leak.
+"""
+
+import contextlib
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+from . import profiling
+
+# Allocations by the import system and tracemalloc itself are noise
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryConfig(BaseModel):
+    """Sampling and heap snapshot settings for memory accounting"""
+
+    every: int = Field(default=100, ge=1)  # account one in N requests
+    # Seconds between heap snapshots; None disables growth reports
+    snapshot_interval: Optional[float] = Field(default=300.0, gt=0.0)
+    top: int = Field(default=10, ge=1)  # growing sites reported
+    frames: int = Field(default=1, ge=1)  # traceback depth per allocation
+
+
+class _Usage:
+    """Running totals of peak and retained bytes"""
+
+    __slots__ = ("count", "peak_total", "peak_max", "retained_total")
+
+    def __init__(self):
+        self.count = 0
+        self.peak_total = 0
+        self.peak_max = 0
+        self.retained_total = 0
+
+    def add(self, peak: int, retained: int) -> None:
+        self.count += 1
+        self.peak_total += peak
+        self.peak_max = max(self.peak_max, peak)
+        self.retained_total += retained
+
+    def summary(self) -> Dict[str, Any]:
+        count = self.count or 1
+        return {
+            "count": self.count,
+            "peak_mean": self.peak_total / count,
+            "peak_max": self.peak_max,
+            "retained_mean": self.retained_total / count,
+            "retained_total": self.retained_total,
+        }
+
+
+class _Frame:
+    __slots__ = ("name", "start", "peak")
+
+    def __init__(self, name: str, start: int):
+        self.name = name
+        self.start = start
+        self.peak = start  # highest traced memory seen, absolute
+
+
+class MemorySample:
+    """Accounting of one request; a stage observer for ``profiling.observe``"""
+
+    def __init__(self):
+        self.stack: List[_Frame] = []
+        self.stages: Dict[str, List[int]] = {}  # name -> [peak, retained]
+        self.tool: Optional[str] = None
+        self.peak = 0
+        self.retained = 0
+
+    def enter(self, name: str) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            # The enclosing frame's peak must survive the reset below
+            parent = self.stack[-1]
+            parent.peak = max(parent.peak, peak)
+        tracemalloc.reset_peak()
+        self.stack.append(_Frame(name, current))
+
+    def exit(self, name: str) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        frame = self.stack.pop()
+        frame.peak = max(frame.peak, peak)
+        if self.stack:
+            parent = self.stack[-1]
+            parent.peak = max(parent.peak, frame.peak)
+        usage = self.stages.setdefault(name, [0, 0])
+        usage[0] = max(usage[0], frame.peak - frame.start)
+        usage[1] += current - frame.start
+        if not self.stack:
+            self.peak = frame.peak - frame.start
+            self.retained = current - frame.start
+
+
+class MemoryTracker:
+    """Samples requests for memory use and reports heap growth"""
+
+    def __init__(self, config: Optional[MemoryConfig] = None):
+        self.config = config or MemoryConfig()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        # Held by the one request being accounted
+        self._sampling = threading.Lock()
+        self.requests = 0
+        self.sampled = 0
+        self._request = _Usage()
+        self._stages: Dict[str, _Usage] = {}
+        self._tools: Dict[str, _Usage] = {}
+        self._started_tracing = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._growth: Dict[str, Any] = {}
+        self._streaks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self.start()
+
+    def start(self) -> None:
+        """Start tracing allocations (and the snapshot thread)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.frames)
+            self._started_tracing = True
+        self._stop.clear()
+        self._thread_pid = os.getpid()
+        if self.config.snapshot_interval is not None:
+            self._thread = threading.Thread(
+                target=self._snapshot_loop, name="agent-memory", daemon=True
+            )
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop the snapshot thread and, if this tracker started it, tracing"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        self._thread, self._thread_pid = None, None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    @contextlib.contextmanager
+    def request(self) -> Iterator[Optional[MemorySample]]:
+        """Account the enclosed request if it is selected; yields the sample.
+
+        The caller may set ``sample.tool`` before leaving the block.
+        """
+        if self._thread_pid != os.getpid() and not self._stop.is_set():
+            self.start()  # forked: threads do not survive fork
+        selected = next(self._counter) % self.config.every == 0
+        if (
+            not selected
+            or not tracemalloc.is_tracing()
+            or not self._sampling.acquire(blocking=False)
+        ):
+            with self._lock:
+                self.requests += 1
+            yield None
+            return
+        sample = MemorySample()
+        try:
+            with profiling.observe(sample):
+                sample.enter("request")
+                try:
+                    yield sample
+                finally:
+                    sample.exit("request")
+        finally:
+            self._sampling.release()
+            self._merge(sample)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Take a heap snapshot now and compare it with the previous one"""
+        if not tracemalloc.is_tracing():
+            return {}
+        # Not while a request is being accounted, which it would distort
+        with self._sampling:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return {}
+        diffs = snapshot.compare_to(previous, "lineno")
+        streaks: Dict[str, int] = {}
+        growing = []
+        for diff in diffs:
+            if diff.size_diff > 0:
+                site = _site(diff.traceback)
+                streaks[site] = self._streaks.get(site, 0) + 1
+                growing.append((diff, site))
+        growing.sort(key=lambda item: -item[0].size_diff)
+        growth = {
+            "taken_at": time.time(),
+            "total_growth": sum(diff.size_diff for diff in diffs),
+            "top": [
+                {
+                    "site": site,
+                    "size_diff": diff.size_diff,
+                    "count_diff": diff.count_diff,
+                    "size": diff.size,
+                    "intervals_growing": streaks[site],
+                }
+                for diff, site in growing[: self.config.top]
+            ],
+        }
+        with self._lock:
+            self._streaks = streaks
+            self._growth = growth
+        return growth
+
+    def stats(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            return {
+                "tracing": tracing,
+                "traced_bytes": current,
+                "tracemalloc_overhead_bytes": (
+                    tracemalloc.get_tracemalloc_memory() if tracing else 0
+                ),
+                "requests": self.requests,
+                "sampled": self.sampled,
+                "request": self._request.summary(),
+                "stages": {n: u.summary() for n, u in self._stages.items()},
+                "tools": {n: u.summary() for n, u in self._tools.items()},
+                "growth": dict(self._growth),
+            }
+
+    def _merge(self, sample: MemorySample) -> None:
+        with self._lock:
+            self.requests += 1
+            self.sampled += 1
+            self._request.add(sample.peak, sample.retained)
+            for name, (peak, retained) in sample.stages.items():
+                if name != "request":
+                    self._stages.setdefault(name, _Usage()).add(peak, retained)
+            if sample.tool is not None:
+                usage = self._tools.setdefault(sample.tool, _Usage())
+                usage.add(sample.peak, sample.retained)
+
+    def _snapshot_loop(self) -> None:
+        interval = self.config.snapshot_interval
+        self.snapshot()  # baseline
+        while not self._stop.wait(interval):
+            self.snapshot()
+
+
+def _site(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
@@ -1,34 +1,117 @@
-import json
 import logging
 import re
-from typing import Any, Dict, Optional, Union
+import threading
+import time
+import weakref
+from typing import Any, Container, Dict, List, NamedTuple, Optional, Set, Union
 
-from .schemas import ToolPlan, ToolType
+from pydantic import BaseModel, Field
+
+from . import json_backends
+from .json_backends import JSONBackend
+from .schemas import ToolPlan, is_tool_name
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BACKEND = "default"
+
+# String parse strategies in precedence order. The order they are *tried* in
+# adapts per backend, but a plan is only accepted once every applicable
+# strategy ahead of it in this tuple has been ruled out, so results never
+# depend on the adaptive order.
+STRATEGIES = ("json", "json_repair", "structured")
+
+_LEADING_WS = re.compile(r"\s*")
+_LEADING_WS_BYTES = re.compile(rb"\s*")
+
+# Raw responses from a network backend, parsed without decoding to str first
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+# Every pattern below runs in time linear in its input. The structured pattern
+# is only ever matched at a "TOOL:" marker and over a bounded window, and the
+# repair patterns can only start at a quote or at the start of a word, so no
+# run of characters is rescanned from more than one starting position.
+_STRUCTURED_MARKER = "TOOL:"
+_STRUCTURED_MARKER_BYTES = re.compile(b"TOOL:")
+_STRUCTURED = re.compile(r'TOOL:(\w+)\s+(\w+)=(["\']?)([^"\']+)\3')
+_MISSING_COMMA = re.compile(r'"\s+"([^"]+)":')
+_UNQUOTED_KEY = re.compile(r"\b(\w+):")
+
+
+class ParserLimits(BaseModel):
+    """Input size caps that bound the cost of parsing one response"""
+
+    # Longer responses are cut to this many characters (bytes for raw input)
+    # before parsing, so a direct answer comes back truncated (None: no limit)
+    max_input_chars: Optional[int] = Field(default=1 << 20, ge=1)
+    # Characters examined after each "TOOL:" marker; longer values are cut
+    structured_window: int = Field(default=4096, ge=16)
+
+
+_limits = ParserLimits()
+
+
+def _default_json_backend() -> JSONBackend:
+    try:
+        return json_backends.get_backend()
+    except ValueError as e:
+        logger.warning("%s; using the fastest installed JSON backend", e)
+        return json_backends.get_backend(json_backends.available()[0])
+
+
+_json = _default_json_backend()
+
+
+class ParseResult(NamedTuple):
+    value: Optional[Union[str, ToolPlan]]
+    # How the value was obtained: "plan", "dict", a string strategy name,
+    # "text" for a direct answer, or "none"
+    path: str
+
 
 class ResponseParser:
     """Parser for handling various LLM response formats"""
 
     @staticmethod
     def parse_response(
-        response: Union[str, dict, ToolPlan],
+        response: Union[str, bytes, bytearray, memoryview, dict, ToolPlan],
+        backend: str = DEFAULT_BACKEND,
+        tools: Optional[Container[str]] = None,
     ) -> Optional[Union[str, ToolPlan]]:
-        """Parse LLM response into either a direct answer or tool plan"""
+        """Parse LLM response into either a direct answer or tool plan.
+
+        Raw UTF-8 ``bytes`` or a ``memoryview`` over a network buffer are
+        decoded as JSON in place; they are only converted to ``str`` when a
+        text strategy or a direct answer needs it. ``backend`` keys the
+        strategy statistics used to order string parsing. Plans may only
+        name one of ``tools`` (usually the agent's ToolRegistry; default: the
+        built-in tools).
+        """
+        return ResponseParser.parse(response, backend, tools).value
+
+    @staticmethod
+    def parse(
+        response: Union[str, bytes, bytearray, memoryview, dict, ToolPlan],
+        backend: str = DEFAULT_BACKEND,
+        tools: Optional[Container[str]] = None,
+    ) -> ParseResult:
+        """Like ``parse_response``, also reporting which path produced the value"""
         if isinstance(response, ToolPlan):
-            return response
+            return ParseResult(response, "plan")
 
         if isinstance(response, dict):
-            return ResponseParser._parse_dict_response(response)
+            plan = ResponseParser._parse_dict_response(response, tools)
+            return ParseResult(plan, "dict" if plan is not None else "none")
 
-        if isinstance(response, str):
-            return ResponseParser._parse_string_response(response)
+        if isinstance(response, (str,) + BYTES_TYPES):
+            return ResponseParser._parse_string_response(response, backend, tools)
 
-        return None
+        return ParseResult(None, "none")
 
     @staticmethod
-    def _parse_dict_response(response: Dict[str, Any]) -> Optional[ToolPlan]:
+    def _parse_dict_response(
+        response: Dict[str, Any], tools: Optional[Container[str]] = None
+    ) -> Optional[ToolPlan]:
         """Parse dictionary response into ToolPlan"""
         try:
             if "tool" in response and "args" in response:
@@ -39,54 +122,105 @@ class ResponseParser:
                     tool_name = "weather"
 
                 # Validate tool type
-                try:
-                    tool_type = ToolType(tool_name)
-                except ValueError:
-                    logger.warning(f"Invalid tool type: {tool_name}")
+                if not is_tool_name(tool_name, tools):
+                    logger.warning("Invalid tool type: %s", tool_name)
                     return None
 
-                return ToolPlan(
-                    tool=tool_type,
-                    args=response["args"],
-                    confidence=response.get("confidence", 1.0),
+                return _plan(
+                    tool_name,
+                    response["args"],
+                    response.get("confidence", 1.0),
+                    tools,
                 )
         except Exception as e:
-            logger.warning(f"Error parsing dict response: {e}")
+            logger.warning("Error parsing dict response: %s", e)
 
         return None
 
     @staticmethod
-    def _parse_string_response(response: str) -> Optional[Union[str, ToolPlan]]:
+    def _parse_string_response(
+        response: Union[str, bytes, bytearray, memoryview],
+        backend: str = DEFAULT_BACKEND,
+        tools: Optional[Container[str]] = None,
+    ) -> ParseResult:
         """Parse string response - could be JSON, structured text, or direct answer"""
-        # Parse as JSON first
-        json_plan = ResponseParser._try_parse_json(response)
-        if json_plan:
-            return json_plan
+        stats = _strategy_stats.backend(backend)
+        limit = _limits.max_input_chars
+        if limit is not None and len(response) > limit:
+            logger.warning(
+                "Truncating %d-char response to %d chars", len(response), limit
+            )
+            stats.record_truncation()
+            response = response[:limit]
+        state = _ParseState(response, tools)
+        pending: Optional[ToolPlan] = None
+        pending_rank = len(STRATEGIES)
+
+        for name in stats.order():
+            rank = STRATEGIES.index(name)
+            # Once a plan is found, only higher-precedence strategies can override
+            if rank >= pending_rank:
+                continue
+            if not state.applies(name):
+                stats.record_skip(name)
+                continue
+
+            start = time.perf_counter()
+            plan = _STRATEGY_FUNCS[name](state)
+            stats.record_attempt(name, plan is not None, time.perf_counter() - start)
 
-        # Parse structured format like "TOOL:calc EXPR=..."
-        structured_plan = ResponseParser._try_parse_structured(response)
-        if structured_plan:
-            return structured_plan
+            if plan is not None:
+                pending, pending_rank = plan, rank
+                if not state.outranked(rank):
+                    break
 
-        return response.strip()
+        if pending is not None:
+            return ParseResult(pending, STRATEGIES[pending_rank])
+
+        stats.record_fallback()
+        return ParseResult(state.text.strip(), "text")
 
     @staticmethod
-    def _try_parse_json(response: str) -> Optional[ToolPlan]:
+    def _try_parse_json(
+        response: str, tools: Optional[Container[str]] = None
+    ) -> Optional[ToolPlan]:
         """Attempt to parse as JSON, with error recovery"""
-        try:
-            data = json.loads(response)
-            return ResponseParser._parse_dict_response(data)
-        except json.JSONDecodeError:
-            # Fix common JSON errors
-            fixed_response = ResponseParser._fix_common_json_errors(response)
-            if fixed_response != response:
-                try:
-                    data = json.loads(fixed_response)
-                    return ResponseParser._parse_dict_response(data)
-                except json.JSONDecodeError:
-                    pass
+        state = _ParseState(response, tools)
+        return _try_json(state) or (
+            _try_json_repair(state) if state.json_decode_failed else None
+        )
 
-        return None
+    @staticmethod
+    def strategy_stats(backend: Optional[str] = None) -> Dict[str, Any]:
+        """Per-backend hit rates and timings for each string parse strategy"""
+        return _strategy_stats.snapshot(backend)
+
+    @staticmethod
+    def reset_strategy_stats() -> None:
+        """Forget all collected strategy statistics"""
+        _strategy_stats.reset()
+
+    @staticmethod
+    def json_backend() -> JSONBackend:
+        """JSON decoder used for string and bytes responses"""
+        return _json
+
+    @staticmethod
+    def set_json_backend(name: Optional[str] = None) -> None:
+        """Switch JSON decoder ("orjson", "msgspec", "json"; None: fastest)"""
+        global _json
+        _json = json_backends.get_backend(name)
+
+    @staticmethod
+    def limits() -> ParserLimits:
+        """Input size caps currently applied to string responses"""
+        return _limits
+
+    @staticmethod
+    def set_limits(limits: Optional[ParserLimits] = None) -> None:
+        """Replace the input size caps (None restores the defaults)"""
+        global _limits
+        _limits = limits or ParserLimits()
 
     @staticmethod
     def _fix_common_json_errors(response: str) -> str:
@@ -96,35 +230,328 @@ class ResponseParser:
             response = response + "}" * (response.count("{") - response.count("}"))
 
         # Fix missing commas between key-value pairs
-        response = re.sub(r'"\s+"([^"]+)":', r'", "\1":', response)
+        response = _MISSING_COMMA.sub(r'", "\1":', response)
 
         # Fix unquoted keys
-        response = re.sub(r"(\w+):", r'"\1":', response)
+        response = _UNQUOTED_KEY.sub(r'"\1":', response)
 
         return response
 
     @staticmethod
-    def _try_parse_structured(response: str) -> Optional[ToolPlan]:
+    def _try_parse_structured(
+        response: str, tools: Optional[Container[str]] = None
+    ) -> Optional[ToolPlan]:
         """Parse structured format like 'TOOL:calc EXPR="1+1"'"""
-        # Match patterns like "TOOL:toolname PARAM=value"
-        pattern = r'TOOL:(\w+)\s+(\w+)=(["\']?)([^"\']+)\3'
-        match = re.search(pattern, response)
+        # Match patterns like "TOOL:toolname PARAM=value", trying each marker
+        # in turn over a bounded window instead of searching the whole string
+        window = _limits.structured_window
+        match = None
+        pos = response.find(_STRUCTURED_MARKER)
+        while pos != -1:
+            match = _STRUCTURED.match(response, pos, pos + window)
+            if match:
+                break
+            pos = response.find(_STRUCTURED_MARKER, pos + 1)
 
         if match:
             tool_name = match.group(1)
             param_name = match.group(2).lower()
             param_value = match.group(4)
 
-            try:
-                tool_type = ToolType(tool_name)
-                args = {param_name: param_value}
+            if is_tool_name(tool_name, tools):
+                # Lower confidence for non-standard format
+                return _plan(tool_name, {param_name: param_value}, 0.7, tools)
+            logger.warning("Invalid tool type in structured format: %s", tool_name)
 
-                return ToolPlan(
-                    tool=tool_type,
-                    args=args,
-                    confidence=0.7,  # Lower confidence for non-standard format
-                )
-            except ValueError:
-                logger.warning(f"Invalid tool type in structured format: {tool_name}")
+        return None
+
+
+class _ParseState:
+    """Per-call classifier results shared between strategies"""
+
+    __slots__ = (
+        "response",
+        "json_candidate",
+        "_text",
+        "_structured",
+        "json_decode_failed",
+        "tools",
+    )
+
+    def __init__(
+        self,
+        response: Union[str, bytes, bytearray, memoryview],
+        tools: Optional[Container[str]] = None,
+    ):
+        self.response = response
+        self.tools = tools
+        is_text = isinstance(response, str)
+        self._text: Optional[str] = response if is_text else None
+        # A JSON document can only decode to a dict if it starts with "{", and
+        # the repair step never adds a leading brace.
+        leading_ws = _LEADING_WS if is_text else _LEADING_WS_BYTES
+        start = leading_ws.match(response).end()
+        if is_text:
+            self.json_candidate = response.startswith("{", start)
+        else:
+            self.json_candidate = start < len(response) and response[start] == ord("{")
+        self._structured: Optional[bool] = None
+        self.json_decode_failed: Optional[bool] = None
+
+    @property
+    def text(self) -> str:
+        """The response as str, decoded from bytes on first use"""
+        if self._text is None:
+            self._text = str(self.response, "utf-8", "replace")
+        return self._text
+
+    @property
+    def structured_candidate(self) -> bool:
+        if self._structured is None:
+            if self._text is not None:
+                self._structured = _STRUCTURED_MARKER in self._text
+            else:
+                found = _STRUCTURED_MARKER_BYTES.search(self.response)
+                self._structured = found is not None
+        return self._structured
 
+    def applies(self, name: str) -> bool:
+        if name == "json":
+            return self.json_candidate
+        if name == "json_repair":
+            # Repair only runs after a plain decode failed
+            return bool(self.json_decode_failed)
+        return self.structured_candidate
+
+    def outranked(self, rank: int) -> bool:
+        """Whether an applicable strategy ahead of ``rank`` is still untried"""
+        for name in STRATEGIES[:rank]:
+            if name == "json" and self.json_candidate:
+                if self.json_decode_failed is None:
+                    return True
+            elif name == "json_repair" and self.json_candidate:
+                if self.json_decode_failed is None or self.json_decode_failed:
+                    return True
+        return False
+
+
+def _plan(
+    tool: str, args: Any, confidence: Any, tools: Optional[Container[str]]
+) -> ToolPlan:
+    return ToolPlan.model_validate(
+        {"tool": tool, "args": args, "confidence": confidence},
+        context={"tools": tools} if tools is not None else None,
+    )
+
+
+def _try_json(state: _ParseState) -> Optional[ToolPlan]:
+    try:
+        data = _json.loads(state.response)
+    except ValueError:
+        state.json_decode_failed = True
         return None
+    state.json_decode_failed = False
+    return ResponseParser._parse_dict_response(data, state.tools)
+
+
+def _try_json_repair(state: _ParseState) -> Optional[ToolPlan]:
+    response = state.text
+    fixed_response = ResponseParser._fix_common_json_errors(response)
+    if fixed_response != response:
+        try:
+            data = _json.loads(fixed_response)
+            return ResponseParser._parse_dict_response(data, state.tools)
+        except ValueError:
+            pass
+    return None
+
+
+def _try_structured(state: _ParseState) -> Optional[ToolPlan]:
+    return ResponseParser._try_parse_structured(state.text, state.tools)
+
+
+_STRATEGY_FUNCS = {
+    "json": _try_json,
+    "json_repair": _try_json_repair,
+    "structured": _try_structured,
+}
+
+
+class _StatsShard:
+    """One thread's counters, summed by ``snapshot``"""
+
+    __slots__ = ("counters", "weights", "pending", "fallbacks", "truncated")
+
+    def __init__(self):
+        # name -> [attempts, hits, skipped, seconds]
+        self.counters: Dict[str, List[Any]] = {
+            name: [0, 0, 0, 0.0] for name in STRATEGIES
+        }
+        self.weights = {name: 0.0 for name in STRATEGIES}  # not yet merged
+        self.pending = 0  # parses not yet merged
+        self.fallbacks = 0
+        self.truncated = 0
+
+    def add_counts(self, other: "_StatsShard") -> None:
+        for name, counter in other.counters.items():
+            total = self.counters[name]
+            for i, value in enumerate(counter):
+                total[i] += value
+        self.fallbacks += other.fallbacks
+        self.truncated += other.truncated
+
+
+class _ShardToken:
+    """Held by a thread's local storage; collected when the thread exits"""
+
+    __slots__ = ("__weakref__",)
+
+
+class _BackendStrategyStats:
+    """Hit counters for one backend, with periodic decay and reordering.
+
+    Each thread counts into its own shard without locking; a shard's hit
+    weights are merged under the lock once every ``REORDER_EVERY`` of its
+    parses, which is also when the order is recomputed. When a thread exits
+    its counts are folded into ``_retired``, so short-lived request threads
+    do not leave shards behind.
+    """
+
+    # Halve counters every N parses so the order follows drifting traffic
+    DECAY_EVERY = 1024
+    REORDER_EVERY = 64
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._order: List[str] = list(STRATEGIES)
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.parses = 0  # merged parses
+            self._weights = {name: 0.0 for name in STRATEGIES}
+            self._order = list(STRATEGIES)
+            self._local = threading.local()
+            self._shards: Set[_StatsShard] = set()
+            self._retired = _StatsShard()
+
+    def order(self) -> List[str]:
+        return self._order
+
+    def _shard(self) -> _StatsShard:
+        local = self._local
+        shard = getattr(local, "shard", None)
+        if shard is None:
+            shard = local.shard = _StatsShard()
+            local.token = _ShardToken()
+            with self._lock:
+                self._shards.add(shard)
+            weakref.finalize(local.token, self._retire, local, shard)
+        return shard
+
+    def _retire(self, local: threading.local, shard: _StatsShard) -> None:
+        with self._lock:
+            if local is not self._local or shard not in self._shards:
+                return  # counted before a reset
+            self._shards.discard(shard)
+            self._retired.add_counts(shard)
+            self.parses += shard.pending
+            for name, weight in shard.weights.items():
+                self._weights[name] += weight
+
+    def record_skip(self, name: str) -> None:
+        self._shard().counters[name][2] += 1
+
+    def record_attempt(self, name: str, hit: bool, seconds: float) -> None:
+        shard = self._shard()
+        counter = shard.counters[name]
+        counter[0] += 1
+        counter[3] += seconds
+        if hit:
+            counter[1] += 1
+            shard.weights[name] += 1.0
+            self._tick(shard)
+
+    def record_truncation(self) -> None:
+        self._shard().truncated += 1
+
+    def record_fallback(self) -> None:
+        shard = self._shard()
+        shard.fallbacks += 1
+        self._tick(shard)
+
+    def _tick(self, shard: _StatsShard) -> None:
+        shard.pending += 1
+        if shard.pending >= self.REORDER_EVERY:
+            self._merge(shard)
+
+    def _merge(self, shard: _StatsShard) -> None:
+        with self._lock:
+            before = self.parses
+            self.parses += shard.pending
+            shard.pending = 0
+            weights = self._weights
+            for name, weight in shard.weights.items():
+                weights[name] += weight
+                shard.weights[name] = 0.0
+            if self.parses // self.DECAY_EVERY > before // self.DECAY_EVERY:
+                self._weights = {k: v / 2 for k, v in weights.items()}
+            # Stable sort keeps precedence order between equally likely strategies
+            order = sorted(STRATEGIES, key=lambda n: -self._weights[n])
+            # Repair depends on the plain decode having failed, so keep it after
+            order.remove("json_repair")
+            order.insert(order.index("json") + 1, "json_repair")
+            self._order = order
+
+    def snapshot(self) -> Dict[str, Any]:
+        totals = _StatsShard()
+        with self._lock:
+            parses = self.parses
+            order = list(self._order)
+            totals.add_counts(self._retired)
+            for shard in self._shards:
+                parses += shard.pending
+                totals.add_counts(shard)
+        strategies = {}
+        for name, (attempts, hits, skipped, seconds) in totals.counters.items():
+            strategies[name] = {
+                "attempts": attempts,
+                "hits": hits,
+                "skipped": skipped,
+                "seconds": seconds,
+                "hit_rate": hits / attempts if attempts else 0.0,
+            }
+        return {
+            "parses": parses,
+            "fallbacks": totals.fallbacks,
+            "truncated": totals.truncated,
+            "order": order,
+            "strategies": strategies,
+        }
+
+
+class _StrategyStats:
+    """Registry of per-backend strategy statistics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends: Dict[str, _BackendStrategyStats] = {}
+
+    def backend(self, name: str) -> _BackendStrategyStats:
+        stats = self._backends.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._backends.setdefault(name, _BackendStrategyStats())
+        return stats
+
+    def snapshot(self, backend: Optional[str] = None) -> Dict[str, Any]:
+        if backend is not None:
+            return self.backend(backend).snapshot()
+        return {name: stats.snapshot() for name, stats in list(self._backends.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._backends.clear()
+
+
+_strategy_stats = _StrategyStats()
@@ -0,0 +1,393 @@
+"""Opt-in request profiling with flamegraph-compatible output.
+
+``sample`` mode periodically captures the stacks of threads serving profiled
+requests, prefixed with the active pipeline stage and tool. ``cprofile`` mode
+uses :mod:`cProfile`. Only one in ``every`` requests is profiled.
+"""
+
+import contextlib
+import cProfile
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+MODES = ("sample", "cprofile")
+
+ENV_MODE = "AGENT_PROFILE"
+ENV_OUT = "AGENT_PROFILE_OUT"
+ENV_EVERY = "AGENT_PROFILE_EVERY"
+ENV_INTERVAL = "AGENT_PROFILE_INTERVAL"
+
+_session: ContextVar[Optional["_Session"]] = ContextVar(
+    "agent_profile_session", default=None
+)
+# Stage name -> seconds for the request being timed by ``timings``
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "agent_stage_timings", default=None
+)
+# Object told about stage entry and exit, see ``observe``
+_observer: ContextVar[Optional[Any]] = ContextVar("agent_stage_observer", default=None)
+
+
+class Profiler:
+    """Collects profiles for a sampled subset of requests"""
+
+    def __init__(
+        self,
+        mode: str = "sample",
+        every: int = 1,
+        interval: float = 0.005,
+        top: int = 20,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.mode = mode
+        self.every = every
+        self.interval = interval
+        self.top = top
+
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.profiled = 0
+        self.stacks: Counter = Counter()
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+
+        # thread id -> stage stack of the profiled request running on it
+        self._threads: Dict[int, List[str]] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats: Optional[pstats.Stats] = None
+
+    @classmethod
+    def from_env(cls, environ: Optional[Dict[str, str]] = None) -> Optional["Profiler"]:
+        """Build a profiler from AGENT_PROFILE* variables, or None if unset"""
+        environ = os.environ if environ is None else environ
+        mode = environ.get(ENV_MODE, "").strip().lower()
+        if not mode or mode in ("0", "off", "false"):
+            return None
+        if mode in ("1", "on", "true"):
+            mode = "sample"
+        return cls(
+            mode=mode,
+            every=int(environ.get(ENV_EVERY, "1")),
+            interval=float(environ.get(ENV_INTERVAL, "0.005")),
+        )
+
+    @contextlib.contextmanager
+    def request(self) -> Iterator[None]:
+        """Profile the enclosed request if it is selected by 1-in-N sampling"""
+        if next(self._counter) % self.every:
+            with self._lock:
+                self.requests += 1
+            yield
+            return
+
+        session = _Session(self)
+        token = _session.set(session)
+        session.attach()
+        try:
+            with session.stage("request"):
+                yield
+        finally:
+            session.detach(session.own_profile)
+            _session.reset(token)
+            session.finish()
+
+    def close(self) -> None:
+        """Stop the sampler thread"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+
+    def collapsed(self) -> List[str]:
+        """Collapsed stack lines (``frame;frame;frame count``)"""
+        with self._lock:
+            if self.mode == "cprofile":
+                return self._collapsed_from_cprofile()
+            return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+    def summary(self, top: Optional[int] = None) -> str:
+        """Human-readable top-N report"""
+        top = top or self.top
+        with self._lock:
+            lines = [
+                f"Profiled {self.profiled} of {self.requests} requests "
+                f"(mode={self.mode}, every={self.every})",
+                "",
+                "Stage wall time:",
+            ]
+            for name, seconds in sorted(
+                self.stage_seconds.items(), key=lambda kv: -kv[1]
+            ):
+                lines.append(f"  {seconds * 1000:10.2f} ms  {name}")
+
+            lines.append("")
+            if self.mode == "cprofile":
+                lines.append(f"Top {top} functions by own time:")
+                for func, own, total, calls in self._cprofile_top(top):
+                    lines.append(
+                        f"  {own * 1000:10.2f} ms  {total * 1000:10.2f} ms  "
+                        f"{calls:8d}  {func}"
+                    )
+            else:
+                total = sum(self.stacks.values()) or 1
+                own: Counter = Counter()
+                for stack, count in self.stacks.items():
+                    own[stack.rsplit(";", 1)[-1]] += count
+                lines.append(f"Top {top} frames by own samples ({total} samples):")
+                for frame, count in own.most_common(top):
+                    lines.append(
+                        f"  {count:8d}  {100.0 * count / total:5.1f}%  {frame}"
+                    )
+        return "\n".join(lines)
+
+    def write(self, prefix: str) -> None:
+        """Write ``<prefix>.collapsed`` and ``<prefix>.txt``"""
+        with open(f"{prefix}.collapsed", "w") as f:
+            for line in self.collapsed():
+                f.write(line + "\n")
+        with open(f"{prefix}.txt", "w") as f:
+            f.write(self.summary() + "\n")
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is not None:
+            return
+        with self._lock:
+            if self._sampler is None:
+                self._stop.clear()
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, name="agent-profiler", daemon=True
+                )
+                self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = {tid: list(stack) for tid, stack in self._threads.items()}
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, stages in threads.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                samples.append(";".join(stages + _frame_stack(frame)))
+            with self._lock:
+                self.stacks.update(samples)
+
+    def _merge(self, session: "_Session") -> None:
+        with self._lock:
+            self.requests += 1
+            self.profiled += 1
+            for name, seconds in session.stage_seconds.items():
+                self.stage_seconds[name] += seconds
+            for prof in session.profiles:
+                try:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(prof)
+                    else:
+                        self._stats.add(prof)
+                except TypeError:
+                    # Profile recorded nothing
+                    continue
+
+    def _cprofile_top(self, top: int):
+        if self._stats is None:
+            return []
+        rows = []
+        for func, (_cc, calls, own, total, _callers) in self._stats.stats.items():
+            rows.append((_format_func(func), own, total, calls))
+        rows.sort(key=lambda row: -row[1])
+        return rows[:top]
+
+    def _collapsed_from_cprofile(self) -> List[str]:
+        # cProfile only records caller/callee pairs, so emit two-frame stacks
+        # weighted by own time in microseconds.
+        if self._stats is None:
+            return []
+        lines = []
+        for func, (_cc, _nc, own, _ct, callers) in self._stats.stats.items():
+            name = _format_func(func)
+            if not callers:
+                weight = int(own * 1e6)
+                if weight:
+                    lines.append(f"{name} {weight}")
+                continue
+            for caller, caller_stats in callers.items():
+                weight = int(caller_stats[2] * 1e6)
+                if weight:
+                    lines.append(f"{_format_func(caller)};{name} {weight}")
+        return lines
+
+
+class _Session:
+    """State for one profiled request"""
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+        self.stages: List[str] = []
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self.own_profile: Optional[cProfile.Profile] = None
+
+    def attach(self, stages: Optional[List[str]] = None) -> Optional[cProfile.Profile]:
+        """Start profiling the calling thread"""
+        profiler = self.profiler
+        if profiler.mode == "cprofile":
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                # Python 3.12+ allows only one active cProfile at a time
+                return None
+            with self._lock:
+                self.profiles.append(prof)
+            if stages is None:
+                self.own_profile = prof
+            return prof
+
+        with profiler._lock:
+            profiler._threads[threading.get_ident()] = (
+                self.stages if stages is None else stages
+            )
+        profiler._ensure_sampler()
+        return None
+
+    def detach(self, prof: Optional[cProfile.Profile] = None) -> None:
+        if self.profiler.mode == "cprofile":
+            if prof is not None:
+                prof.disable()
+            return
+        with self.profiler._lock:
+            self.profiler._threads.pop(threading.get_ident(), None)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, stages: Optional[List[str]] = None) -> Iterator[None]:
+        stack = self.stages if stages is None else stages
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            with self._lock:
+                self.stage_seconds[name] += elapsed
+
+    def finish(self) -> None:
+        self.profiler._merge(self)
+
+
+def stage(name: str):
+    """Mark a pipeline stage of the current request (no-op when not profiled)"""
+    session = _session.get()
+    times = _timings.get()
+    observer = _observer.get()
+    if times is not None or observer is not None:
+        return _timed_stage(name, times, session, observer)
+    if session is None:
+        return contextlib.nullcontext()
+    return session.stage(name)
+
+
+@contextlib.contextmanager
+def timings() -> Iterator[Dict[str, float]]:
+    """Collect the wall time of each stage of the enclosed request.
+
+    Cheaper than profiling and independent of it: only ``stage`` durations
+    are recorded, into the yielded dict.
+    """
+    times: Dict[str, float] = {}
+    token = _timings.set(times)
+    try:
+        yield times
+    finally:
+        _timings.reset(token)
+
+
+@contextlib.contextmanager
+def observe(observer: Any) -> Iterator[Any]:
+    """Call ``observer.enter(name)`` and ``observer.exit(name)`` around each
+    stage of the enclosed request"""
+    token = _observer.set(observer)
+    try:
+        yield observer
+    finally:
+        _observer.reset(token)
+
+
+@contextlib.contextmanager
+def _timed_stage(
+    name: str,
+    times: Optional[Dict[str, float]],
+    session: Optional[_Session],
+    observer: Any = None,
+) -> Iterator[None]:
+    if observer is not None:
+        observer.enter(name)
+    start = time.perf_counter()
+    try:
+        if session is None:
+            yield
+        else:
+            with session.stage(name):
+                yield
+    finally:
+        if times is not None:
+            times[name] = times.get(name, 0.0) + time.perf_counter() - start
+        if observer is not None:
+            observer.exit(name)
+
+
+def bind(fn: Callable[..., Any], label: str) -> Callable[..., Any]:
+    """Wrap fn so that running it on another thread is attributed to ``label``.
+
+    Returns fn unchanged when the current request is not being profiled.
+    """
+    session = _session.get()
+    if session is None:
+        return fn
+    parent = list(session.stages)
+
+    def profiled(*args: Any, **kwargs: Any) -> Any:
+        stages = list(parent)
+        prof = session.attach(stages)
+        try:
+            with session.stage(label, stages):
+                return fn(*args, **kwargs)
+        finally:
+            session.detach(prof)
+
+    return profiled
+
+
+def _frame_stack(frame) -> List[str]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _format_func(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}:{name}"
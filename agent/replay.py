@@ -0,0 +1,350 @@
+"""Record production requests and replay them without the LLM.
+
+``TraceRecorder`` appends one JSON line per answered request: the question,
+the raw LLM response, the parsed plan, the tool result, the answer and the
+stage timings. ``Replayer`` feeds the recorded LLM responses back through an
+agent's ``ResponseParser``, ``ToolRegistry`` and ``_format_tool_result``, as
+fast as possible or at the recorded pacing, and checks every answer against
+the recording. Parser and tool changes can then be benchmarked and
+regression-tested on real traffic, with the LLM's randomness taken out.
+"""
+
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from . import profiling
+from .schemas import ToolPlan, ToolResult
+from .stats import summarize_ms
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "agent-trace"
+FORMAT_VERSION = 1
+
+PACINGS = ("fast", "original")
+
+# Stages replayed; "llm" and "cache" are not
+REPLAYED_STAGES = ("parse", "tool", "format")
+
+# Mismatches kept in the report
+_MAX_MISMATCHES = 20
+
+# Threads for original pacing, where recorded requests overlap
+_PACED_WORKERS = 32
+
+
+def encode_response(response: Any) -> Optional[Dict[str, Any]]:
+    """JSON form of a raw LLM response, as passed to the parser"""
+    if response is None:
+        return None
+    if isinstance(response, ToolPlan):
+        return {"plan": response.model_dump()}
+    if isinstance(response, dict):
+        return {"dict": response}
+    if isinstance(response, (bytes, bytearray, memoryview)):
+        return {"bytes": base64.b64encode(bytes(response)).decode("ascii")}
+    return {"text": str(response)}
+
+
+def decode_response(data: Optional[Dict[str, Any]]) -> Any:
+    if data is None:
+        return None
+    if "plan" in data:
+        # Rebuilt as returned, even if the tool has since been removed
+        return ToolPlan.model_construct(**data["plan"])
+    if "dict" in data:
+        return data["dict"]
+    if "bytes" in data:
+        return base64.b64decode(data["bytes"])
+    return data["text"]
+
+
+def _plan(plan: Optional[ToolPlan]) -> Optional[Dict[str, Any]]:
+    return {"tool": plan.tool, "args": plan.args} if plan is not None else None
+
+
+def _result(result: Optional[ToolResult]) -> Optional[Dict[str, Any]]:
+    return result.model_dump() if result is not None else None
+
+
+class TraceRecorder:
+    """Appends request records to a JSON-lines trace file.
+
+    Each record is one ``write`` to a file opened for appending, so forked
+    workers sharing a recorder do not interleave their lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.records = 0
+        if os.fstat(self._fd).st_size == 0:
+            header = {
+                "format": FORMAT,
+                "version": FORMAT_VERSION,
+                "created": time.time(),
+            }
+            self._write(header)
+
+    def record(
+        self,
+        question: str,
+        session_id: Optional[str],
+        answer: str,
+        outcome: Any,
+        total: float,
+        stages: Dict[str, float],
+        ts: float,
+    ) -> None:
+        """Append one request; ``outcome`` is the agent's per-request outcome"""
+        self._write(
+            {
+                "ts": ts,
+                "question": question,
+                "session_id": session_id,
+                "response": encode_response(outcome.response),
+                "path": outcome.path,
+                "plan": _plan(outcome.plan),
+                "tool_result": _result(outcome.result),
+                "answer": answer,
+                "outcome": outcome.status,
+                "total_ms": 1000.0 * total,
+                "stages_ms": {name: 1000.0 * t for name, t in stages.items()},
+            }
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        line = (json.dumps(data, default=str) + "\n").encode()
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, line)
+            self.records += 1
+
+
+class Trace(NamedTuple):
+    header: Dict[str, Any]
+    records: List[Dict[str, Any]]
+
+
+def load_trace(path: str) -> Trace:
+    """Read a trace file; raises ValueError if it is not one"""
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    if not lines:
+        raise ValueError(f"{path} is empty")
+    header = json.loads(lines[0])
+    if header.get("format") != FORMAT:
+        raise ValueError(f"{path} is not an agent trace")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"{path} was written by a newer version")
+    return Trace(header, [json.loads(line) for line in lines[1:]])
+
+
+class Replayed(NamedTuple):
+    """One replayed record"""
+
+    index: int
+    answer: Optional[str]
+    plan: Optional[Dict[str, Any]]
+    stages: Dict[str, float]  # seconds
+    total: float  # seconds, parse to format
+    error: Optional[str] = None
+
+
+class Replayer:
+    """Replays a trace through an agent's parser, tools and formatter"""
+
+    def __init__(
+        self,
+        agent: Any,
+        trace: Trace,
+        pacing: str = "fast",
+        speed: float = 1.0,
+        concurrency: int = 1,
+    ):
+        if pacing not in PACINGS:
+            raise ValueError(f"pacing must be one of {PACINGS}")
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.agent = agent
+        self.trace = trace
+        self.pacing = pacing
+        self.speed = speed
+        self.concurrency = concurrency
+
+    def replayable(self) -> Iterator[int]:
+        """Indexes of records that reached the parser"""
+        for i, record in enumerate(self.trace.records):
+            if record.get("response") is not None:
+                yield i
+
+    def run(self) -> Dict[str, Any]:
+        indexes = list(self.replayable())
+        records = self.trace.records
+        results: List[Replayed] = []
+        started = time.perf_counter()
+        if self.pacing == "original" and indexes:
+            indexes.sort(key=lambda i: records[i]["ts"])
+            first = records[indexes[0]]["ts"]
+            workers = max(self.concurrency, _PACED_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = []
+                for i in indexes:
+                    due = started + (records[i]["ts"] - first) / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    futures.append(pool.submit(self.replay_one, i))
+                results = [future.result() for future in futures]
+        elif self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(self.replay_one, indexes))
+        else:
+            results = [self.replay_one(i) for i in indexes]
+        elapsed = time.perf_counter() - started
+        return self.report(results, elapsed)
+
+    def replay_one(self, index: int) -> Replayed:
+        """Parse, execute and format one recorded LLM response"""
+        record = self.trace.records[index]
+        agent = self.agent
+        plan = None
+        start = time.perf_counter()
+        with profiling.timings() as stages:
+            try:
+                response = decode_response(record["response"])
+                with profiling.stage("parse"):
+                    parsed = agent.parser.parse_response(
+                        response,
+                        backend=agent.llm_service.backend_name,
+                        tools=agent.tool_registry,
+                    )
+                if isinstance(parsed, ToolPlan):
+                    plan = _plan(parsed)
+                    answer = self._execute(parsed)
+                elif isinstance(parsed, str):
+                    answer = parsed
+                else:
+                    answer = "I'm sorry, I couldn't understand the response format."
+            except Exception as e:
+                logger.warning("Replay of record %d failed: %s", index, e)
+                return Replayed(
+                    index, None, plan, dict(stages), 0.0, f"{type(e).__name__}: {e}"
+                )
+        return Replayed(index, answer, plan, stages, time.perf_counter() - start)
+
+    def _execute(self, plan: ToolPlan) -> str:
+        registry = self.agent.tool_registry
+        tool = registry.get_tool(plan.tool)
+        if tool is None:
+            return f"Tool '{plan.tool}' is not available."
+        with profiling.stage("tool"):
+            result = registry.execute(tool, plan.args)
+        with profiling.stage("format"):
+            return self.agent._format_tool_result(result)
+
+    def report(self, results: List[Replayed], elapsed: float) -> Dict[str, Any]:
+        records = self.trace.records
+        mismatches = []
+        matched = plan_changes = errors = 0
+        for replayed in results:
+            record = records[replayed.index]
+            if replayed.error is not None:
+                errors += 1
+            if replayed.plan != record.get("plan"):
+                plan_changes += 1
+            if replayed.answer == record.get("answer"):
+                matched += 1
+            elif len(mismatches) < _MAX_MISMATCHES:
+                mismatches.append(
+                    {
+                        "index": replayed.index,
+                        "question": record.get("question"),
+                        "recorded": record.get("answer"),
+                        "replayed": replayed.answer,
+                        "error": replayed.error,
+                    }
+                )
+
+        stages: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for name in REPLAYED_STAGES + ("total",):
+            recorded = [
+                _recorded_seconds(records[r.index], name)
+                for r in results
+                if r.error is None
+            ]
+            replayed = [
+                r.total if name == "total" else r.stages.get(name, 0.0)
+                for r in results
+                if r.error is None
+            ]
+            stages[name] = {
+                "recorded": summarize_ms(recorded),
+                "replayed": summarize_ms(replayed),
+            }
+        return {
+            "records": len(records),
+            "replayed": len(results),
+            "skipped": len(records) - len(results),
+            "matched": matched,
+            "mismatched": len(results) - matched,
+            "plan_changes": plan_changes,
+            "errors": errors,
+            "elapsed": elapsed,
+            "throughput": len(results) / elapsed if elapsed > 0 else 0.0,
+            "pacing": self.pacing,
+            "stages_ms": stages,
+            "mismatches": mismatches,
+        }
+
+
+def _recorded_seconds(record: Dict[str, Any], name: str) -> float:
+    stages = record.get("stages_ms") or {}
+    if name == "total":
+        # The replayed part of the request
+        return sum(stages.get(stage, 0.0) for stage in REPLAYED_STAGES) / 1000.0
+    return stages.get(name, 0.0) / 1000.0
+
+
+def format_replay_report(report: Dict[str, Any]) -> str:
+    """Human-readable summary of a replay report"""
+    lines = [
+        f"Replayed {report['replayed']} of {report['records']} records "
+        f"({report['skipped']} without an LLM response) in "
+        f"{report['elapsed']:.2f}s, {report['throughput']:.0f} req/s, "
+        f"{report['pacing']} pacing",
+        f"Answers: {report['matched']} matched, {report['mismatched']} mismatched; "
+        f"{report['plan_changes']} plan changes, {report['errors']} errors",
+        "",
+        f"{'stage':<8} {'rec p50':>9} {'rec p99':>9} {'new p50':>9} {'new p99':>9}",
+    ]
+    for name, summary in report["stages_ms"].items():
+        recorded, replayed = summary["recorded"], summary["replayed"]
+        lines.append(
+            f"{name:<8} {recorded['p50']:>9.3f} {recorded['p99']:>9.3f} "
+            f"{replayed['p50']:>9.3f} {replayed['p99']:>9.3f}"
+        )
+    for mismatch in report["mismatches"]:
+        lines.append("")
+        lines.append(f"#{mismatch['index']} {mismatch['question']!r}")
+        lines.append(f"  recorded: {mismatch['recorded']!r}")
+        lines.append(f"  replayed: {mismatch['replayed']!r}")
+        if mismatch["error"]:
+            lines.append(f"  error: {mismatch['error']}")
+    lines.append("")
+    lines.append("Latencies in ms; the total covers parse, tool and format only.")
+    return "\n".join(lines)
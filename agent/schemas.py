@@ -1,23 +1,49 @@
 from enum import Enum
-from typing import Any, Dict, Optional, Union
+from typing import Any, Container, Dict, FrozenSet, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 
 
 class ToolType(str, Enum):
+    """Names of the built-in tools"""
+
     CALC = "calc"
     WEATHER = "weather"
     KB = "kb"
     TRANSLATOR = "translator"
 
 
+BUILTIN_TOOL_NAMES: FrozenSet[str] = frozenset(tool.value for tool in ToolType)
+
+
+def is_tool_name(name: Any, tools: Optional[Container[str]] = None) -> bool:
+    """Whether ``name`` is one of ``tools`` (a ToolRegistry, say; default:
+    the built-in tools)"""
+    if tools is None:
+        tools = BUILTIN_TOOL_NAMES
+    return isinstance(name, str) and name in tools
+
+
 class ToolPlan(BaseModel):
-    """Schema for tool execution plans"""
+    """Schema for tool execution plans.
+
+    The tool must be one of ``context["tools"]`` when validated with
+    ``model_validate(data, context={"tools": registry})``, otherwise one of
+    the built-in tools.
+    """
 
-    tool: ToolType
+    tool: str
     args: Dict[str, Any]
     confidence: Optional[float] = Field(default=1.0, ge=0.0, le=1.0)
 
+    @field_validator("tool")
+    @classmethod
+    def _known_tool(cls, value: str, info: ValidationInfo) -> str:
+        tools = info.context.get("tools") if info.context else None
+        if not is_tool_name(value, tools):
+            raise ValueError(f"Unknown tool: {value}")
+        return value
+
 
 class ToolResult(BaseModel):
     """Schema for tool execution results"""
@@ -26,3 +52,5 @@ class ToolResult(BaseModel):
     result: Union[str, float, Dict[str, Any]]
     error: Optional[str] = None
     tool_used: str
+    # How closely a lookup matched the query, in [0, 1], for tools that match
+    score: Optional[float] = None
@@ -0,0 +1,310 @@
+"""HTTP serving mode with an optional pre-fork worker pool.
+
+The parent process builds the agent once (tool registry, KB entries,
+translation tables), freezes the GC so those objects stay on shared
+copy-on-write pages, then forks workers that all accept() on the same
+listening socket. The kernel spreads connections across the workers and the
+parent restarts any worker that exits unexpectedly.
+
+Each worker puts an admission controller in front of the agent, so overload
+is shed with 503/504 responses instead of queueing without bound.
+"""
+
+import gc
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import logs
+from .admission import (
+    DEFAULT_PRIORITY,
+    PRIORITIES,
+    AdmissionConfig,
+    AdmissionController,
+    AdmissionRejected,
+)
+from .agent import Agent
+from .profiling import ENV_OUT
+
+logger = logging.getLogger(__name__)
+
+# Cap request bodies; questions are short
+MAX_BODY_BYTES = 64 * 1024
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /answer, GET /metrics, GET /healthz"""
+
+    server: "AgentHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        # Body: {"question": str, "session_id": str, "priority": str,
+        #        "timeout": seconds}; all but question are optional
+
+        if self.path != "/answer":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > MAX_BODY_BYTES:
+            # The body was not read, so the connection cannot be reused
+            self._send_json(
+                400, {"error": "Invalid request body"}, headers={"Connection": "close"}
+            )
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length))
+            question = payload["question"]
+            session_id = payload.get("session_id")
+            if not isinstance(question, str):
+                raise TypeError("question must be a string")
+            if session_id is not None and not isinstance(session_id, str):
+                raise TypeError("session_id must be a string")
+            priority = payload.get("priority", DEFAULT_PRIORITY)
+            if priority not in PRIORITIES:
+                raise ValueError(f"priority must be one of {PRIORITIES}")
+            timeout = payload.get("timeout")
+            # bool is an int subclass, but "timeout": true is not a number
+            if timeout is not None and (
+                isinstance(timeout, bool)
+                or not isinstance(timeout, (int, float))
+                or timeout <= 0
+            ):
+                raise ValueError("timeout must be a positive number")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        agent = self.server.agent
+        admission = self.server.admission
+        # One deadline covers queueing, the LLM call and the tool
+        deadline = time.monotonic() + (timeout or admission.config.default_timeout)
+        try:
+            answer = admission.run(
+                lambda: agent.respond(
+                    question, session_id=session_id, deadline=deadline
+                ),
+                priority=priority,
+                deadline=deadline,
+            )
+        except AdmissionRejected as e:
+            status = 504 if e.reason == "expired" else 503
+            self._send_json(
+                status,
+                {"error": str(e), "reason": e.reason},
+                headers={"Retry-After": "1"},
+            )
+            return
+        self._send_json(200, {"answer": answer.text, "outcome": answer.status})
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+        elif self.path == "/metrics":
+            metrics = self.server.agent.metrics()
+            metrics["admission"] = self.server.admission.stats()
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(
+        self,
+        status: int,
+        body: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class AgentHTTPServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server around an already-bound listening socket"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        agent: Agent,
+        admission: Optional[AdmissionController] = None,
+    ):
+        super().__init__(
+            sock.getsockname()[:2], AgentRequestHandler, bind_and_activate=False
+        )
+        self.socket.close()
+        self.socket = sock
+        self.agent = agent
+        self.admission = admission or AdmissionController()
+
+
+def create_listener(host: str, port: int, backlog: int = 512) -> socket.socket:
+    """Bind and listen on host:port"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+class PreforkServer:
+    """Supervises N forked workers sharing one listening socket"""
+
+    # Delay before restarting a worker that died shortly after starting
+    RESTART_BACKOFF = 1.0
+    MIN_UPTIME = 5.0
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], Agent] = Agent,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: int = 0,
+        admission: Optional[AdmissionConfig] = None,
+    ):
+        self.agent_factory = agent_factory
+        self.admission = admission or AdmissionConfig()
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.agent: Optional[Agent] = None
+        self.sock: Optional[socket.socket] = None
+        self.children: Dict[int, Tuple[int, float]] = {}  # pid -> (slot, start)
+        self.restarts = 0
+        self._stopping = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.sock.getsockname()[:2]
+
+    def start(self) -> None:
+        """Bind, build shared state and fork the workers"""
+        self.sock = create_listener(self.host, self.port)
+        self.agent = self.agent_factory()
+        self.agent.warmup()
+        # Move everything built so far out of the GC's reach so collections in
+        # the workers do not write to (and un-share) these pages.
+        gc.collect()
+        gc.freeze()
+
+        if not hasattr(os, "fork"):  # pragma: no cover
+            return
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+    def serve_forever(self) -> None:
+        """Supervise workers until SIGTERM/SIGINT"""
+        if not hasattr(os, "fork"):  # pragma: no cover
+            self._serve_in_process()
+            return
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        while not self._stopping:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            except InterruptedError:  # pragma: no cover
+                continue
+            self._reap(pid, status)
+        self._shutdown_children()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._shutdown_children()
+
+    def _spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                # os._exit skips atexit, so flush the log queue first
+                logs.shutdown()
+                os._exit(code)
+        self.children[pid] = (slot, time.monotonic())
+        logger.info("Started worker %d (slot %d)", pid, slot)
+
+    def _reap(self, pid: int, status: int) -> None:
+        entry = self.children.pop(pid, None)
+        if entry is None or self._stopping:
+            return
+        slot, started = entry
+        logger.warning("Worker %d exited with status %d, restarting", pid, status)
+        if time.monotonic() - started < self.MIN_UPTIME:
+            time.sleep(self.RESTART_BACKOFF)
+        self.restarts += 1
+        self._spawn(slot)
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _shutdown_children(self) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self.children.pop(pid, None)
+
+    def _run_worker(self) -> None:  # pragma: no cover - runs in the child
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        server = AgentHTTPServer(
+            self.sock, self.agent, AdmissionController(self.admission)
+        )
+
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        server.serve_forever()
+
+        profiler = self.agent.profiler
+        out = os.environ.get(ENV_OUT)
+        if profiler is not None and out:
+            profiler.close()
+            profiler.write(f"{out}.{os.getpid()}")
+
+    def _serve_in_process(self) -> None:  # pragma: no cover
+        server = AgentHTTPServer(
+            self.sock, self.agent, AdmissionController(self.admission)
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
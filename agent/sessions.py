@@ -0,0 +1,275 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant. Answer directly or reply with a JSON tool "
+    'call of the form {"tool": <name>, "args": {...}} using one of these tools:\n'
+)
+
+# Rough prompt-size estimate used for budgeting (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+
+# Per-string overhead used when estimating session memory
+_STR_OVERHEAD = 64
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Prompt(NamedTuple):
+    """Prompt split into a cached prefix, conversation history and the question"""
+
+    prefix: str
+    history: str
+    question: str
+    last_question: Optional[str] = None
+
+    def render(self) -> str:
+        return f"{self.prefix}{self.history}User: {self.question}\nAssistant:"
+
+
+class PromptPrefixCache:
+    """Caches the rendered system prompt and tool catalog.
+
+    ``catalog`` returns the catalog JSON, optionally narrowed to the tools
+    relevant to a question; one prefix is kept per distinct catalog.
+    """
+
+    def __init__(
+        self,
+        catalog: Callable[..., str],
+        system_prompt: str = SYSTEM_PROMPT,
+        max_entries: int = 256,
+    ):
+        self._catalog = catalog
+        self._system_prompt = system_prompt
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        # id(catalog) -> (catalog, prefix); holding the catalog keeps its id valid
+        self._prefixes: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self.renders = 0
+
+    def get(self, question: Optional[str] = None) -> str:
+        catalog = self._catalog() if question is None else self._catalog(question)
+        key = id(catalog)
+        with self._lock:
+            # The registry hands out the same string object until tools change
+            entry = self._prefixes.get(key)
+            if entry is not None and entry[0] is catalog:
+                self._prefixes.move_to_end(key)
+                return entry[1]
+            prefix = f"{self._system_prompt}{catalog}\n\n"
+            self._prefixes[key] = (catalog, prefix)
+            if len(self._prefixes) > self._max_entries:
+                self._prefixes.popitem(last=False)
+            self.renders += 1
+        return prefix
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            prefixes = [prefix for _, prefix in self._prefixes.values()]
+        return {
+            "entries": len(prefixes),
+            "max_entries": self._max_entries,
+            "bytes": sum(sys.getsizeof(prefix) for prefix in prefixes),
+        }
+
+
+class Session:
+    """Conversation state: a rolling window of turns plus a running summary"""
+
+    __slots__ = (
+        "id",
+        "turns",
+        "summary",
+        "summary_tokens",
+        "last_used",
+        "size",
+        "_history",
+    )
+
+    def __init__(self, session_id: str, now: float):
+        self.id = session_id
+        # Each turn is (question, rendered turn text)
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self.summary: Deque[str] = deque()
+        self.summary_tokens = 0
+        self.last_used = now
+        self.size = _STR_OVERHEAD + len(session_id)
+        self._history: Optional[str] = None
+
+    def invalidate(self) -> None:
+        self._history = None
+
+    def history(self) -> str:
+        """Rendered summary and recent turns, cached until the session changes"""
+        if self._history is not None:
+            return self._history
+        parts: List[str] = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n")
+            parts.extend(self.summary)
+            parts.append("\n")
+        parts.extend(turn for _, turn in self.turns)
+        self._history = "".join(parts)
+        return self._history
+
+    def last_question(self) -> Optional[str]:
+        return self.turns[-1][0] if self.turns else None
+
+
+class SessionStore:
+    """Bounded store of conversation sessions.
+
+    Sessions are evicted least-recently-used first when the store exceeds
+    ``max_sessions`` or its estimated ``max_bytes``, and when idle for longer
+    than ``idle_ttl`` seconds. Each session keeps the last ``max_turns`` turns
+    verbatim; older turns are folded into one-line summaries capped at
+    ``summary_tokens``. Rendered turns are cached, so building a prompt only
+    joins existing strings.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_ttl: float = 1800.0,
+        max_turns: int = 6,
+        summary_tokens: int = 256,
+        max_history_tokens: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_sessions < 1 or max_bytes < 1 or max_turns < 1:
+            raise ValueError("Session limits must be positive")
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.max_history_tokens = max_history_tokens
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"evicted_lru": 0, "evicted_idle": 0, "summarized_turns": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def build_prompt(self, session_id: str, question: str, prefix: str) -> Prompt:
+        """Prompt for the next turn of a session"""
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None:
+                return Prompt(prefix, "", question)
+            return Prompt(prefix, session.history(), question, session.last_question())
+
+    def record(self, session_id: str, question: str, answer: str) -> None:
+        """Append a completed turn to a session, creating it if needed"""
+        turn = f"User: {question}\nAssistant: {answer}\n"
+        with self._lock:
+            now = self._clock()
+            session = self._touch(session_id)
+            if session is None:
+                session = Session(session_id, now)
+                self._sessions[session_id] = session
+                self._bytes += session.size
+
+            session.turns.append((question, turn))
+            session.invalidate()
+            self._grow(session, _STR_OVERHEAD * 2 + len(turn) + len(question))
+            self._trim(session)
+            self._evict()
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size
+
+    def sweep(self) -> int:
+        """Evict idle sessions; returns how many were removed"""
+        with self._lock:
+            return self._evict_idle(self._clock())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self._counters,
+                sessions=len(self._sessions),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+            )
+
+    def _touch(self, session_id: str) -> Optional[Session]:
+        now = self._clock()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_used > self.idle_ttl:
+            del self._sessions[session_id]
+            self._bytes -= session.size
+            self._counters["evicted_idle"] += 1
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _grow(self, session: Session, delta: int) -> None:
+        session.size += delta
+        self._bytes += delta
+
+    def _trim(self, session: Session) -> None:
+        """Fold old turns into the summary and keep history under budget"""
+        history_tokens = sum(estimate_tokens(turn) for _, turn in session.turns)
+        while len(session.turns) > 1 and (
+            len(session.turns) > self.max_turns
+            or history_tokens > self.max_history_tokens
+        ):
+            question, turn = session.turns.popleft()
+            history_tokens -= estimate_tokens(turn)
+            self._grow(session, -(_STR_OVERHEAD * 2 + len(turn) + len(question)))
+            line = self._summarize(turn)
+            session.summary.append(line)
+            session.summary_tokens += estimate_tokens(line)
+            self._grow(session, _STR_OVERHEAD + len(line))
+            self._counters["summarized_turns"] += 1
+
+        while session.summary and session.summary_tokens > self.summary_tokens:
+            line = session.summary.popleft()
+            session.summary_tokens -= estimate_tokens(line)
+            self._grow(session, -(_STR_OVERHEAD + len(line)))
+
+    @staticmethod
+    def _summarize(turn: str, width: int = 80) -> str:
+        """One-line extractive summary of a turn"""
+        user, _, assistant = turn.partition("\nAssistant: ")
+        user = user.removeprefix("User: ")
+        assistant = assistant.strip()
+        return f"- {user[:width]} -> {assistant[:width]}\n"
+
+    def _evict(self) -> None:
+        self._evict_idle(self._clock())
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+        ):
+            _, session = self._sessions.popitem(last=False)
+            self._bytes -= session.size
+            self._counters["evicted_lru"] += 1
+
+    def _evict_idle(self, now: float) -> int:
+        removed = 0
+        # Oldest sessions are at the front, so stop at the first live one
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._bytes -= session.size
+            self._counters["evicted_idle"] += 1
+            removed += 1
+        return removed
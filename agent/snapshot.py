@@ -0,0 +1,376 @@
+"""Prebuilt, memory-mapped snapshot of tool data.
+
+``build`` compiles every tool's lookup tables into one binary file, and
+``Snapshot`` memory-maps it and serves lookups straight from the mapped
+pages, so a new process does no parsing or index building and pre-forked
+workers share one copy of the data through the page cache.
+
+File layout::
+
+    header   magic, format version, byte order, CRC-32 of the index,
+             index length
+    index    JSON: source fingerprints and section offsets, lengths and
+             CRC-32s
+    payload  sections, each a table of (key, value) byte strings
+
+Opening a snapshot only reads the header and the small index, so it costs
+the same whatever the data size. Each section is checksummed the first time
+a lookup reads it, and a mismatch raises ``SnapshotError`` instead of
+serving corrupt data. Each tool lists the files its data comes from (its own
+module for in-code tables); if any of them has changed since the build,
+``load_or_build`` rebuilds the snapshot.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AGSNAPSH"
+FORMAT_VERSION = 2
+DEFAULT_PATH = "data/tools.snapshot"
+
+# magic, format version, byte order, index CRC, index length
+_HEADER = struct.Struct("<8sIBxxxIQ")
+_ALIGN = 8
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+class SnapshotError(Exception):
+    """Raised for a missing, corrupt or incompatible snapshot file"""
+
+
+def encode_table(
+    pairs: Iterable[Tuple[bytes, bytes]], terminator: bytes = b""
+) -> bytes:
+    """Serialize (key, value) pairs in the given order.
+
+    Layout: u32 count, u32 key offsets[count + 1], u32 value offsets
+    [count + 1], key bytes, value bytes. ``terminator`` is appended to every
+    key so a substring search over the key bytes cannot span two keys.
+    """
+    key_offsets, value_offsets = array("I", [0]), array("I", [0])
+    keys, values = bytearray(), bytearray()
+    for key, value in pairs:
+        keys += key + terminator
+        values += value
+        key_offsets.append(len(keys))
+        value_offsets.append(len(values))
+    count = array("I", [len(key_offsets) - 1])
+    return b"".join(
+        [count.tobytes(), key_offsets.tobytes(), value_offsets.tobytes(), keys, values]
+    )
+
+
+class _Table:
+    """Read side of ``encode_table`` over a region of the mapping.
+
+    The region is checked against ``crc`` on the first key or value read.
+    """
+
+    __slots__ = (
+        "mm",
+        "count",
+        "name",
+        "_crc",
+        "_region",
+        "_key_offsets",
+        "_value_offsets",
+        "_keys",
+        "_values",
+    )
+
+    def __init__(
+        self,
+        mm: mmap.mmap,
+        offset: int,
+        length: int,
+        crc: Optional[int] = None,
+        name: str = "",
+    ):
+        end = offset + length
+        view = memoryview(mm)[offset:end]
+        self.mm = mm
+        self.name = name
+        self._crc = crc  # None once checked
+        self._region = (offset, end)
+        self.count = view[:4].cast("I")[0]
+        width = 4 * (self.count + 1)
+        value_offsets_at, blobs_at = 4 + width, 4 + 2 * width
+        if blobs_at > length:
+            raise SnapshotError(f"Snapshot section '{name}' is corrupt")
+        self._key_offsets = view[4:value_offsets_at].cast("I")
+        self._value_offsets = view[value_offsets_at:blobs_at].cast("I")
+        self._keys = offset + blobs_at
+        self._values = self._keys + self._key_offsets[self.count]
+
+    def check(self) -> None:
+        """Checksum the region once, raising SnapshotError on mismatch"""
+        crc = self._crc
+        if crc is None:
+            return
+        start, end = self._region
+        with memoryview(self.mm) as view:
+            actual = zlib.crc32(view[start:end])
+        if actual != crc:
+            raise SnapshotError(f"Snapshot section '{self.name}' checksum mismatch")
+        self._crc = None
+
+    def key(self, index: int, strip: int = 0) -> bytes:
+        if self._crc is not None:
+            self.check()
+        start = self._keys + self._key_offsets[index]
+        end = self._keys + self._key_offsets[index + 1] - strip
+        return self.mm[start:end]
+
+    def value(self, index: int) -> bytes:
+        if self._crc is not None:
+            self.check()
+        start = self._values + self._value_offsets[index]
+        end = self._values + self._value_offsets[index + 1]
+        return self.mm[start:end]
+
+
+class MappedMap(Mapping):
+    """Read-only mapping over a table of keys sorted by their encoding"""
+
+    def __init__(
+        self,
+        table: _Table,
+        encode_key: Callable[[Any], bytes] = str.encode,
+        decode_key: Callable[[bytes], Any] = bytes.decode,
+        decode_value: Callable[[bytes], Any] = bytes.decode,
+    ):
+        self._table = table
+        self._encode_key = encode_key
+        self._decode_key = decode_key
+        self._decode_value = decode_value
+
+    def __getitem__(self, key: Any) -> Any:
+        target = self._encode_key(key)
+        table = self._table
+        lo, hi = 0, table.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if table.key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < table.count and table.key(lo) == target:
+            return self._decode_value(table.value(lo))
+        raise KeyError(key)
+
+    def __len__(self) -> int:
+        return self._table.count
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(self._table.count):
+            yield self._decode_key(self._table.key(index))
+
+
+class MappedEntries:
+    """Ordered (name, text) entries"""
+
+    _TERMINATOR = b"\0"
+
+    def __init__(self, table: _Table):
+        self._table = table
+
+    def __len__(self) -> int:
+        return self._table.count
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        if not 0 <= index < self._table.count:
+            raise IndexError(index)
+        table = self._table
+        return table.key(index, strip=1).decode(), table.value(index).decode()
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        table = self._table
+        for index in range(table.count):
+            yield table.key(index, strip=1).decode(), table.value(index).decode()
+
+
+def encode_map(items: Iterable[Tuple[bytes, bytes]]) -> bytes:
+    """Table section for ``MappedMap``: pairs sorted by encoded key"""
+    return encode_table(sorted(items))
+
+
+def encode_entries(items: Iterable[Tuple[str, str]]) -> bytes:
+    """Table section for ``MappedEntries``, keeping the given order"""
+    return encode_table(
+        ((name.encode(), text.encode()) for name, text in items),
+        terminator=MappedEntries._TERMINATOR,
+    )
+
+
+def fingerprint(paths: Iterable[str]) -> List[List[Any]]:
+    """(path, size, mtime) of each source file; missing files count as changed"""
+    result = []
+    for path in sorted(set(paths)):
+        try:
+            st = os.stat(path)
+            result.append([path, st.st_size, st.st_mtime_ns])
+        except OSError:
+            result.append([path, -1, -1])
+    return result
+
+
+def build(
+    sections: Dict[str, bytes], sources: Iterable[str], path: str = DEFAULT_PATH
+) -> None:
+    """Write a snapshot atomically (readers never see a partial file)"""
+    layout: Dict[str, List[int]] = {}
+    payload = bytearray()
+    for name, data in sorted(sections.items()):
+        payload += b"\0" * (-len(payload) % _ALIGN)
+        layout[name] = [len(payload), len(data), zlib.crc32(data)]
+        payload += data
+    index = json.dumps(
+        {"sources": fingerprint(sources), "sections": layout},
+        separators=(",", ":"),
+    ).encode()
+    index += b" " * (-(_HEADER.size + len(index)) % _ALIGN)
+
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        _BYTE_ORDERS[sys.byteorder],
+        zlib.crc32(index),
+        len(index),
+    )
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(index)
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+class Snapshot:
+    """A memory-mapped snapshot file.
+
+    Only the header and index are read and checked when opening; each
+    section is checksummed on its first lookup. Pass ``verify=True`` (or
+    call ``verify``) to checksum every section up front.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, verify: bool = False):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map snapshot {path}: {e}") from None
+
+        self._tables: Dict[str, _Table] = {}
+        try:
+            self._read_index()
+            if verify:
+                self.verify()
+        except SnapshotError:
+            self.close()
+            raise
+
+    def _read_index(self) -> None:
+        mm = self._mm
+        if len(mm) < _HEADER.size:
+            raise SnapshotError(f"Snapshot {self.path} is truncated")
+        magic, version, order, index_crc, index_len = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{self.path} is not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(
+                f"Snapshot format {version} is not supported (want {FORMAT_VERSION})"
+            )
+        if order != _BYTE_ORDERS[sys.byteorder]:
+            raise SnapshotError("Snapshot was built on a machine of other byte order")
+        index_at = _HEADER.size
+        payload_at = index_at + index_len
+        index = mm[index_at:payload_at]
+        if len(index) != index_len or zlib.crc32(index) != index_crc:
+            raise SnapshotError(f"Snapshot {self.path} index checksum mismatch")
+        meta = json.loads(index)
+        self.sources: List[List[Any]] = meta["sources"]
+        self.sections: Dict[str, List[int]] = meta["sections"]
+        self._payload = payload_at
+
+    def verify(self) -> None:
+        """Checksum every section, raising SnapshotError on a mismatch"""
+        for name in self.sections:
+            table = self.table(name)
+            try:
+                table.check()
+            except SnapshotError as e:
+                raise SnapshotError(f"{self.path}: {e}") from None
+
+    def is_stale(self, sources: Optional[Iterable[str]] = None) -> bool:
+        """Whether a source file changed, or the source list differs"""
+        paths = [entry[0] for entry in self.sources] if sources is None else sources
+        return fingerprint(paths) != self.sources
+
+    def table(self, name: str) -> Optional[_Table]:
+        table = self._tables.get(name)
+        if table is None and name in self.sections:
+            offset, length, crc = self.sections[name]
+            table = _Table(self._mm, self._payload + offset, length, crc, name)
+            self._tables[name] = table
+        return table
+
+    def map(self, name: str, **codecs: Callable[..., Any]) -> Optional[MappedMap]:
+        """Section ``name`` as a read-only mapping (None if absent)"""
+        table = self.table(name)
+        return MappedMap(table, **codecs) if table is not None else None
+
+    def entries(self, name: str) -> Optional[MappedEntries]:
+        """Section ``name`` as substring-searchable entries (None if absent)"""
+        table = self.table(name)
+        return MappedEntries(table) if table is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "bytes": len(self._mm),
+            "sections": {
+                name: length for name, (_, length, _) in self.sections.items()
+            },
+        }
+
+    def close(self) -> None:
+        self._tables.clear()
+        try:
+            self._mm.close()
+        except BufferError:  # pragma: no cover - lookups still hold views
+            pass
+
+
+def load_or_build(
+    sections: Callable[[], Dict[str, bytes]],
+    sources: Iterable[str],
+    path: str = DEFAULT_PATH,
+) -> Snapshot:
+    """Open the snapshot at ``path``, rebuilding it first if stale or invalid.
+
+    Only the header and index are read here; sections are checksummed as
+    lookups first read them. ``sections`` is only called when a rebuild is
+    needed.
+    """
+    sources = list(sources)
+    try:
+        snapshot = Snapshot(path)
+        if not snapshot.is_stale(sources):
+            return snapshot
+        snapshot.close()
+        logger.info("Snapshot %s is out of date, rebuilding", path)
+    except SnapshotError as e:
+        logger.info("Building snapshot %s (%s)", path, e)
+    build(sections(), sources, path)
+    return Snapshot(path)
@@ -0,0 +1,169 @@
+"""Speculative tool prefetch.
+
+While the LLM call is in flight, a cheap rule-based predictor guesses the tool
+call the model is likely to plan ("weather in Paris" -> weather(city=paris))
+and starts it in the tool's bulkhead. If the parsed plan asks for the same
+tool with the same normalized arguments, the prefetched result is used;
+otherwise it is discarded and counted as wasted work. Only tools marked
+``idempotent`` are prefetched, and only when a worker slot in the tool's
+bulkhead is free right away: a prefetch never waits in the bulkhead's queue
+or takes a queue slot a real call could use.
+"""
+
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from .bulkhead import execution_time
+from .schemas import ToolResult
+from .tool_registry import ToolRegistry
+from .tools.base import BaseTool
+
+Prediction = Tuple[str, Dict[str, Any]]  # (tool name, args)
+
+_WEATHER = re.compile(r"\b(?:weather|temperature)\b")
+# City at the end of the question: "weather in new york?"
+_CITY = re.compile(r"\b(?:in|for|at)\s+([a-z][a-z .'-]{0,40}?)\s*[?.!]*\s*$")
+_WHO_IS = re.compile(r"\bwho\s+(?:is|was)\s+(.{1,80}?)\s*[?.!]*\s*$")
+_TRANSLATE = re.compile(
+    r"\btranslate\s+(.{1,80}?)\s+(?:to|into)\s+([a-z]+)\s*[?.!]*\s*$"
+)
+
+
+class ToolPredictor:
+    """Guesses the tool call for a question from its wording alone"""
+
+    def predict(self, question: str) -> Optional[Prediction]:
+        q = question.lower()
+        if _WEATHER.search(q):
+            match = _CITY.search(q)
+            if match:
+                return "weather", {"city": match.group(1)}
+            return None
+        match = _WHO_IS.search(q)
+        if match:
+            return "kb", {"q": match.group(1)}
+        match = _TRANSLATE.search(q)
+        if match:
+            return "translator", {
+                "text": match.group(1),
+                "target_language": match.group(2),
+            }
+        return None
+
+
+class Speculation:
+    """A prefetch started for one request"""
+
+    __slots__ = ("speculator", "tool", "args", "future", "_settled")
+
+    def __init__(
+        self,
+        speculator: "Speculator",
+        tool: BaseTool,
+        args: Dict[str, Any],
+        future: Future,
+    ):
+        self.speculator = speculator
+        self.tool = tool
+        self.args = args
+        self.future = future
+        self._settled = False
+
+    def resolve(
+        self, tool_name: str, args: Dict[str, Any], timeout: Optional[float] = None
+    ) -> Optional[ToolResult]:
+        """Prefetched result if it matches the planned call, else None"""
+        if self._settled:
+            return None
+        self._settled = True
+        planned, error = self.tool.validator(args)
+        if tool_name != self.tool.name or error is not None or planned != self.args:
+            self.speculator._record_miss(self)
+            return None
+        self.speculator._record_hit(self)
+        return self.speculator.registry.wait(self.tool, self.future, timeout)
+
+    def discard(self) -> None:
+        """Drop the prefetch when the request did not use a tool"""
+        if not self._settled:
+            self._settled = True
+            self.speculator._record_miss(self)
+
+
+class Speculator:
+    """Starts predicted tool calls and tracks hit rate and wasted work"""
+
+    def __init__(
+        self, registry: ToolRegistry, predictor: Optional[ToolPredictor] = None
+    ):
+        self.registry = registry
+        self.predictor = predictor or ToolPredictor()
+        self._lock = threading.Lock()
+        self._counters = {
+            "requests": 0,
+            "predicted": 0,
+            "started": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "wasted_calls": 0,
+        }
+        self._wasted_seconds = 0.0
+
+    def start(self, question: str) -> Optional[Speculation]:
+        """Predict and prefetch the tool call for a question, if any"""
+        prediction = self.predictor.predict(question)
+        with self._lock:
+            self._counters["requests"] += 1
+            if prediction is not None:
+                self._counters["predicted"] += 1
+        if prediction is None:
+            return None
+
+        tool_name, args = prediction
+        tool = self.registry.get_tool(tool_name)
+        if tool is None or not getattr(tool, "idempotent", False):
+            return None
+        values, error = tool.validator(args)
+        if error is not None:
+            return None
+        future = self.registry.submit(tool, values)
+        if future is None:
+            return None
+        with self._lock:
+            self._counters["started"] += 1
+        return Speculation(self, tool, values, future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            wasted = self._wasted_seconds
+        settled = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / settled if settled else 0.0
+        stats["wasted_ms"] = 1000.0 * wasted
+        return stats
+
+    def _record_hit(self, speculation: Speculation) -> None:
+        with self._lock:
+            self._counters["hits"] += 1
+
+    def _record_miss(self, speculation: Speculation) -> None:
+        cancelled = speculation.future.cancel()
+        with self._lock:
+            self._counters["misses"] += 1
+            if cancelled:
+                self._counters["cancelled"] += 1
+            else:
+                self._counters["wasted_calls"] += 1
+        if not cancelled:
+            speculation.future.add_done_callback(self._add_wasted)
+
+    def _add_wasted(self, future: Future) -> None:
+        # The tool's own run time; the wait for the LLM is not wasted work
+        seconds = execution_time(future)
+        if seconds is None:
+            return
+        with self._lock:
+            self._wasted_seconds += seconds
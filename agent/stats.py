@@ -0,0 +1,19 @@
+from typing import Dict, Iterable, Sequence
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples (0.0 when empty)"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def summarize_ms(samples: Iterable[float]) -> Dict[str, float]:
+    """Mean, p50 and p99 in milliseconds of durations given in seconds"""
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered) if ordered else 0.0
+    return {
+        "mean": 1000.0 * mean,
+        "p50": 1000.0 * percentile(ordered, 0.5),
+        "p99": 1000.0 * percentile(ordered, 0.99),
+    }
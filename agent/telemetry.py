@@ -0,0 +1,571 @@
+"""Compact binary per-request telemetry log.
+
+Every answered request becomes one fixed-size 64-byte record: start time,
+a hash of the question, total and per-stage durations, the tool, the parse
+path and the outcome. Tool names are open-ended, so a record holds a 64-bit
+hash of the name and each ``.bin`` file has a ``.names`` sidecar (JSON lines)
+mapping the hashes it uses back to names. Request threads only pack the record and append it to
+a deque (atomic in CPython, so no lock is taken on the request path); a
+background thread flushes the deque to the current file every
+``flush_interval`` seconds. Files rotate at ``max_file_bytes`` and only the
+newest ``max_files`` of each process are kept, plus the newest ``max_files``
+left behind by processes that have exited (e.g. restarted workers). Each
+process writes its own files, so pre-forked workers never share one.
+
+``TelemetryReader`` memory-maps the files and exposes them as NumPy
+structured arrays when NumPy is installed (plain tuples otherwise), and
+``summarize`` gives latency percentiles per tool and parse path.
+"""
+
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from .stats import percentile
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AGTELEM\0"
+FORMAT_VERSION = 2
+DEFAULT_DIR = "telemetry"
+
+STAGES = ("cache", "llm", "parse", "tool", "format")
+OUTCOMES = (
+    "ok",
+    "tool_error",
+    "timeout",
+    "no_response",
+    "unparsed",
+    "unknown_tool",
+    "error",
+    "cache_hit",
+)
+_OUTCOME_CODES = {name: code for code, name in enumerate(OUTCOMES)}
+# Outcomes of a request that got a real answer; the rest are failures
+OK_OUTCOMES = frozenset(("ok", "cache_hit"))
+
+# magic, format version, record size, reserved
+_HEADER = struct.Struct("<8sHHI")
+# start time, question hash, total ms, stage ms, tool hash, parse path, outcome
+_RECORD = struct.Struct("<dQ6fQ15sB")
+_PATH_SIZE = 15
+
+FIELDS = (
+    ("ts", "<f8"),
+    ("qhash", "<u8"),
+    ("total_ms", "<f4"),
+    *((f"{stage}_ms", "<f4") for stage in STAGES),
+    ("tool_id", "<u8"),  # see TelemetryReader.tool_names
+    ("path", f"S{_PATH_SIZE}"),
+    ("outcome", "u1"),
+)
+
+_FILE_NAME = re.compile(r"telemetry-(\d+)-(\d+)\.bin$")
+
+
+class TelemetryConfig(BaseModel):
+    """Location, rotation and flushing of the telemetry log"""
+
+    directory: str = DEFAULT_DIR
+    max_file_bytes: int = Field(default=64 << 20, ge=_HEADER.size + _RECORD.size)
+    max_files: int = Field(default=16, ge=1)  # per process, and for exited ones
+    flush_interval: float = Field(default=1.0, gt=0.0)
+    max_pending: int = Field(default=1 << 16, ge=1)  # records beyond are dropped
+
+
+class Record(NamedTuple):
+    ts: float
+    qhash: int
+    total_ms: float
+    cache_ms: float
+    llm_ms: float
+    parse_ms: float
+    tool_ms: float
+    format_ms: float
+    tool: str
+    path: str
+    outcome: str
+
+
+def question_hash(question: str) -> int:
+    """Stable 64-bit hash of a question"""
+    return int.from_bytes(
+        hashlib.blake2b(question.encode(), digest_size=8).digest(), "little"
+    )
+
+
+def tool_id(name: Optional[str]) -> int:
+    """Stable 64-bit id of a tool name; 0 for no tool"""
+    return question_hash(name) if name else 0
+
+
+def _fit(text: Optional[str], size: int) -> bytes:
+    """UTF-8 encoding of ``text`` cut to ``size`` bytes on a character boundary"""
+    data = (text or "").encode()
+    if len(data) > size:
+        data = data[:size].decode(errors="ignore").encode()
+    return data
+
+
+class TelemetryLog:
+    """Append-only writer of telemetry records"""
+
+    def __init__(self, config: Optional[TelemetryConfig] = None):
+        self.config = config or TelemetryConfig()
+        self._pending: deque = deque()
+        # Only bumped when the queue is full, so a lost update under
+        # contention merely undercounts a rare event
+        self._dropped = 0
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self._file = None
+        self._file_bytes = 0
+        self._file_pid: Optional[int] = None
+        self._written = 0
+        self._files = 0
+        # Tool names seen, in the order their ids were first recorded
+        self._tool_ids: Dict[str, int] = {}
+        self._names: List[Tuple[int, str]] = []
+        self._names_lock = threading.Lock()
+        self._names_written = 0  # of self._names, to the current file's sidecar
+        _open_logs.add(self)
+
+    def record(
+        self,
+        question: str,
+        total: float,
+        stages: Dict[str, float],
+        tool: Optional[str] = None,
+        path: Optional[str] = None,
+        outcome: str = "ok",
+        ts: Optional[float] = None,
+    ) -> None:
+        """Queue one request's record; durations are in seconds"""
+        pending = self._pending
+        if len(pending) >= self.config.max_pending:
+            self._dropped += 1
+            return
+        tool_hash = self._tool_ids.get(tool) if tool else 0
+        if tool_hash is None:
+            tool_hash = self._intern(tool)
+        pending.append(
+            _RECORD.pack(
+                time.time() if ts is None else ts,
+                question_hash(question),
+                1000.0 * total,
+                *(1000.0 * stages.get(stage, 0.0) for stage in STAGES),
+                tool_hash,
+                _fit(path, _PATH_SIZE),
+                _OUTCOME_CODES[outcome],
+            )
+        )
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def flush(self) -> None:
+        """Write every queued record to disk"""
+        with self._flush_lock:
+            if self._file_pid is not None and self._file_pid != os.getpid():
+                # Forked: the file and queued records belong to the parent
+                self._file, self._file_pid = None, None
+                self._pending.clear()
+            pending = self._pending
+            chunk: List[bytes] = []
+            while pending:
+                try:
+                    chunk.append(pending.popleft())
+                except IndexError:  # pragma: no cover - drained concurrently
+                    break
+            if chunk:
+                self._write(chunk)
+
+    def close(self) -> None:
+        """Flush, stop the flusher thread and close the current file"""
+        self._stop.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(timeout=5.0)
+        self.flush()
+        with self._flush_lock:
+            if self._file is not None and self._file_pid == os.getpid():
+                self._file.close()
+            self._file, self._file_pid = None, None
+        self._flusher, self._flusher_pid = None, None
+        self._stop.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dropped": self._dropped,
+            "pending": len(self._pending),
+            "written": self._written,
+            "files": self._files,
+            "directory": self.config.directory,
+        }
+
+    def _intern(self, tool: str) -> int:
+        with self._names_lock:
+            tool_hash = self._tool_ids.get(tool)
+            if tool_hash is None:
+                tool_hash = tool_id(tool)
+                # Listed before the id is published, so a flush that writes a
+                # record using it also writes its name
+                self._names.append((tool_hash, tool))
+                self._tool_ids[tool] = tool_hash
+        return tool_hash
+
+    def _start_flusher(self) -> None:
+        with self._flush_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="agent-telemetry", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.config.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error("Telemetry flush failed: %s", e)
+
+    def _write(self, records: List[bytes]) -> None:
+        size = _RECORD.size
+        start = 0
+        while start < len(records):
+            if (
+                self._file is None
+                or self._file_bytes + size > self.config.max_file_bytes
+            ):
+                self._rotate()
+            self._write_names()
+            room = (self.config.max_file_bytes - self._file_bytes) // size
+            end = min(len(records), start + max(1, room))
+            data = b"".join(records[start:end])
+            self._file.write(data)
+            self._file_bytes += len(data)
+            self._written += end - start
+            start = end
+        self._file.flush()
+
+    def _write_names(self) -> None:
+        written = self._names_written
+        names = self._names[written:]
+        if not names:
+            return
+        with open(_names_path(self._file.name), "a", encoding="utf-8") as f:
+            f.write(
+                "".join(
+                    json.dumps({"id": id_, "name": name}) + "\n" for id_, name in names
+                )
+            )
+        self._names_written += len(names)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.config.directory, exist_ok=True)
+        pid = os.getpid()
+        path = os.path.join(
+            self.config.directory, f"telemetry-{time.time_ns():020d}-{pid}.bin"
+        )
+        self._file = open(path, "ab")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _RECORD.size, 0))
+        self._file_bytes = _HEADER.size
+        self._file_pid = pid
+        self._names_written = 0
+        self._files += 1
+        self._prune(pid)
+
+    def _prune(self, pid: int) -> None:
+        own: List[str] = []
+        exited: List[str] = []
+        alive: Dict[int, bool] = {pid: True}
+        for path in list_files(self.config.directory):
+            other = _pid_of(path)
+            if other == pid:
+                own.append(path)
+            elif not alive.setdefault(other, _is_alive(other)):
+                exited.append(path)
+        keep = self.config.max_files
+        for old in own[:-keep] + exited[:-keep]:
+            for stale in (old, _names_path(old)):
+                try:
+                    os.remove(stale)
+                except OSError:  # pragma: no cover - removed by someone else
+                    pass
+
+
+# Flushed at interpreter exit, since the flusher thread is a daemon
+_open_logs: "weakref.WeakSet[TelemetryLog]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for log in list(_open_logs):
+        try:
+            log.flush()
+        except OSError:  # pragma: no cover
+            pass
+
+
+def _names_path(path: str) -> str:
+    return path[: -len(".bin")] + ".names"
+
+
+def _pid_of(path: str) -> int:
+    return int(_FILE_NAME.search(path).group(2))
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:  # e.g. owned by another user
+        pass
+    return True
+
+
+def list_files(directory: str = DEFAULT_DIR) -> List[str]:
+    """Telemetry files in ``directory``, oldest first"""
+    paths = [
+        p
+        for p in glob.glob(os.path.join(directory, "telemetry-*.bin"))
+        if _FILE_NAME.search(p)
+    ]
+    return sorted(paths, key=lambda p: int(_FILE_NAME.search(p).group(1)))
+
+
+class TelemetryReader:
+    """Memory-mapped read access to telemetry files"""
+
+    def __init__(self, paths: Sequence[str]):
+        self.paths = list(paths)
+        self._tool_names: Optional[Dict[int, str]] = None
+
+    @classmethod
+    def from_directory(cls, directory: str = DEFAULT_DIR) -> "TelemetryReader":
+        return cls(list_files(directory))
+
+    @staticmethod
+    def dtype():
+        """NumPy structured dtype of one record"""
+        if np is None:
+            raise ImportError("NumPy is required for structured arrays")
+        dtype = np.dtype(list(FIELDS))
+        assert dtype.itemsize == _RECORD.size
+        return dtype
+
+    def tool_names(self) -> Dict[int, str]:
+        """Tool name of each ``tool_id`` in the files"""
+        if self._tool_names is None:
+            names = {0: ""}
+            for path in self.paths:
+                try:
+                    with open(_names_path(path), encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                continue  # torn trailing line
+                            names[entry["id"]] = entry["name"]
+                except FileNotFoundError:
+                    pass
+            self._tool_names = names
+        return self._tool_names
+
+    def arrays(self) -> List[Any]:
+        """One read-only structured array per file, backed by the mapping"""
+        dtype = self.dtype()
+        arrays = []
+        for path in self.paths:
+            count = _record_count(path)
+            if count:
+                arrays.append(
+                    np.memmap(
+                        path, dtype=dtype, mode="r", offset=_HEADER.size, shape=(count,)
+                    )
+                )
+        return arrays
+
+    def array(self, start: Optional[float] = None, end: Optional[float] = None):
+        """All records with ``start <= ts < end`` as one structured array"""
+        arrays = self.arrays()
+        if not arrays:
+            return np.zeros(0, dtype=self.dtype())
+        data = np.concatenate(arrays)
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= data["ts"] >= start
+        if end is not None:
+            mask &= data["ts"] < end
+        return data[mask]
+
+    def records(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Iterator[Record]:
+        """Decoded records with ``start <= ts < end``, without NumPy"""
+        for path in self.paths:
+            count = _record_count(path)
+            if not count:
+                continue
+            with open(path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for i in range(count):
+                        offset = _HEADER.size + i * _RECORD.size
+                        fields = _RECORD.unpack_from(mm, offset)
+                        if start is not None and fields[0] < start:
+                            continue
+                        if end is not None and fields[0] >= end:
+                            continue
+                        yield _decode(fields, self.tool_names())
+
+    def summarize(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        by: Sequence[str] = ("tool", "path"),
+    ) -> List[Dict[str, Any]]:
+        """Count and total-latency percentiles (ms) per group, largest first"""
+        if np is not None:
+            rows = self._summarize_array(self.array(start, end), by)
+        else:
+            groups: Dict[Tuple, List[float]] = {}
+            for record in self.records(start, end):
+                key = tuple(_text(getattr(record, field)) for field in by)
+                groups.setdefault(key, []).append(record.total_ms)
+            rows = []
+            for key, totals in groups.items():
+                totals.sort()
+                row: Dict[str, Any] = dict(zip(by, key))
+                row.update(
+                    count=len(totals),
+                    p50=percentile(totals, 0.5),
+                    p90=percentile(totals, 0.9),
+                    p99=percentile(totals, 0.99),
+                    max=totals[-1],
+                )
+                rows.append(row)
+        rows.sort(key=lambda row: -row["count"])
+        return rows
+
+    def _summarize_array(self, data: Any, by: Sequence[str]) -> List[Dict[str, Any]]:
+        """``summarize`` of a structured array, grouped without a Python loop"""
+        if not len(data):
+            return []
+        columns = [data["tool_id" if field == "tool" else field] for field in by]
+        # Dense group number per record, one key column at a time
+        group = np.zeros(len(data), dtype=np.int64)
+        for column in columns:
+            values, inverse = np.unique(column, return_inverse=True)
+            group = group * len(values) + inverse.reshape(-1)
+            _, group = np.unique(group, return_inverse=True)
+            group = group.reshape(-1)
+        _, first = np.unique(group, return_index=True)
+        counts = np.bincount(group)
+
+        # Totals sorted within each group, groups laid out one after another
+        totals = data["total_ms"][np.lexsort((data["total_ms"], group))]
+        starts = np.cumsum(counts) - counts
+
+        def at(fraction: float) -> List[float]:
+            # Same nearest rank as stats.percentile
+            rank = np.minimum(counts - 1, (fraction * counts).astype(np.int64))
+            return totals[starts + rank].tolist()
+
+        p50, p90, p99 = at(0.5), at(0.9), at(0.99)
+        maxima = totals[starts + counts - 1].tolist()
+        names = self.tool_names()
+        rows = []
+        # In order of first appearance, like the pure-Python path
+        for g in np.argsort(first, kind="stable").tolist():
+            i = int(first[g])
+            row: Dict[str, Any] = {
+                field: (
+                    _tool_name(names, int(column[i]))
+                    if field == "tool"
+                    else _text(column[i])
+                )
+                for field, column in zip(by, columns)
+            }
+            row.update(
+                count=int(counts[g]), p50=p50[g], p90=p90[g], p99=p99[g], max=maxima[g]
+            )
+            rows.append(row)
+        return rows
+
+
+def _record_count(path: str) -> int:
+    """Complete records in a file; a torn trailing record is ignored"""
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return 0
+        magic, version, record_size, _ = _HEADER.unpack(header)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != _RECORD.size:
+            raise ValueError(f"{path} is not a telemetry file of this version")
+        size = os.fstat(f.fileno()).st_size
+    return (size - _HEADER.size) // _RECORD.size
+
+
+def _decode(fields: Tuple, names: Dict[int, str]) -> Record:
+    *numbers, tool, path, outcome = fields
+    return Record(
+        *numbers,
+        _tool_name(names, tool),
+        path.rstrip(b"\0").decode(errors="replace"),
+        OUTCOMES[outcome] if outcome < len(OUTCOMES) else str(outcome),
+    )
+
+
+def _tool_name(names: Dict[int, str], id_: int) -> str:
+    name = names.get(id_)
+    return name if name is not None else f"#{id_:016x}"
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.rstrip(b"\0").decode(errors="replace")
+    if isinstance(value, int) or (np is not None and isinstance(value, np.integer)):
+        code = int(value)
+        return OUTCOMES[code] if code < len(OUTCOMES) else str(code)
+    return str(value)
+
+
+def format_summary(rows: List[Dict[str, Any]], by: Sequence[str]) -> str:
+    """Table of ``summarize`` rows"""
+    widths = [max([len(field)] + [len(row[field]) for row in rows]) for field in by]
+    header = "  ".join(f"{f:<{w}}" for f, w in zip(by, widths))
+    lines = [
+        f"{header}  {'count':>8}  {'p50 ms':>9}  {'p90 ms':>9}  {'p99 ms':>9}  "
+        f"{'max ms':>9}"
+    ]
+    for row in rows:
+        keys = "  ".join(f"{row[f] or '-':<{w}}" for f, w in zip(by, widths))
+        lines.append(
+            f"{keys}  {row['count']:>8}  {row['p50']:>9.2f}  {row['p90']:>9.2f}  "
+            f"{row['p99']:>9.2f}  {row['max']:>9.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,159 @@
+"""Keyword index for picking the tools relevant to a question.
+
+Each tool is indexed by its name, its ``keywords`` and the words of its
+description and argument docs, with the name and keywords weighted higher. A
+question is scored against the posting lists of its own terms only, so the
+cost of selecting the top-k tools depends on the question, not on how many
+tools are registered.
+"""
+
+import heapq
+import math
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+_TERM = re.compile(r"[a-z0-9]+|[+\-*/%]")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do for from how i in is it me my of on or "
+    "please the this to what whats with you your".split()
+)
+
+# Field weights: a match on the tool name or a declared keyword counts more
+# than one on a word of its description
+NAME_WEIGHT = 3.0
+KEYWORD_WEIGHT = 2.0
+TEXT_WEIGHT = 1.0
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased terms of ``text``, without stopwords, single letters or plural 's'"""
+    result = []
+    for term in _TERM.findall(text.lower()):
+        if term in STOPWORDS or (len(term) == 1 and term.isalpha()):
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        result.append(term)
+    return result
+
+
+class _IndexState:
+    """One published version of the index; never mutated once published"""
+
+    __slots__ = ("postings", "terms", "order", "next")
+
+    def __init__(
+        self,
+        postings: Dict[str, Dict[str, float]],
+        terms: Dict[str, Tuple[str, ...]],
+        order: Dict[str, int],
+        next_: int,
+    ):
+        # term -> {tool name: weight}
+        self.postings = postings
+        self.terms = terms
+        # Registration order breaks ties between equally relevant tools
+        self.order = order
+        self.next = next_
+
+
+class ToolIndex:
+    """Inverted index from terms to tools, ranked by weighted idf.
+
+    Searches read the current state without locking. Updates copy the outer
+    maps and only the posting lists they touch, then publish the new state
+    with one assignment; ``update`` applies a batch with a single copy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _IndexState({}, {}, {}, 0)
+
+    def __len__(self) -> int:
+        return len(self._state.terms)
+
+    def add(self, name: str, keywords: Iterable[str], text: str) -> None:
+        """Index (or re-index) a tool"""
+        self.update(add=[(name, keywords, text)])
+
+    def remove(self, name: str) -> None:
+        self.update(remove=[name])
+
+    def update(
+        self,
+        add: Iterable[Tuple[str, Iterable[str], str]] = (),
+        remove: Iterable[str] = (),
+    ) -> None:
+        """Index the ``(name, keywords, text)`` tools in ``add`` and drop ``remove``"""
+        weighted = [
+            (name, _weights(name, keywords, text)) for name, keywords, text in add
+        ]
+        with self._lock:
+            state = self._state
+            postings = dict(state.postings)
+            copied: Set[str] = set()
+
+            def posting(term: str) -> Dict[str, float]:
+                # Copy a posting list the first time this update changes it
+                current = postings.get(term)
+                if current is None or term not in copied:
+                    copied.add(term)
+                    current = postings[term] = dict(current or ())
+                return current
+
+            new = _IndexState(
+                postings, dict(state.terms), dict(state.order), state.next
+            )
+            for name in remove:
+                self._remove(new, name, posting)
+            for name, weights in weighted:
+                self._remove(new, name, posting)
+                for term, weight in weights.items():
+                    posting(term)[name] = weight
+                new.terms[name] = tuple(weights)
+                new.order[name] = new.next
+                new.next += 1
+            self._state = new
+
+    def search(self, question: str, k: int) -> List[Tuple[str, float]]:
+        """Up to ``k`` (tool name, score) pairs, best first; unmatched tools omitted"""
+        state = self._state
+        scores: Dict[str, float] = {}
+        total = len(state.terms)
+        for term in set(terms(question)):
+            postings = state.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + total / len(postings))
+            for name, weight in postings.items():
+                scores[name] = scores.get(name, 0.0) + weight * idf
+        order = state.order
+        return heapq.nsmallest(
+            k, scores.items(), key=lambda item: (-item[1], order[item[0]])
+        )
+
+    @staticmethod
+    def _remove(
+        state: _IndexState, name: str, posting: Callable[[str], Dict[str, float]]
+    ) -> None:
+        for term in state.terms.pop(name, ()):
+            if term in state.postings:
+                postings = posting(term)
+                postings.pop(name, None)
+                if not postings:
+                    del state.postings[term]
+        state.order.pop(name, None)
+
+
+def _weights(name: str, keywords: Iterable[str], text: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for field, weight in (
+        (terms(name.replace("_", " ")), NAME_WEIGHT),
+        ([t for keyword in keywords for t in terms(keyword)], KEYWORD_WEIGHT),
+        (terms(text), TEXT_WEIGHT),
+    ):
+        for term in field:
+            weights[term] = max(weights.get(term, 0.0), weight)
+    return weights
@@ -1,14 +1,114 @@
-from typing import Dict, Optional
+import json
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import Future
+from importlib.metadata import entry_points
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
+from . import profiling
+from . import snapshot as tool_snapshot
+from .bulkhead import Bulkhead, BulkheadClosed, BulkheadConfig, BulkheadFull
+from .deadline import Deadline
+from .schemas import ToolResult
+from .tool_index import ToolIndex
 from .tools import CalculatorTool, KnowledgeBaseTool, TranslatorTool, WeatherTool
-from .tools.base import BaseTool
+from .tools.base import BaseTool, accepts_timeout
+
+logger = logging.getLogger(__name__)
+
+# Entry point group under which installed packages publish tool plugins
+PLUGIN_GROUP = "agent.tools"
+
+# Tool schemas included in a question's prompt once the catalog is larger
+DEFAULT_CATALOG_TOP_K = 8
+
+# Rendered per-question catalogs kept, keyed by the selected tool names
+_CATALOG_CACHE_SIZE = 256
+
+
+class _ToolSet:
+    """Immutable view of the registered tools, replaced (never mutated) on change"""
+
+    __slots__ = ("tools", "bulkheads", "snippets", "_catalog", "_selected", "_lock")
+
+    def __init__(
+        self,
+        tools: Dict[str, BaseTool],
+        bulkheads: Dict[str, Bulkhead],
+        snippets: Dict[str, str],
+    ):
+        self.tools: Mapping[str, BaseTool] = MappingProxyType(tools)
+        self.bulkheads: Mapping[str, Bulkhead] = MappingProxyType(bulkheads)
+        # Compact JSON catalog entry of each tool, rendered once
+        self.snippets: Mapping[str, str] = MappingProxyType(snippets)
+        self._catalog: Optional[str] = None
+        self._selected: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def catalog(self) -> str:
+        # Two threads may both render it once; either result is the same
+        if self._catalog is None:
+            self._catalog = self.render(self.snippets)
+        return self._catalog
+
+    def selected(self, names: Tuple[str, ...]) -> str:
+        # Hits take no lock; misses insert under it and evict the oldest entry
+        catalog = self._selected.get(names)
+        if catalog is not None:
+            return catalog
+        catalog = self.render(names)
+        with self._lock:
+            self._selected[names] = catalog
+            if len(self._selected) > _CATALOG_CACHE_SIZE:
+                self._selected.popitem(last=False)
+        return catalog
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            catalogs = list(self._selected.values())
+        if self._catalog is not None:
+            catalogs.append(self._catalog)
+        return {
+            "entries": len(catalogs),
+            "max_entries": _CATALOG_CACHE_SIZE + 1,
+            "bytes": sum(sys.getsizeof(catalog) for catalog in catalogs),
+        }
+
+    def render(self, names) -> str:
+        snippets = self.snippets
+        # The index may already list a tool registered after this view
+        return "[" + ",".join(snippets[n] for n in names if n in snippets) + "]"
 
 
 class ToolRegistry:
-    """Registry for managing available tools"""
+    """Registry for managing available tools.
 
-    def __init__(self):
-        self._tools: Dict[str, BaseTool] = {}
+    Reads are lock-free: every registration builds a new immutable
+    ``_ToolSet`` and swaps it in with one assignment, so tools can be added
+    or replaced while other threads keep serving requests. Register many
+    tools with one ``register_tools`` call, which copies the view once.
+
+    ``name in registry`` tells whether a tool plan may name ``name``; the
+    parser validates plans against the registry it is given.
+    """
+
+    def __init__(
+        self,
+        bulkhead_configs: Optional[Dict[str, BulkheadConfig]] = None,
+        catalog_top_k: int = DEFAULT_CATALOG_TOP_K,
+    ):
+        if catalog_top_k < 1:
+            raise ValueError("catalog_top_k must be at least 1")
+        self._bulkhead_configs: Dict[str, BulkheadConfig] = dict(bulkhead_configs or {})
+        self.catalog_top_k = catalog_top_k
+        self._index = ToolIndex()
+        self._state = _ToolSet({}, {}, {})
+        # Serializes writers; readers never take it
+        self._write_lock = threading.Lock()
         self._register_default_tools()
 
     def _register_default_tools(self):
@@ -20,17 +120,280 @@ class ToolRegistry:
             TranslatorTool(),
         ]
 
-        for tool in default_tools:
-            self.register_tool(tool)
+        self.register_tools(default_tools)
 
     def register_tool(self, tool: BaseTool):
-        """Register a new tool"""
-        self._tools[tool.name] = tool
+        """Register a new tool, compiling its argument schema up front"""
+        self.register_tools([tool])
+
+    def register_tools(self, tools: Iterable[BaseTool]):
+        """Register (or replace) several tools with one update of the view"""
+        prepared = []
+        for tool in tools:
+            entry = None
+            if isinstance(tool, BaseTool):
+                tool.compile_args_schema()
+                entry = tool.catalog_entry()
+            prepared.append((tool, entry))
+        if not prepared:
+            return
+
+        with self._write_lock:
+            state = self._state
+            snippets = dict(state.snippets)
+            registered = dict(state.tools)
+            indexed, unindexed = [], []
+            for tool, entry in prepared:
+                name = tool.name
+                if entry is not None:
+                    snippets[name] = json.dumps(entry, separators=(",", ":"))
+                    indexed.append((name, tool.keywords, _index_text(entry)))
+                else:
+                    snippets.pop(name, None)
+                    unindexed.append(name)
+                registered[name] = tool
+            self._index.update(add=indexed, remove=unindexed)
+            self._swap(registered, [tool.name for tool, _ in prepared], snippets)
+
+    def unregister_tool(self, name: str) -> bool:
+        """Remove a tool; calls already in its bulkhead still finish"""
+        with self._write_lock:
+            state = self._state
+            if name not in state.tools:
+                return False
+            tools = dict(state.tools)
+            del tools[name]
+            snippets = dict(state.snippets)
+            snippets.pop(name, None)
+            bulkheads = dict(state.bulkheads)
+            old = bulkheads.pop(name, None)
+            self._index.remove(name)
+            self._state = _ToolSet(tools, bulkheads, snippets)
+        if old is not None:
+            old.shutdown(wait=False)
+        return True
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._state.tools
+
+    def load_plugins(self, group: str = PLUGIN_GROUP) -> List[str]:
+        """Register tools published under the ``group`` entry point.
+
+        An entry point may name a BaseTool subclass, a factory returning a
+        tool or a tool instance. Plugins that fail to load are logged and
+        skipped. Returns the names of the registered tools.
+        """
+        loaded = []
+        for entry_point in entry_points(group=group):
+            try:
+                target = entry_point.load()
+                tool = target if isinstance(target, BaseTool) else target()
+                if not isinstance(tool, BaseTool):
+                    raise TypeError(f"{type(tool).__name__} is not a BaseTool")
+                tool.compile_args_schema()
+                tool.catalog_entry()
+            except Exception as e:
+                logger.warning("Skipping tool plugin %s: %s", entry_point.name, e)
+                continue
+            loaded.append(tool)
+        self.register_tools(loaded)
+        return [tool.name for tool in loaded]
+
+    def select_tools(self, question: str, k: Optional[int] = None) -> List[str]:
+        """Names of the ``k`` tools most relevant to ``question``, best first"""
+        k = self.catalog_top_k if k is None else k
+        return [name for name, _ in self._index.search(question, k)]
 
     def get_tool(self, name: str) -> Optional[BaseTool]:
         """Get a tool by name"""
-        return self._tools.get(name)
+        return self._state.tools.get(name)
+
+    def list_tools(self) -> Mapping[str, BaseTool]:
+        """Read-only mapping of all registered tools (no copy is made)"""
+        return self._state.tools
+
+    def warmup(self):
+        """Build every tool's data and indexes up front"""
+        for tool in self._state.tools.values():
+            if isinstance(tool, BaseTool):
+                tool.warm()
+
+    def snapshot_sections(self) -> Dict[str, bytes]:
+        """Every tool's lookup tables, by snapshot section name"""
+        sections: Dict[str, bytes] = {}
+        for tool in self._state.tools.values():
+            if isinstance(tool, BaseTool):
+                sections.update(tool.snapshot_sections())
+        return sections
+
+    def snapshot_sources(self) -> List[str]:
+        """Files the snapshot is built from"""
+        return [
+            path
+            for tool in self._state.tools.values()
+            if isinstance(tool, BaseTool)
+            for path in tool.snapshot_sources()
+        ]
+
+    def load_snapshot(
+        self, path: str = tool_snapshot.DEFAULT_PATH
+    ) -> tool_snapshot.Snapshot:
+        """Serve tool lookups from the snapshot at ``path``, rebuilt if stale"""
+        snapshot = tool_snapshot.load_or_build(
+            self.snapshot_sections, self.snapshot_sources(), path
+        )
+        for tool in self._state.tools.values():
+            if isinstance(tool, BaseTool):
+                tool.attach_snapshot(snapshot)
+        return snapshot
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """Schema-derived descriptions of every registered tool"""
+        return [
+            tool.catalog_entry()
+            for tool in self._state.tools.values()
+            if isinstance(tool, BaseTool)
+        ]
+
+    def catalog_json(self, question: Optional[str] = None) -> str:
+        """Tool catalog rendered as JSON for prompts, cached until tools change.
+
+        With a ``question`` and more than ``catalog_top_k`` tools, only the
+        most relevant tools are listed. Each selection is rendered once from
+        cached per-tool snippets and the same string is returned for it.
+        """
+        state = self._state
+        if question is None or len(state.snippets) <= self.catalog_top_k:
+            return state.catalog()
+        return state.selected(tuple(self.select_tools(question)))
+
+    def configure_bulkhead(self, name: str, config: BulkheadConfig):
+        """Set concurrency, queue and timeout limits for a tool"""
+        with self._write_lock:
+            self._bulkhead_configs[name] = config
+            state = self._state
+            if name in state.tools:
+                self._swap(dict(state.tools), [name], dict(state.snippets))
+
+    def execute(
+        self, tool: BaseTool, args: Dict[str, Any], timeout: Optional[float] = None
+    ) -> ToolResult:
+        """Execute a tool inside its bulkhead.
+
+        Calls over the tool's concurrency and queue limits fail fast, and calls
+        that exceed the adaptive timeout, or the caller's ``timeout`` budget,
+        return an error result. Tools whose ``execute`` predates the
+        ``timeout`` argument are called without it; the bulkhead still stops
+        waiting for them when the budget runs out.
+        """
+        budgeted = timeout is not None and accepts_timeout(tool)
+        if tool.name not in self._state.bulkheads:
+            return (
+                tool.execute(args, timeout=timeout) if budgeted else tool.execute(args)
+            )
+
+        run = tool.execute
+        if budgeted:
+            run = self._with_budget(tool, Deadline.after(timeout))
+
+        try:
+            bulkhead, future = self._submit(
+                tool, profiling.bind(run, f"tool:{tool.name}"), args
+            )
+            return bulkhead.wait(future, timeout)
+        except BulkheadFull:
+            error = f"Tool '{tool.name}' is overloaded, please retry later."
+        except TimeoutError as e:
+            error = str(e)
+
+        return ToolResult(success=False, result="", error=error, tool_used=tool.name)
+
+    def submit(self, tool: BaseTool, args: Dict[str, Any]) -> Optional[Future]:
+        """Start a tool call in its bulkhead without waiting for it.
+
+        The call starts only if a worker slot in the bulkhead is free right
+        now; otherwise None is returned and nothing is queued, so optional
+        work such as prefetching never takes a queue slot from real calls.
+        """
+        fn = profiling.bind(tool.execute, f"tool:{tool.name}")
+        while True:
+            bulkhead = self._state.bulkheads.get(tool.name)
+            if bulkhead is None:
+                return None
+            try:
+                return bulkhead.try_submit(fn, args)
+            except BulkheadClosed:
+                # Replaced since it was read; its successor is already live
+                continue
+
+    def wait(
+        self, tool: BaseTool, future: Future, timeout: Optional[float] = None
+    ) -> ToolResult:
+        """Result of a submitted call, or an error result on timeout"""
+        bulkhead = self._state.bulkheads.get(tool.name)
+        try:
+            if bulkhead is None:
+                return future.result(timeout=timeout)
+            return bulkhead.wait(future, timeout)
+        except (TimeoutError, futures.TimeoutError) as e:
+            error = str(e) or f"Tool '{tool.name}' timed out"
+        return ToolResult(success=False, result="", error=error, tool_used=tool.name)
+
+    def _submit(
+        self, tool: BaseTool, fn: Callable[..., Any], args: Dict[str, Any]
+    ) -> Tuple[Bulkhead, Future]:
+        while True:
+            bulkhead = self._state.bulkheads[tool.name]
+            try:
+                return bulkhead, bulkhead.submit(fn, args)
+            except BulkheadClosed:
+                # Replaced since it was read; its successor is already live
+                continue
+
+    @staticmethod
+    def _with_budget(
+        tool: BaseTool, budget: Deadline
+    ) -> Callable[[Dict[str, Any]], ToolResult]:
+        # Recompute the remaining budget on the worker thread, after queueing
+        def run(args: Dict[str, Any]) -> ToolResult:
+            return tool.execute(args, timeout=budget.remaining())
+
+        return run
+
+    def catalog_cache_stats(self) -> Dict[str, Any]:
+        """Size of the rendered catalogs cached for the current tools"""
+        return self._state.cache_stats()
+
+    def bulkhead_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tool bulkhead counters"""
+        return {name: b.stats() for name, b in self._state.bulkheads.items()}
+
+    def _swap(
+        self, tools: Dict[str, BaseTool], names: List[str], snippets: Dict[str, str]
+    ) -> None:
+        """Publish a new view with fresh bulkheads for ``names``.
+
+        Called with the write lock held. The old bulkheads finish the calls
+        already queued on them; late submissions move to the new ones. All
+        bulkheads share one pool of worker threads.
+        """
+        bulkheads = dict(self._state.bulkheads)
+        old = []
+        for name in names:
+            if name in bulkheads:
+                old.append(bulkheads[name])
+            bulkheads[name] = Bulkhead(
+                name, self._bulkhead_configs.get(name, BulkheadConfig())
+            )
+        self._state = _ToolSet(tools, bulkheads, snippets)
+        for bulkhead in old:
+            bulkhead.shutdown(wait=False)
+
 
-    def list_tools(self) -> Dict[str, BaseTool]:
-        """List all registered tools"""
-        return self._tools.copy()
+def _index_text(entry: Dict[str, Any]) -> str:
+    """Description plus argument names and docs of a catalog entry"""
+    parts = [entry["description"]]
+    for arg, schema in entry["args"]["properties"].items():
+        parts.append(arg.replace("_", " "))
+        parts.append(schema.get("description", ""))
+    return " ".join(parts)
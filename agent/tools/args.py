@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, model_validator
+
+ArgType = Literal["string", "number", "integer", "boolean"]
+
+# Result of a compiled validator: (coerced args, None) or (None, error message)
+ValidationResult = Tuple[Optional[Dict[str, Any]], Optional[str]]
+ArgValidator = Callable[[Any], ValidationResult]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+_MISSING = object()
+
+
+class ArgSpec(BaseModel):
+    """Declaration of a single tool argument"""
+
+    name: str
+    type: ArgType = "string"
+    required: bool = True
+    default: Any = None
+    lower: bool = False
+    strip: bool = False
+    description: str = ""
+
+    @model_validator(mode="after")
+    def _check_transforms(self) -> "ArgSpec":
+        if (self.lower or self.strip) and self.type != "string":
+            raise ValueError("lower/strip only apply to string arguments")
+        return self
+
+    def json_schema(self) -> Dict[str, Any]:
+        """JSON schema fragment for the tool catalog"""
+        schema: Dict[str, Any] = {"type": self.type}
+        if self.description:
+            schema["description"] = self.description
+        if not self.required and self.default is not None:
+            schema["default"] = self.default
+        return schema
+
+
+def invalid_args_message(schema: Sequence[ArgSpec]) -> str:
+    """Error message describing the expected arguments"""
+    required = [spec for spec in schema if spec.required] or list(schema)
+    if len(required) == 1:
+        spec = required[0]
+        return (
+            f"Invalid arguments. Expected '{spec.name}' field "
+            f"with {spec.type} value."
+        )
+    names = " and ".join(f"'{spec.name}'" for spec in required)
+    return f"Invalid arguments. Expected {names} fields."
+
+
+def compile_args_schema(schema: Sequence[ArgSpec]) -> ArgValidator:
+    """Build a validator/coercer function for a schema.
+
+    The validator checks required keys and types, applies strip and lower,
+    fills defaults and returns only the declared arguments. Each argument's
+    checks are resolved once here, so a call only runs the steps it needs.
+    """
+    error = (None, invalid_args_message(schema) if schema else "Invalid arguments.")
+    steps = [_compile_arg(spec) for spec in schema]
+
+    def validate(args: Any) -> ValidationResult:
+        if not isinstance(args, dict):
+            return error
+        out: Dict[str, Any] = {}
+        for step in steps:
+            if not step(args, out):
+                return error
+        return out, None
+
+    return validate
+
+
+def _compile_arg(spec: ArgSpec) -> Callable[[Dict[str, Any], Dict[str, Any]], bool]:
+    """Step copying one argument from ``args`` to ``out``; False if invalid"""
+    name, required, default = spec.name, spec.required, spec.default
+    check = _TYPE_CHECKS[spec.type]
+    transforms: List[Callable[[Any], Any]] = []
+    if spec.type == "number":
+        transforms.append(float)
+    if spec.strip:
+        transforms.append(str.strip)
+    if spec.lower:
+        transforms.append(str.lower)
+
+    def step(args: Dict[str, Any], out: Dict[str, Any]) -> bool:
+        value = args.get(name, _MISSING)
+        if value is _MISSING:
+            if required:
+                return False
+            out[name] = default
+            return True
+        if not check(value):
+            return False
+        for transform in transforms:
+            value = transform(value)
+        out[name] = value
+        return True
+
+    return step
@@ -1,11 +1,52 @@
+import inspect
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
+from .. import deadline
+from ..deadline import Deadline, DeadlineExceeded
 from ..schemas import ToolResult
+from .args import ArgSpec, ArgValidator, compile_args_schema
+
+# Compiled validators shared by every tool declaring the same schema
+_VALIDATOR_CACHE: Dict[Tuple[str, ...], ArgValidator] = {}
+# Tool class -> whether its execute() takes ``timeout``
+_ACCEPTS_TIMEOUT: Dict[type, bool] = {}
+
+
+def validator_cache_size() -> int:
+    """Number of compiled argument validators cached"""
+    return len(_VALIDATOR_CACHE)
+
+
+def accepts_timeout(tool: Any) -> bool:
+    """Whether ``tool.execute`` takes ``timeout``; older tools take only args"""
+    cls = type(tool)
+    accepts = _ACCEPTS_TIMEOUT.get(cls)
+    if accepts is None:
+        params = inspect.signature(cls.execute).parameters.values()
+        accepts = any(p.name == "timeout" or p.kind is p.VAR_KEYWORD for p in params)
+        _ACCEPTS_TIMEOUT[cls] = accepts
+    return accepts
 
 
 class BaseTool(ABC):
-    """Base class for all tools"""
+    """Base class for all tools.
+
+    Subclasses declare ``args_schema`` once; it is compiled into a validator
+    that checks and normalizes arguments before ``run`` is called, and it also
+    describes the tool in the prompt catalog. Tools written before ``run``
+    existed, which override ``execute`` (and ``validate_args``) instead, still
+    work unchanged.
+    """
+
+    description: str = ""
+    args_schema: Tuple[ArgSpec, ...] = ()
+    error_prefix: str = "Tool error"
+    # Same arguments always give the same result with no side effects, so
+    # the call may be prefetched speculatively or cached
+    idempotent: bool = False
+    # Extra words the tool is found by when selecting tools for a question
+    keywords: Tuple[str, ...] = ()
 
     @property
     @abstractmethod
@@ -13,12 +54,104 @@ class BaseTool(ABC):
         """Tool name"""
         pass
 
-    @abstractmethod
-    def execute(self, args: Dict[str, Any]) -> ToolResult:  # pragma: no cover
-        """Execute the tool with given arguments"""
+    def run(self, args: Dict[str, Any]) -> Any:
+        """Run the tool on validated arguments and return the raw result.
+
+        Only called by the default ``execute``, so a tool that overrides
+        ``execute`` need not implement it.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} must implement run() or override execute()"
+        )
+
+    def warm(self) -> None:
+        """Load data and build indexes ahead of the first call"""
         pass
 
-    @abstractmethod
-    def validate_args(self, args: Dict[str, Any]) -> bool:  # pragma: no cover
-        """Validate tool arguments"""
+    def snapshot_sections(self) -> Dict[str, bytes]:
+        """Lookup tables to store in the prebuilt snapshot, by section name"""
+        return {}
+
+    def snapshot_sources(self) -> List[str]:
+        """Files the snapshot sections are built from"""
+        return []
+
+    def attach_snapshot(self, snapshot: Any) -> None:
+        """Serve lookups from a loaded ``agent.snapshot.Snapshot``"""
         pass
+
+    def _module_file(self) -> str:
+        # Source file of the in-code tables, so editing them rebuilds the snapshot
+        return inspect.getfile(type(self))
+
+    @property
+    def validator(self) -> ArgValidator:
+        """Compiled argument validator for this tool's schema"""
+        validator = self.__dict__.get("_validator")
+        if validator is None:
+            validator = self.compile_args_schema()
+        return validator
+
+    def compile_args_schema(self) -> ArgValidator:
+        """Compile (or fetch the cached) validator for ``args_schema``"""
+        key = tuple(spec.model_dump_json() for spec in self.args_schema)
+        validator = _VALIDATOR_CACHE.get(key)
+        if validator is None:
+            validator = _VALIDATOR_CACHE.setdefault(
+                key, compile_args_schema(self.args_schema)
+            )
+        self._validator = validator
+        return validator
+
+    def validate_args(self, args: Dict[str, Any]) -> bool:
+        """Validate tool arguments"""
+        return self.validator(args)[1] is None
+
+    def execute(
+        self, args: Dict[str, Any], timeout: Optional[float] = None
+    ) -> ToolResult:
+        """Validate arguments and run the tool.
+
+        ``timeout`` is the request's remaining budget in seconds. A tool with
+        no budget left is not run, and ``run`` can call
+        :func:`agent.deadline.check` to stop early once it is used up.
+        """
+        if timeout is not None and timeout <= 0:
+            return self._error_result(f"Tool '{self.name}' ran out of time")
+        values, error = self.validator(args)
+        if error is not None:
+            return self._error_result(error)
+
+        budget = Deadline.after(timeout) if timeout is not None else None
+        try:
+            with deadline.scope(budget):
+                result = self.run(values)
+            return self._success_result(result)
+        except DeadlineExceeded:
+            return self._error_result(f"Tool '{self.name}' ran out of time")
+        except Exception as e:
+            return self._error_result(f"{self.error_prefix}: {str(e)}")
+
+    def catalog_entry(self) -> Dict[str, Any]:
+        """Describe the tool and its arguments for prompts"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "args": {
+                "type": "object",
+                "properties": {
+                    spec.name: spec.json_schema() for spec in self.args_schema
+                },
+                "required": [spec.name for spec in self.args_schema if spec.required],
+            },
+        }
+
+    def _success_result(self, value: Any) -> ToolResult:
+        """Wrap the value ``run`` returned in a successful result"""
+        return ToolResult(success=True, result=value, tool_used=self.name)
+
+    def _error_result(self, error: str) -> ToolResult:
+        # Fields are known to be valid, so skip pydantic validation
+        return ToolResult.model_construct(
+            success=False, result="", error=error, tool_used=self.name
+        )
@@ -1,56 +1,159 @@
 import json
-from typing import Any, Dict
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
+from .. import deadline, trigram
 from ..schemas import ToolResult
+from ..snapshot import MappedEntries, encode_entries, encode_map
+from ..trigram import TrigramIndex, normalize, similarity
+from .args import ArgSpec
 from .base import BaseTool
 
 
+class KBMatch(NamedTuple):
+    name: str
+    summary: str
+    score: float  # 1.0 when the name contains the query
+
+
+def _decode_ids(data: bytes) -> Sequence[int]:
+    return memoryview(data).cast("I") if data else array("I")
+
+
 class KnowledgeBaseTool(BaseTool):
-    """Knowledge base lookup tool"""
+    """Knowledge base lookup tool.
+
+    A query matches the first entry whose name (or alias) contains it. When
+    none does, the names sharing the most character trigrams with the query
+    are compared by edit distance, so misspelled, reordered or oddly spaced
+    names ("ada lovelase", "lovelace, ada", "alan turin g") still match.
+    """
+
+    description = "Look up people and topics in the knowledge base"
+    args_schema = (
+        ArgSpec(name="q", lower=True, strip=True, description="Name to look up"),
+    )
+    error_prefix = "Knowledge base error"
+    idempotent = True
+    keywords = ("who", "person", "biography", "history", "knowledge")
+
+    # Names compared by edit distance per fuzzy lookup
+    max_candidates = 16
+    # Edits allowed per character of the longer string
+    max_edit_ratio = 0.25
+    # Words this short must match exactly
+    exact_length = 4
+    # Names scanned for a substring between deadline checks
+    check_every = 1024
 
     def __init__(self, kb_path: str = "data/kb.json"):
         self.kb_path = kb_path
+        self._entries: Optional[List[Tuple[str, str]]] = None
+        self._mapped: Optional[MappedEntries] = None
+        # (lowercased name or alias, entry index): names first, then aliases
+        self._keys: Optional[Sequence[Tuple[str, Any]]] = None
+        self._index: Optional[TrigramIndex] = None
 
     @property
     def name(self) -> str:
         return "kb"
 
-    def validate_args(self, args: Dict[str, Any]) -> bool:
-        return "q" in args and isinstance(args["q"], str)
+    def run(self, args: Dict[str, Any]) -> Tuple[str, Optional[float]]:
+        return self._lookup(args["q"])
 
-    def execute(self, args: Dict[str, Any]) -> ToolResult:
-        if not self.validate_args(args):
-            return ToolResult(
-                success=False,
-                result="",
-                error="Invalid arguments. Expected 'q' field with string value.",
-                tool_used=self.name,
-            )
+    def _success_result(self, value: Tuple[str, Optional[float]]) -> ToolResult:
+        # The summary is the result; a found entry also carries its score
+        text, score = value
+        return ToolResult(success=True, result=text, tool_used=self.name, score=score)
 
-        try:
-            query = args["q"].lower().strip()
-            result = self._lookup(query)
-            return ToolResult(success=True, result=result, tool_used=self.name)
-        except Exception as e:
-            return ToolResult(
-                success=False,
-                result="",
-                error=f"Knowledge base error: {str(e)}",
-                tool_used=self.name,
-            )
+    def warm(self) -> None:
+        if self._mapped is None or self._index is None:
+            self._load_entries()
 
-    def _lookup(self, query: str) -> str:
-        """Look up information in the knowledge base"""
-        try:
+    def snapshot_sections(self) -> Dict[str, bytes]:
+        entries = self._load_entries()
+        keys = [(key, str(entry)) for key, entry in self._keys]
+        return {
+            "kb": encode_entries(entries),
+            "kb_keys": encode_entries(keys),
+            "kb_trigrams": encode_map(self._index.items()),
+        }
+
+    def snapshot_sources(self) -> List[str]:
+        return [self._module_file(), trigram.__file__, self.kb_path]
+
+    def attach_snapshot(self, snapshot: Any) -> None:
+        self._mapped = snapshot.entries("kb")
+        keys = snapshot.entries("kb_keys")
+        postings = snapshot.map("kb_trigrams", decode_value=_decode_ids)
+        if keys is not None and postings is not None:
+            self._keys = keys
+            self._index = TrigramIndex(postings)
+
+    def _load_entries(self) -> List[Tuple[str, str]]:
+        """Load (lowercased name, summary) pairs once and keep them in memory"""
+        entries = self._entries
+        if entries is None:
             with open(self.kb_path, "r") as f:
                 data = json.load(f)
+            items = data.get("entries", [])
+            entries = [
+                (item.get("name", "").lower(), item.get("summary", ""))
+                for item in items
+            ]
+            keys: List[Tuple[str, Any]] = [
+                (name, i) for i, (name, _) in enumerate(entries)
+            ]
+            for i, item in enumerate(items):
+                keys.extend((alias.lower(), i) for alias in item.get("aliases", []))
+            self._index = TrigramIndex.build(key for key, _ in keys)
+            self._keys = keys
+            self._entries = entries
+        return entries
+
+    def _entry(self, index: int) -> Tuple[str, str]:
+        if self._mapped is not None:
+            return self._mapped[index]
+        return self._load_entries()[index]
 
-            for item in data.get("entries", []):
-                if query in item.get("name", "").lower():
-                    return item.get("summary", "")
+    def search(self, query: str) -> Optional[KBMatch]:
+        """Best entry for a lowercased query, with its similarity score"""
+        if self._index is None:
+            self._load_entries()
+        keys, index = self._keys, self._index
 
-            return "No entry found."
+        ids = index.containing(query)
+        for scanned, id_ in enumerate(range(len(keys)) if ids is None else ids):
+            if not scanned % self.check_every:
+                deadline.check("Knowledge base lookup")
+            key, entry = keys[id_]
+            if query in key:
+                return KBMatch(*self._entry(int(entry)), 1.0)
+
+        target = normalize(query)
+        if not target:
+            return None
+        best: Optional[Tuple[float, Any]] = None
+        for id_, _ in index.candidates(target, self.max_candidates):
+            deadline.check("Knowledge base lookup")
+            key, entry = keys[id_]
+            score = similarity(
+                target, normalize(key), self.max_edit_ratio, self.exact_length
+            )
+            if score > 0.0 and (best is None or score > best[0]):
+                best = (score, entry)
+        if best is None:
+            return None
+        return KBMatch(*self._entry(int(best[1])), best[0])
+
+    def _lookup(self, query: str) -> Tuple[str, Optional[float]]:
+        """Look up information in the knowledge base, with the match score"""
+        try:
+            match = self.search(query)
+            if match is None:
+                return "No entry found.", None
+            return match.summary, match.score
         except FileNotFoundError:  # pragma: no cover
-            return "Knowledge base not found."
+            return "Knowledge base not found.", None
         except json.JSONDecodeError:  # pragma: no cover
-            return "Knowledge base format error."
+            return "Knowledge base format error.", None
@@ -0,0 +1,268 @@
+"""Single-pass tokenizer and Pratt parser for calculator expressions.
+
+Handles ordinary arithmetic plus the natural-language forms users type:
+
+* ``12.5% of 243``, ``15% of 200 plus 3``, ``50%``
+* ``add 10 to 5``, ``subtract 3 from 10``
+* ``plus``, ``minus``, ``times``, ``multiplied by``, ``divided by``, ``over``
+* ``average of 1, 2 and 3``, ``sum of 4 and 5``
+* thousands separators (``1,250.5``) and filler such as ``what is ...?``
+
+In ``average of 100,200,300`` the commas separate list items: after
+``average``, ``mean`` or ``sum``, a comma only groups thousands if the rest
+of the expression also separates items some other way (``, `` or ``and``),
+as in ``average of 1,000, 3,000``.
+
+Tokens are produced lazily and values are computed while parsing, so the cost
+is linear in the input length and nothing is ever passed to ``eval``. Every
+``_CHECK_EVERY`` tokens the parser checks the request deadline, so a long
+expression stops once the request is out of time.
+"""
+
+import re
+from typing import Iterator, List, Tuple
+
+from .. import deadline
+
+Token = Tuple[str, object]  # (kind, value)
+
+# Words that carry no meaning for the calculation
+_FILLER = frozenset(
+    {"what", "whats", "is", "the", "please", "calculate", "compute", "equals"}
+)
+
+# Two-word operators: first word -> (second word, operator)
+_PHRASES = {"multiplied": ("by", "*"), "divided": ("by", "/")}
+
+_WORD_OPS = {
+    "plus": "+",
+    "minus": "-",
+    "times": "*",
+    "over": "/",
+    "x": "*",
+}
+
+_KEYWORDS = frozenset(
+    {"add", "subtract", "to", "from", "of", "and", "average", "mean", "sum"}
+)
+
+# Binding powers for infix operators
+_INFIX_BP = {"+": 10, "-": 10, "*": 20, "/": 20, "^": 40}
+_PREFIX_BP = 30
+_PERCENT_BP = 50
+_MAX_DEPTH = 100
+# Tokens parsed between deadline checks
+_CHECK_EVERY = 256
+
+_DIGITS = frozenset("0123456789")
+
+_LIST_KEYWORDS = frozenset({"average", "mean", "sum"})
+# Item separators other than a bare comma
+_LIST_SEPARATOR = re.compile(r",\s|\band\b")
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions the calculator cannot parse"""
+
+
+def _thousands_group(text: str, i: int) -> bool:
+    """Whether the comma at i is followed by exactly three digits"""
+    end = i + 4
+    return (
+        end <= len(text)
+        and all(text[j] in _DIGITS for j in range(i + 1, end))
+        and not (end < len(text) and text[end] in _DIGITS)
+    )
+
+
+def tokenize(text: str) -> Iterator[Token]:
+    """Yield tokens from text in a single left-to-right scan"""
+    text = text.lower()
+    i = 0
+    n = len(text)
+    grouping = True  # whether "1,000" is one number
+    separator_at = -1  # next list separator found so far
+    while i < n:
+        c = text[i]
+        if c.isspace() or c == "?":
+            i += 1
+        elif c in _DIGITS or (c == "." and i + 1 < n and text[i + 1] in _DIGITS):
+            start = i
+            digits: List[str] = []
+            seen_dot = False
+            while i < n:
+                c = text[i]
+                if c in _DIGITS:
+                    digits.append(c)
+                elif c == "." and not seen_dot:
+                    seen_dot = True
+                    digits.append(c)
+                elif (
+                    c == ","
+                    and grouping
+                    and not seen_dot
+                    and i > start
+                    and _thousands_group(text, i)
+                ):
+                    pass
+                else:
+                    break
+                i += 1
+            yield ("num", float("".join(digits)))
+        elif c.isalpha():
+            start = i
+            while i < n and (text[i].isalpha() or text[i] == "'"):
+                i += 1
+            word = text[start:i].replace("'", "")
+            if word in _FILLER:
+                continue
+            if word in _PHRASES:
+                expected, op = _PHRASES[word]
+                j = i
+                while j < n and text[j].isspace():
+                    j += 1
+                if not text.startswith(expected, j):
+                    raise ExpressionError(f"Expected '{expected}' after '{word}'")
+                i = j + len(expected)
+                yield ("op", op)
+            elif word in _WORD_OPS:
+                yield ("op", _WORD_OPS[word])
+            elif word in _KEYWORDS:
+                if word in _LIST_KEYWORDS and grouping and separator_at < i:
+                    # A list of bare-comma items: "average of 100,200,300"
+                    match = _LIST_SEPARATOR.search(text, i)
+                    grouping = match is not None
+                    separator_at = match.start() if match else n
+                yield ("kw", word)
+            else:
+                raise ExpressionError(f"Unknown word '{word}'")
+        elif text.startswith("**", i):
+            i += 2
+            yield ("op", "^")
+        elif c in "+-*/^":
+            i += 1
+            yield ("op", c)
+        elif c in "()%,":
+            i += 1
+            yield (c, c)
+        else:
+            raise ExpressionError("Expression contains invalid characters")
+    yield ("end", None)
+
+
+class _Parser:
+    """Pratt parser that evaluates as it parses"""
+
+    def __init__(self, text: str):
+        self._tokens = tokenize(text)
+        self._current: Token = next(self._tokens)
+        self._depth = 0
+        self._until_check = _CHECK_EVERY
+
+    def parse(self) -> float:
+        value = self._expression(0)
+        if self._current[0] != "end":
+            raise ExpressionError(f"Unexpected '{self._current[1]}'")
+        return value
+
+    def _advance(self) -> Token:
+        token = self._current
+        if token[0] != "end":
+            self._current = next(self._tokens)
+            self._until_check -= 1
+            if not self._until_check:
+                self._until_check = _CHECK_EVERY
+                deadline.check("Calculation")
+        return token
+
+    def _expect(self, kind: str, value: object = None) -> None:
+        token = self._advance()
+        if token[0] != kind or (value is not None and token[1] != value):
+            found = "end of input" if token[0] == "end" else f"'{token[1]}'"
+            raise ExpressionError(f"Expected '{value or kind}', found {found}")
+
+    def _is(self, kind: str, value: object = None) -> bool:
+        return self._current[0] == kind and (value is None or self._current[1] == value)
+
+    def _expression(self, rbp: int) -> float:
+        self._depth += 1
+        if self._depth > _MAX_DEPTH:
+            raise ExpressionError("Expression is nested too deeply")
+        try:
+            left = self._prefix(self._advance())
+            while True:
+                kind, value = self._current
+                if kind == "%":
+                    if _PERCENT_BP <= rbp:
+                        break
+                    self._advance()
+                    left = self._percent(left)
+                elif kind == "op" and _INFIX_BP[value] > rbp:
+                    self._advance()
+                    left = self._infix(value, left)
+                else:
+                    break
+            return left
+        finally:
+            self._depth -= 1
+
+    def _prefix(self, token: Token) -> float:
+        kind, value = token
+        if kind == "num":
+            return value
+        if kind == "(":
+            inner = self._expression(0)
+            self._expect(")")
+            return inner
+        if kind == "op" and value in "+-":
+            operand = self._expression(_PREFIX_BP)
+            return -operand if value == "-" else operand
+        if kind == "kw":
+            if value == "add":
+                left = self._expression(_INFIX_BP["+"])
+                self._expect("kw", "to")
+                return left + self._expression(_INFIX_BP["+"])
+            if value == "subtract":
+                amount = self._expression(_INFIX_BP["+"])
+                self._expect("kw", "from")
+                return self._expression(_INFIX_BP["+"]) - amount
+            if value in ("average", "mean", "sum"):
+                self._expect("kw", "of")
+                items = self._list()
+                return sum(items) / len(items) if value != "sum" else sum(items)
+        if kind == "end":
+            raise ExpressionError("Incomplete expression")
+        raise ExpressionError(f"Unexpected '{value}'")
+
+    def _infix(self, op: str, left: float) -> float:
+        if op == "^":
+            # Right associative
+            return left ** self._expression(_INFIX_BP[op] - 1)
+        right = self._expression(_INFIX_BP[op])
+        if op == "+":
+            return left + right
+        if op == "-":
+            return left - right
+        if op == "*":
+            return left * right
+        return left / right
+
+    def _percent(self, value: float) -> float:
+        if self._is("kw", "of"):
+            self._advance()
+            return value / 100.0 * self._expression(_INFIX_BP["*"])
+        return value / 100.0
+
+    def _list(self) -> List[float]:
+        items = [self._expression(0)]
+        while self._is(",") or self._is("kw", "and"):
+            self._advance()
+            if self._is("kw", "and"):
+                self._advance()
+            items.append(self._expression(0))
+        return items
+
+
+def evaluate(text: str) -> float:
+    """Parse and evaluate a calculator expression"""
+    return float(_Parser(text).parse())
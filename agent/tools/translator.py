@@ -1,12 +1,27 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Mapping, Tuple
 
-from ..schemas import ToolResult
+from ..snapshot import encode_map
+from .args import ArgSpec
 from .base import BaseTool
 
 
 class TranslatorTool(BaseTool):
     """Mock implementation of translation tool"""
 
+    description = "Translate a short phrase into another language"
+    args_schema = (
+        ArgSpec(name="text", lower=True, strip=True, description="Text to translate"),
+        ArgSpec(
+            name="target_language",
+            lower=True,
+            strip=True,
+            description="Language to translate into",
+        ),
+    )
+    error_prefix = "Translation error"
+    idempotent = True
+    keywords = ("translate", "translation", "spanish", "french", "german")
+
     # Mock translation data
     _TRANSLATIONS = {
         ("hello", "spanish"): "hola",
@@ -25,46 +40,47 @@ class TranslatorTool(BaseTool):
         ("no", "french"): "non",
         ("no", "german"): "nein",
     }
+    _translations: Mapping[Tuple[str, str], str] = _TRANSLATIONS
 
     @property
     def name(self) -> str:
         return "translator"
 
-    def validate_args(self, args: Dict[str, Any]) -> bool:
-        return (
-            "text" in args
-            and isinstance(args["text"], str)
-            and "target_language" in args
-            and isinstance(args["target_language"], str)
-        )
+    def run(self, args: Dict[str, Any]) -> str:
+        return self._translate(args["text"], args["target_language"])
 
-    def execute(self, args: Dict[str, Any]) -> ToolResult:
-        if not self.validate_args(args):
-            return ToolResult(
-                success=False,
-                result="",
-                error="Invalid arguments. Expected 'text' and 'target_language' fields.",
-                tool_used=self.name,
+    def snapshot_sections(self) -> Dict[str, bytes]:
+        return {
+            "translator": encode_map(
+                (_encode_key(key), value.encode())
+                for key, value in self._TRANSLATIONS.items()
             )
+        }
 
-        try:
-            text = args["text"].lower().strip()
-            target_lang = args["target_language"].lower().strip()
+    def snapshot_sources(self) -> List[str]:
+        return [self._module_file()]
 
-            translation = self._translate(text, target_lang)
-            return ToolResult(success=True, result=translation, tool_used=self.name)
-        except Exception as e:
-            return ToolResult(
-                success=False,
-                result="",
-                error=f"Translation error: {str(e)}",
-                tool_used=self.name,
-            )
+    def attach_snapshot(self, snapshot: Any) -> None:
+        translations = snapshot.map(
+            "translator", encode_key=_encode_key, decode_key=_decode_key
+        )
+        if translations is not None:
+            self._translations = translations
 
     def _translate(self, text: str, target_language: str) -> str:
         """Translate text to target language"""
         key = (text, target_language)
-        if key in self._TRANSLATIONS:
-            return self._TRANSLATIONS[key]
+        translation = self._translations.get(key)
+        if translation is not None:
+            return translation
         else:
             return f"Translation not available for '{text}' to {target_language}"
+
+
+def _encode_key(key: Tuple[str, str]) -> bytes:
+    return "\x1f".join(key).encode()
+
+
+def _decode_key(data: bytes) -> Tuple[str, str]:
+    text, language = data.decode().split("\x1f")
+    return text, language
@@ -1,12 +1,21 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Mapping
 
-from ..schemas import ToolResult
+from ..snapshot import encode_map
+from .args import ArgSpec
 from .base import BaseTool
 
 
 class WeatherTool(BaseTool):
     """Weather tool for temperature queries"""
 
+    description = "Current temperature in degrees Celsius for a city"
+    args_schema = (
+        ArgSpec(name="city", lower=True, strip=True, description="City name"),
+    )
+    error_prefix = "Weather lookup error"
+    idempotent = True
+    keywords = ("weather", "temperature", "forecast", "hot", "cold")
+
     # Mock temperature data
     _TEMPS = {
         "paris": 18.0,
@@ -16,36 +25,32 @@ class WeatherTool(BaseTool):
         "new york": 15.0,
         "tokyo": 22.0,
     }
+    _temps: Mapping[str, float] = _TEMPS
 
     @property
     def name(self) -> str:
         return "weather"
 
-    def validate_args(self, args: Dict[str, Any]) -> bool:
-        return "city" in args and isinstance(args["city"], str)
+    def run(self, args: Dict[str, Any]) -> float:
+        return self._get_temperature(args["city"])
 
-    def execute(self, args: Dict[str, Any]) -> ToolResult:
-        if not self.validate_args(args):
-            return ToolResult(
-                success=False,
-                result="",
-                error="Invalid arguments. Expected 'city' field with string value.",
-                tool_used=self.name,
+    def snapshot_sections(self) -> Dict[str, bytes]:
+        return {
+            "weather": encode_map(
+                (city.encode(), repr(temp).encode())
+                for city, temp in self._TEMPS.items()
             )
+        }
 
-        try:
-            city = args["city"].lower().strip()
-            temp = self._get_temperature(city)
-            return ToolResult(success=True, result=temp, tool_used=self.name)
-        except Exception as e:
-            return ToolResult(
-                success=False,
-                result="",
-                error=f"Weather lookup error: {str(e)}",
-                tool_used=self.name,
-            )
+    def snapshot_sources(self) -> List[str]:
+        return [self._module_file()]
+
+    def attach_snapshot(self, snapshot: Any) -> None:
+        temps = snapshot.map("weather", decode_value=float)
+        if temps is not None:
+            self._temps = temps
 
     def _get_temperature(self, city: str) -> float:
         """Get temperature for a city"""
-        temp = self._TEMPS.get(city, 20.0)  # Default
+        temp = self._temps.get(city, 20.0)  # Default
         return float(temp)
@@ -0,0 +1,156 @@
+"""Character-trigram index for substring and typo-tolerant name lookup.
+
+Each indexed string is split into the trigrams of `` <text> ``; a posting
+list maps every trigram to the ids of the strings containing it, so a lookup
+only touches the strings sharing trigrams with the query. Candidates are
+ranked by the number of shared trigrams and then confirmed with an edit
+distance that gives up as soon as it exceeds its bound.
+"""
+
+import re
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, with runs of punctuation and spaces collapsed to one space"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def trigrams(text: str, pad: bool = True) -> List[str]:
+    """Distinct trigrams of ``text``, padded with a space on each side"""
+    if pad:
+        text = f" {text} "
+    seen: Dict[str, None] = {}
+    for end in range(3, len(text) + 1):
+        start = end - 3
+        seen[text[start:end]] = None
+    return list(seen)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance of ``a`` and ``b``, or ``limit + 1`` if larger.
+
+    Insertions, deletions, substitutions and swaps of adjacent characters
+    each count as one edit (optimal string alignment). Only the diagonal band
+    of width ``2 * limit + 1`` is computed, and the computation stops once a
+    whole row exceeds ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    over = limit + 1
+    before: List[int] = []
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        best = current[0]
+        char = a[i - 1]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            cost = min(cost, previous[j] + 1, current[j - 1] + 1)
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost if cost <= limit else over
+            best = min(best, current[j])
+        if best > limit:
+            return over
+        before, previous = previous, current
+    return previous[len(b)]
+
+
+class TrigramIndex:
+    """Posting lists of padded trigrams over a sequence of strings"""
+
+    def __init__(self, postings: Mapping):
+        # trigram -> ascending ids; a dict or a snapshot MappedMap
+        self._postings = postings
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "TrigramIndex":
+        postings: Dict[str, array] = {}
+        for id_, text in enumerate(texts):
+            for gram in trigrams(text):
+                postings.setdefault(gram, array("I")).append(id_)
+        return cls(postings)
+
+    def items(self) -> Iterable[Tuple[bytes, bytes]]:
+        """(trigram, packed ids) pairs for ``snapshot.encode_map``"""
+        for gram, ids in self._postings.items():
+            yield gram.encode(), array("I", ids).tobytes()
+
+    def containing(self, query: str) -> Optional[List[int]]:
+        """Ascending ids that may contain ``query``; None if it is too short.
+
+        Every id returned has all of the query's trigrams; the caller still
+        checks the substring itself.
+        """
+        grams = trigrams(query, pad=False)
+        if not grams:
+            return None
+        lists: List[Sequence[int]] = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if not ids:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        found = set(lists[0])
+        for ids in lists[1:]:
+            found.intersection_update(ids)
+            if not found:
+                break
+        return sorted(found)
+
+    def candidates(self, query: str, limit: int) -> List[Tuple[int, int]]:
+        """Up to ``limit`` (id, shared trigrams) pairs, most shared first"""
+        counts: Dict[int, int] = {}
+        for gram in trigrams(query):
+            for id_ in self._postings.get(gram, ()):
+                counts[id_] = counts.get(id_, 0) + 1
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+def similarity(
+    query: str, name: str, max_edit_ratio: float, exact_length: int = 4
+) -> float:
+    """Similarity in [0, 1] of a normalized query and name, 0.0 if too far.
+
+    Tries the strings as given, with their words sorted (word order), with
+    spaces removed (split words) and, for a query with fewer words than the
+    name, against each run of as many consecutive words of the name. A
+    comparison whose shorter side has at most ``exact_length`` characters
+    allows no edits, so short words ("ida", "adam") do not match "ada".
+    """
+    pairs = [
+        (query, name),
+        (" ".join(sorted(query.split())), " ".join(sorted(name.split()))),
+        (query.replace(" ", ""), name.replace(" ", "")),
+    ]
+    words, name_words = query.split(), name.split()
+    if len(words) < len(name_words):
+        width = len(words)
+        for stop in range(width, len(name_words) + 1):
+            start = stop - width
+            pairs.append((query, " ".join(name_words[start:stop])))
+
+    best = 0.0
+    for a, b in pairs:
+        longest = max(len(a), len(b))
+        if not longest:
+            continue
+        limit = max(1, int(longest * max_edit_ratio))
+        if min(len(a), len(b)) <= exact_length:
+            limit = 0
+        distance = edit_distance(a, b, limit)
+        if distance <= limit:
+            best = max(best, 1.0 - distance / longest)
+    return best
@@ -0,0 +1,347 @@
+"""Durable work queue for batch jobs spread over worker processes and nodes.
+
+``WorkQueue`` is the interface workers program against; ``SQLiteWorkQueue``
+implements it on one SQLite file, which processes on one host (or on hosts
+sharing a filesystem with working POSIX locks) can use concurrently. A
+networked queue only has to implement the same methods.
+
+Delivery is at least once. ``lease`` hides items from other workers for a
+visibility timeout; an item that is neither acked nor nacked in time
+becomes visible again and is redelivered. Every lease counts as an attempt,
+and an item that has used up ``max_attempts`` is moved to the dead letters
+instead of being leased again. Acks and nacks carry the lease's receipt, so
+a worker whose lease expired and was taken over cannot settle the item.
+"""
+
+import contextlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from pydantic import BaseModel, Field
+
+DEFAULT_PATH = "queue.db"
+
+# Item states
+PENDING, DONE, DEAD = "pending", "done", "dead"
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    receipt TEXT,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS items_ready ON items (state, visible_at);
+"""
+
+
+class QueueConfig(BaseModel):
+    """Leasing, retry and storage settings of a work queue"""
+
+    visibility_timeout: float = Field(default=60.0, gt=0.0)  # seconds
+    max_attempts: int = Field(default=3, ge=1)
+    # Backoff before a failed item is retried: retry_delay * 2**(attempt - 1)
+    retry_delay: float = Field(default=1.0, ge=0.0)
+    max_retry_delay: float = Field(default=300.0, ge=0.0)
+    # How long to wait for another process's write lock
+    busy_timeout: float = Field(default=30.0, gt=0.0)
+    # Write-ahead logging; turn off on network filesystems, where it fails
+    wal: bool = True
+
+
+class Lease(NamedTuple):
+    """An item handed to one worker until ``expires``"""
+
+    id: int
+    payload: Dict[str, Any]
+    attempts: int  # including this one
+    receipt: str
+    expires: float
+
+
+class Finished(NamedTuple):
+    """A settled item: its result, or for dead letters the last error"""
+
+    id: int
+    payload: Dict[str, Any]
+    state: str
+    attempts: int
+    result: Any
+    error: Optional[str]
+
+
+class WorkQueue(ABC):
+    """Interface of a durable, at-least-once work queue"""
+
+    @abstractmethod
+    def put_many(self, payloads: Iterable[Dict[str, Any]]) -> List[int]:
+        """Enqueue JSON-serializable payloads; returns their ids"""
+
+    def put(self, payload: Dict[str, Any]) -> int:
+        return self.put_many([payload])[0]
+
+    @abstractmethod
+    def lease(
+        self, max_items: int, visibility_timeout: Optional[float] = None
+    ) -> List[Lease]:
+        """Up to ``max_items`` visible items, oldest first, hidden until
+        their visibility timeout expires"""
+
+    @abstractmethod
+    def ack(self, lease: Lease, result: Any = None) -> bool:
+        """Mark an item done with its result; False if the lease was lost"""
+
+    @abstractmethod
+    def nack(self, lease: Lease, error: str, retry: bool = True) -> bool:
+        """Report a failure. The item is retried after a backoff unless
+        ``retry`` is False or it has no attempts left, in which case it is
+        dead-lettered. False if the lease was lost."""
+
+    @abstractmethod
+    def extend(self, lease: Lease, visibility_timeout: float) -> Optional[Lease]:
+        """Keep an item hidden for longer; None if the lease was lost"""
+
+    @abstractmethod
+    def finished(
+        self, state: str = DONE, after_id: int = 0, limit: int = 1000
+    ) -> List["Finished"]:
+        """Settled items in ``state`` (``done`` or ``dead``) by id"""
+
+    @abstractmethod
+    def requeue_dead(self) -> int:
+        """Give every dead letter a fresh set of attempts"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Item counts by state, with ``in_flight`` for leased items"""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue stored in a SQLite database file.
+
+    Each thread and process uses its own connection. Leasing runs in an
+    immediate transaction, so concurrent workers never lease the same item
+    twice.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        config: Optional[QueueConfig] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.config = config or QueueConfig()
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        db = self._connection()
+        if db.execute("PRAGMA user_version").fetchone()[0] > _SCHEMA_VERSION:
+            raise ValueError(f"{path} was written by a newer version")
+        db.executescript(_SCHEMA)
+        db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def put_many(self, payloads: Iterable[Dict[str, Any]]) -> List[int]:
+        now = self._clock()
+        rows = [(json.dumps(payload), now, now) for payload in payloads]
+        ids = []
+        with self._transaction() as db:
+            for row in rows:
+                cursor = db.execute(
+                    "INSERT INTO items (payload, visible_at, enqueued_at) "
+                    "VALUES (?, ?, ?)",
+                    row,
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def lease(
+        self, max_items: int, visibility_timeout: Optional[float] = None
+    ) -> List[Lease]:
+        if visibility_timeout is None:
+            visibility_timeout = self.config.visibility_timeout
+        now = self._clock()
+        expires = now + visibility_timeout
+        with self._transaction() as db:
+            # Leases that expired on their last attempt are abandoned
+            db.execute(
+                "UPDATE items SET state = ?, finished_at = ?, receipt = NULL, "
+                "error = COALESCE(error, 'visibility timeout expired') "
+                "WHERE state = ? AND visible_at <= ? AND attempts >= ?",
+                (DEAD, now, PENDING, now, self.config.max_attempts),
+            )
+            rows = db.execute(
+                "SELECT id, payload, attempts FROM items "
+                "WHERE state = ? AND visible_at <= ? "
+                "ORDER BY visible_at, id LIMIT ?",
+                (PENDING, now, max_items),
+            ).fetchall()
+            leases = [
+                Lease(id_, json.loads(payload), attempts + 1, _receipt(), expires)
+                for id_, payload, attempts in rows
+            ]
+            db.executemany(
+                "UPDATE items SET attempts = ?, receipt = ?, visible_at = ? "
+                "WHERE id = ?",
+                [
+                    (lease.attempts, lease.receipt, expires, lease.id)
+                    for lease in leases
+                ],
+            )
+        return leases
+
+    def ack(self, lease: Lease, result: Any = None) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE items SET state = ?, finished_at = ?, result = ?, "
+                "receipt = NULL WHERE id = ? AND receipt = ? AND state = ?",
+                (
+                    DONE,
+                    self._clock(),
+                    json.dumps(result),
+                    lease.id,
+                    lease.receipt,
+                    PENDING,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def nack(self, lease: Lease, error: str, retry: bool = True) -> bool:
+        now = self._clock()
+        config = self.config
+        if retry and lease.attempts < config.max_attempts:
+            delay = min(
+                config.retry_delay * 2 ** (lease.attempts - 1), config.max_retry_delay
+            )
+            sql = "UPDATE items SET visible_at = ?, error = ?, receipt = NULL"
+            params: tuple = (now + delay, error)
+        else:
+            sql = (
+                "UPDATE items SET state = ?, finished_at = ?, error = ?, receipt = NULL"
+            )
+            params = (DEAD, now, error)
+        with self._transaction() as db:
+            cursor = db.execute(
+                f"{sql} WHERE id = ? AND receipt = ? AND state = ?",
+                params + (lease.id, lease.receipt, PENDING),
+            )
+        return cursor.rowcount == 1
+
+    def extend(self, lease: Lease, visibility_timeout: float) -> Optional[Lease]:
+        expires = self._clock() + visibility_timeout
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE items SET visible_at = ? "
+                "WHERE id = ? AND receipt = ? AND state = ?",
+                (expires, lease.id, lease.receipt, PENDING),
+            )
+        return lease._replace(expires=expires) if cursor.rowcount == 1 else None
+
+    def finished(
+        self, state: str = DONE, after_id: int = 0, limit: int = 1000
+    ) -> List[Finished]:
+        rows = self._connection().execute(
+            "SELECT id, payload, state, attempts, result, error FROM items "
+            "WHERE state = ? AND id > ? ORDER BY id LIMIT ?",
+            (state, after_id, limit),
+        )
+        return [
+            Finished(
+                id_,
+                json.loads(payload),
+                state_,
+                attempts,
+                json.loads(result) if result is not None else None,
+                error,
+            )
+            for id_, payload, state_, attempts, result, error in rows
+        ]
+
+    def requeue_dead(self) -> int:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE items SET state = ?, attempts = 0, visible_at = ?, "
+                "finished_at = NULL WHERE state = ?",
+                (PENDING, self._clock(), DEAD),
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        db = self._connection()
+        counts = {PENDING: 0, DONE: 0, DEAD: 0}
+        counts.update(
+            db.execute("SELECT state, COUNT(*) FROM items GROUP BY state").fetchall()
+        )
+        in_flight = db.execute(
+            "SELECT COUNT(*) FROM items WHERE state = ? AND receipt IS NOT NULL "
+            "AND visible_at > ?",
+            (PENDING, now),
+        ).fetchone()[0]
+        oldest = db.execute(
+            "SELECT MIN(enqueued_at) FROM items WHERE state = ?", (PENDING,)
+        ).fetchone()[0]
+        return {
+            **counts,
+            "in_flight": in_flight,
+            "oldest_pending_age": now - oldest if oldest is not None else 0.0,
+            "path": self.path,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # A forked child must not reuse the parent's connection
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.config.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            if self.config.wal:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.execute("PRAGMA synchronous = NORMAL")
+            local.connection, local.pid = connection, os.getpid()
+            with self._lock:
+                self._connections.append(connection)
+        return local.connection
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction that takes the database lock up front"""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+def _receipt() -> str:
+    return secrets.token_hex(8)
@@ -0,0 +1,225 @@
+"""Batch worker that answers questions pulled from a work queue.
+
+A worker keeps one warm ``Agent`` and up to ``concurrency`` questions in
+flight. Whenever slots free up it leases more items, so the agent's thread
+pool, LLM batching and tool bulkheads stay busy. Each answer gets a deadline
+inside the item's visibility timeout, so it is acked before the lease can
+lapse and the item be handed to another worker. Payloads are
+``{"question": ..., "session_id": ..., "timeout": ...}``; only the question
+is required.
+"""
+
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from . import logs
+from .work_queue import Lease, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerConfig(BaseModel):
+    """How many items a worker leases and answers at once"""
+
+    batch_size: int = Field(default=16, ge=1)  # items per lease call
+    concurrency: int = Field(default=16, ge=1)  # questions in flight
+    poll_interval: float = Field(default=1.0, gt=0.0)  # when the queue is empty
+    # Time kept in reserve at the end of a lease for the ack
+    ack_margin: float = Field(default=1.0, ge=0.0)
+    exit_when_empty: bool = False
+
+
+class PayloadError(ValueError):
+    """An item that can never be answered; it is dead-lettered at once"""
+
+
+class Worker:
+    """Pulls items from ``queue`` and acks each with ``agent``'s answer.
+
+    An answer whose status is not ok (a timeout, tool error, ...) is nacked,
+    so the item is retried and eventually dead-lettered.
+    """
+
+    def __init__(
+        self, agent: Any, queue: WorkQueue, config: Optional[WorkerConfig] = None
+    ):
+        self.agent = agent
+        self.queue = queue
+        self.config = config or WorkerConfig()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._counts = {"leased": 0, "acked": 0, "failed": 0, "lost": 0}
+
+    def stop(self) -> None:
+        """Stop leasing; items in flight are still answered and acked"""
+        self._stop.set()
+
+    def run(self) -> Dict[str, int]:
+        """Process items until stopped (or the queue is empty, if configured)"""
+        config = self.config
+        in_flight: Set[Future] = set()
+        with ThreadPoolExecutor(
+            max_workers=config.concurrency, thread_name_prefix="agent-worker"
+        ) as pool:
+            while not self._stop.is_set():
+                wanted = min(config.batch_size, config.concurrency - len(in_flight))
+                leases = self.queue.lease(wanted) if wanted else []
+                with self._lock:
+                    self._counts["leased"] += len(leases)
+                for lease in leases:
+                    in_flight.add(pool.submit(self._process, lease))
+                full = len(in_flight) >= config.concurrency
+                if leases and len(leases) == wanted and not full:
+                    continue  # the queue may have more
+                if not in_flight:
+                    if config.exit_when_empty and self._drained():
+                        break
+                    self._stop.wait(config.poll_interval)
+                    continue
+                # Lease again once a slot frees up, or after a poll interval
+                # while the queue has nothing to give
+                _, in_flight = wait(
+                    in_flight,
+                    timeout=None if full else config.poll_interval,
+                    return_when=FIRST_COMPLETED,
+                )
+            wait(in_flight)
+        return self.stats()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def _drained(self) -> bool:
+        return self.queue.stats()["pending"] == 0
+
+    def _process(self, lease: Lease) -> None:
+        try:
+            question, session_id, timeout = _parse_payload(lease.payload)
+            remaining = lease.expires - time.time() - self.config.ack_margin
+            timeout = remaining if timeout is None else min(timeout, remaining)
+            answer = self.agent.respond(
+                question, session_id=session_id, timeout=max(timeout, 0.0)
+            )
+        except PayloadError as e:
+            settled = self.queue.nack(lease, str(e), retry=False)
+            self._count("failed", settled)
+            return
+        except Exception as e:
+            logger.warning(
+                "Item %d failed on attempt %d: %s", lease.id, lease.attempts, e
+            )
+            self._count("failed", self.queue.nack(lease, f"{type(e).__name__}: {e}"))
+            return
+        if not answer.ok:
+            # The agent answers timeouts and tool errors with an error message
+            # instead of raising, so the status decides whether to retry
+            logger.warning(
+                "Item %d failed on attempt %d: %s",
+                lease.id,
+                lease.attempts,
+                answer.status,
+            )
+            error = f"{answer.status}: {answer.text}"
+            self._count("failed", self.queue.nack(lease, error))
+            return
+        self._count("acked", self.queue.ack(lease, {"answer": answer.text}))
+
+    def _count(self, key: str, settled: bool) -> None:
+        with self._lock:
+            self._counts[key if settled else "lost"] += 1
+
+
+def run_workers(
+    agent_factory: Callable[[], Any],
+    queue: WorkQueue,
+    config: Optional[WorkerConfig] = None,
+    processes: int = 1,
+) -> List[int]:
+    """Run ``processes`` workers until SIGTERM/SIGINT; returns exit codes.
+
+    The agent is built and warmed once and then forked, so the workers share
+    its tool data pages. With one process (or no ``fork``) the worker runs
+    in this process.
+    """
+    agent = agent_factory()
+    agent.warmup()
+    if processes <= 1 or not hasattr(os, "fork"):
+        worker = Worker(agent, queue, config)
+        _stop_on_signals(worker)
+        logger.info("Worker finished: %s", worker.run())
+        return [0]
+
+    gc.collect()
+    gc.freeze()
+    # Each child opens its own database connection
+    queue.close()
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child
+            code = 0
+            try:
+                worker = Worker(agent, queue, config)
+                _stop_on_signals(worker)
+                logger.info("Worker %d finished: %s", os.getpid(), worker.run())
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                logs.shutdown()
+                os._exit(code)
+        children.append(pid)
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    codes = []
+    for pid in children:
+        while True:
+            try:
+                _, status = os.waitpid(pid, 0)
+                break
+            except InterruptedError:  # pragma: no cover
+                continue
+        codes.append(os.waitstatus_to_exitcode(status))
+    return codes
+
+
+def _stop_on_signals(worker: Worker) -> None:
+    def stop(signum, frame):
+        worker.stop()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+
+def _parse_payload(payload: Any) -> Tuple[str, Optional[str], Optional[float]]:
+    if not isinstance(payload, dict) or not isinstance(payload.get("question"), str):
+        raise PayloadError("payload must be an object with a 'question' string")
+    session_id = payload.get("session_id")
+    timeout = payload.get("timeout")
+    if session_id is not None and not isinstance(session_id, str):
+        raise PayloadError("'session_id' must be a string")
+    if timeout is not None and (
+        isinstance(timeout, bool)
+        or not isinstance(timeout, (int, float))
+        or timeout <= 0
+    ):
+        raise PayloadError("'timeout' must be a positive number of seconds")
+    return payload["question"], session_id, timeout
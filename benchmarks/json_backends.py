@@ -0,0 +1,90 @@
+"""ResponseParser throughput per JSON backend and input type.
+
+Parses a corpus of typical LLM responses (tool plans, malformed JSON,
+structured text, direct answers and a large tool plan) given as ``str``,
+``bytes`` and a ``memoryview`` over a receive buffer, once per installed
+JSON backend.
+
+    python -m benchmarks.json_backends
+    python -m benchmarks.json_backends --repeat 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+from agent import json_backends
+from agent.parser import ResponseParser
+
+CORPUS: List[str] = [
+    '{"tool": "weather", "args": {"city": "paris"}}',
+    '{"tool": "calc", "args": {"expr": "12.5% of 243"}, "confidence": 0.9}',
+    '\n  {"tool": "kb", "args": {"q": "ada lovelace"}}',
+    '{"tool": "weather", "args": {"city": "London" }',
+    'tool: "calc", args: {expr: "2+2"}',
+    'TOOL:translator TEXT="hello"',
+    "The capital of France is Paris.",
+    json.dumps(
+        {
+            "tool": "translator",
+            "args": {"text": "lorem ipsum " * 2000, "target_language": "french"},
+        }
+    ),
+]
+
+INPUTS: Dict[str, Callable[[bytes], object]] = {
+    "str": lambda raw: raw.decode("utf-8"),
+    "bytes": lambda raw: raw,
+    "memoryview": memoryview,
+}
+
+
+def time_corpus(inputs: List[object], repeat: int) -> float:
+    """Mean seconds per parse over the corpus"""
+    parse = ResponseParser.parse_response
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for response in inputs:
+            parse(response, backend="bench")
+    return (time.perf_counter() - start) / (repeat * len(inputs))
+
+
+def run(repeat: int) -> Dict[str, Dict[str, float]]:
+    encoded = [response.encode("utf-8") for response in CORPUS]
+    previous = ResponseParser.json_backend().name
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for name in json_backends.available():
+            ResponseParser.set_json_backend(name)
+            results[name] = {
+                kind: time_corpus([make(raw) for raw in encoded], repeat)
+                for kind, make in INPUTS.items()
+            }
+    finally:
+        ResponseParser.set_json_backend(previous)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.json_backends")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    baseline = results["json"]["str"]
+    print(f"{'backend':<10}" + "".join(f"{kind:>14}" for kind in INPUTS) + "  speedup")
+    print("us/parse".rjust(10 + 14 * len(INPUTS)))
+    for name, timings in results.items():
+        best = min(timings.values())
+        print(
+            f"{name:<10}"
+            + "".join(f"{1e6 * timings[kind]:>14.2f}" for kind in INPUTS)
+            + f"{baseline / best:>8.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
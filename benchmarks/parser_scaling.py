@@ -0,0 +1,98 @@
+"""Parser cost versus response size, from 1 KB to 10 MB.
+
+Times ResponseParser on response shapes that hit each string strategy and
+their worst cases (long word runs for JSON repair, dense "TOOL:" markers for
+the structured scanner) with the input cap disabled, and fails if the time per
+byte at the largest size grows more than ``--max-ratio`` times over the
+smallest size that takes measurable time.
+
+    python -m benchmarks.parser_scaling
+    python -m benchmarks.parser_scaling --max-size 1000000 --repeat 5
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List
+
+from agent.parser import ParserLimits, ResponseParser
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Times below this are dominated by timer and call overhead
+MIN_BASELINE_SECONDS = 0.001
+
+
+def _fill(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+SHAPES: Dict[str, Callable[[int], str]] = {
+    "prose": lambda n: _fill("The quick brown fox jumps over the lazy dog. ", n),
+    "word_run": lambda n: "A" * n,
+    "json_word_run": lambda n: "{" + "a" * (n - 1),
+    "json_keys": lambda n: "{" + _fill('k: "v" ', n - 1),
+    "tool_markers": lambda n: _fill("TOOL:", n),
+    "tool_unclosed": lambda n: 'TOOL:calc EXPR="' + "x" * (n - 16),
+    "json_quotes": lambda n: "{" + _fill('" "a', n - 1),
+}
+
+
+def time_parse(response: str, repeat: int) -> float:
+    """Best of ``repeat`` wall-clock times for one parse"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ResponseParser.parse_response(response, backend="bench")
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], repeat: int, max_ratio: float) -> bool:
+    previous = ResponseParser.limits()
+    ResponseParser.set_limits(ParserLimits(max_input_chars=None))
+    ok = True
+    try:
+        header = f"{'shape':<14}" + "".join(f"{size:>12,}" for size in sizes)
+        print(header + f"{'ratio':>8}")
+        print("ns/byte".rjust(len(header)))
+        for name, make in SHAPES.items():
+            per_byte = []
+            for size in sizes:
+                elapsed = time_parse(make(size), repeat)
+                per_byte.append((elapsed, elapsed / size))
+            measurable = [p for e, p in per_byte if e >= MIN_BASELINE_SECONDS]
+            ratio = measurable[-1] / measurable[0] if len(measurable) > 1 else 1.0
+            linear = ratio <= max_ratio
+            ok = ok and linear
+            print(
+                f"{name:<14}"
+                + "".join(f"{1e9 * p:>12.2f}" for _, p in per_byte)
+                + f"{ratio:>8.2f}"
+                + ("" if linear else "  SUPERLINEAR")
+            )
+    finally:
+        ResponseParser.set_limits(previous)
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.parser_scaling")
+    parser.add_argument("--max-size", type=int, default=SIZES[-1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=4.0,
+        help="largest allowed growth in time per byte across sizes",
+    )
+    args = parser.parse_args(argv)
+    sizes = [size for size in SIZES if size <= args.max_size]
+    if not run(sizes, args.repeat, args.max_ratio):
+        print("Parser cost grows faster than linearly", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
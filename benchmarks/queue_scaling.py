@@ -0,0 +1,89 @@
+"""Throughput of queue workers as the number of worker processes grows.
+
+Each run fills a fresh SQLite work queue with questions from the load
+generator's default mix and drains it with ``--processes`` forked workers,
+each answering ``--concurrency`` questions at once against a simulated LLM.
+Throughput should grow with the process count until the queue's write lock
+(one lease or ack transaction at a time) becomes the bottleneck.
+
+    python -m benchmarks.queue_scaling
+    python -m benchmarks.queue_scaling --items 5000 --llm-latency-ms 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from agent.agent import Agent
+from agent.latency import LognormalLatency
+from agent.llm import LLMService
+from agent.loadgen import DEFAULT_MIX
+from agent.work_queue import DEAD, DONE, SQLiteWorkQueue
+from agent.worker import WorkerConfig, run_workers
+
+PROCESSES = (1, 2, 4, 8)
+
+QUESTIONS: List[str] = [q for query in DEFAULT_MIX for q in query.questions]
+
+
+def run(processes: int, items: int, concurrency: int, llm_latency_ms: float) -> Dict:
+    def make_agent() -> Agent:
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(
+            latency=LognormalLatency(median=llm_latency_ms / 1000.0)
+        )
+        return agent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteWorkQueue(os.path.join(tmp, "queue.db"))
+        queue.put_many(
+            {"question": QUESTIONS[i % len(QUESTIONS)]} for i in range(items)
+        )
+        config = WorkerConfig(
+            concurrency=concurrency, poll_interval=0.05, exit_when_empty=True
+        )
+        started = time.perf_counter()
+        run_workers(make_agent, queue, config, processes=processes)
+        elapsed = time.perf_counter() - started
+        stats = queue.stats()
+        queue.close()
+    return {
+        "processes": processes,
+        "done": stats[DONE],
+        "dead": stats[DEAD],
+        "seconds": elapsed,
+        "throughput": stats[DONE] / elapsed,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--processes",
+        type=lambda text: tuple(int(n) for n in text.split(",")),
+        default=PROCESSES,
+        help="comma-separated process counts",
+    )
+    args = parser.parse_args(argv)
+
+    print(f"{'procs':>5}  {'items/s':>9}  {'speedup':>7}  {'seconds':>7}  {'dead':>4}")
+    base = None
+    for processes in args.processes:
+        result = run(processes, args.items, args.concurrency, args.llm_latency_ms)
+        base = base or result["throughput"]
+        print(
+            f"{processes:>5}  {result['throughput']:>9.0f}  "
+            f"{result['throughput'] / base:>6.1f}x  {result['seconds']:>7.2f}  "
+            f"{result['dead']:>4}"
+        )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
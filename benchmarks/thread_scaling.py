@@ -0,0 +1,153 @@
+"""Closed-loop throughput of one shared Agent as the thread count grows.
+
+Every thread answers questions from the load generator's default mix in a
+loop against the same ``Agent`` for a fixed time. With ``--churn`` a writer
+thread keeps hot-replacing tools in the registry during the run, which must
+not stall or fail the readers. A simulated LLM latency (``--llm-latency-ms``)
+shows how well threads overlap I/O; with none the run is CPU bound and
+throughput should stay roughly flat rather than collapse. A request counts
+as an error if it raises or its answer's status is not ok (a timeout, an
+overloaded tool, ...), since the agent reports failures that way rather than
+raising.
+
+    python -m benchmarks.thread_scaling
+    python -m benchmarks.thread_scaling --llm-latency-ms 5 --churn 0.01
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from agent.agent import Agent
+from agent.bulkhead import BulkheadConfig
+from agent.latency import LognormalLatency
+from agent.llm import LLMService
+from agent.loadgen import DEFAULT_MIX
+from agent.stats import summarize_ms
+from agent.telemetry import OK_OUTCOMES
+from agent.tools import CalculatorTool, WeatherTool
+
+THREADS = (1, 2, 4, 8, 16, 32, 64)
+
+QUESTIONS: List[str] = [q for query in DEFAULT_MIX for q in query.questions]
+
+
+def make_agent(llm_latency_ms: float, max_threads: int) -> Agent:
+    agent = Agent(use_fake_llm=True, seed=0)
+    if llm_latency_ms > 0:
+        agent.llm_service = LLMService(
+            latency=LognormalLatency(median=llm_latency_ms / 1000.0), seed=0
+        )
+    # Size the bulkheads so overload shedding does not hide contention
+    config = BulkheadConfig(max_concurrent=8, max_queue=max_threads)
+    for name in agent.tool_registry.list_tools():
+        agent.tool_registry.configure_bulkhead(name, config)
+    agent.tool_registry.warmup()
+    return agent
+
+
+def churn(agent: Agent, interval: float, stop: threading.Event) -> int:
+    """Hot-replace tools until ``stop`` is set; returns the number of swaps"""
+    swaps = 0
+    factories = (CalculatorTool, WeatherTool)
+    while not stop.wait(interval):
+        agent.tool_registry.register_tool(factories[swaps % len(factories)]())
+        swaps += 1
+    return swaps
+
+
+def run(agent: Agent, threads: int, duration: float, churn_interval: float) -> Dict:
+    latencies: List[List[float]] = [[] for _ in range(threads)]
+    failures: List[Counter] = [Counter() for _ in range(threads)]
+    stop = threading.Event()
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(slot: int) -> None:
+        record = latencies[slot].append
+        i = slot
+        start_gate.wait()
+        while not stop.is_set():
+            question = QUESTIONS[i % len(QUESTIONS)]
+            i += 1
+            began = time.perf_counter()
+            try:
+                status = agent.respond(question).status
+            except Exception as e:
+                failures[slot][type(e).__name__] += 1
+                continue
+            if status not in OK_OUTCOMES:
+                failures[slot][status] += 1
+                continue
+            record(time.perf_counter() - began)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    swaps: List[int] = []
+    writer = None
+    if churn_interval > 0:
+        writer = threading.Thread(
+            target=lambda: swaps.append(churn(agent, churn_interval, stop))
+        )
+        writer.start()
+
+    start_gate.wait()
+    began = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    if writer is not None:
+        writer.join()
+
+    samples = [s for per_thread in latencies for s in per_thread]
+    failed = sum(failures, Counter())
+    return {
+        "threads": threads,
+        "requests": len(samples),
+        "throughput": len(samples) / elapsed,
+        "errors": sum(failed.values()),
+        "failures": dict(failed),
+        "swaps": sum(swaps),
+        **summarize_ms(samples),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.thread_scaling")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per step")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--churn",
+        type=float,
+        default=0.05,
+        help="seconds between hot tool replacements (0 disables)",
+    )
+    parser.add_argument("--threads", type=int, nargs="+", default=list(THREADS))
+    args = parser.parse_args(argv)
+
+    agent = make_agent(args.llm_latency_ms, max(args.threads))
+    print(
+        f"{'threads':>7}{'req/s':>10}{'scaling':>9}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'errors':>8}{'swaps':>7}"
+    )
+    baseline = None
+    for threads in args.threads:
+        result = run(agent, threads, args.duration, args.churn)
+        baseline = baseline or result["throughput"]
+        print(
+            f"{threads:>7}{result['throughput']:>10.0f}"
+            f"{result['throughput'] / baseline:>8.2f}x"
+            f"{result['p50']:>9.2f}{result['p99']:>9.2f}"
+            f"{result['errors']:>8}{result['swaps']:>7}"
+            + (f"  {result['failures']}" if result["failures"] else "")
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
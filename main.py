@@ -1,37 +1,596 @@
+import argparse
+import functools
+import json
 import logging
+import os
+import re
 import sys
+import time
 
+from agent.admission import AdmissionConfig
 from agent.agent import Agent
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+from agent.answer_cache import AnswerCacheConfig
+from agent.batching import BatchConfig
+from agent.latency import LognormalLatency
+from agent.llm import LLMService
+from agent.loadgen import (
+    AgentTarget,
+    HTTPTarget,
+    LoadConfig,
+    LoadGenerator,
+    format_report,
+)
+from agent.logs import configure_logging
+from agent.memory import MemoryConfig
+from agent.profiling import ENV_OUT, MODES, Profiler
+from agent.replay import (
+    PACINGS,
+    Replayer,
+    TraceRecorder,
+    format_replay_report,
+    load_trace,
 )
+from agent.server import PreforkServer
+from agent.snapshot import DEFAULT_PATH as SNAPSHOT_PATH
+from agent.snapshot import Snapshot, SnapshotError
+from agent.snapshot import build as build_snapshot
+from agent.telemetry import DEFAULT_DIR as TELEMETRY_DIR
+from agent.telemetry import TelemetryConfig, TelemetryReader, format_summary
+from agent.tool_registry import ToolRegistry
+from agent.work_queue import DEAD
+from agent.work_queue import DEFAULT_PATH as QUEUE_PATH
+from agent.work_queue import DONE, QueueConfig, SQLiteWorkQueue
+from agent.worker import WorkerConfig, run_workers
+
+
+def print_usage():
+    print('Usage: python main.py "your question here"')
+    print("\nExample queries:")
+    print('  python main.py "What is 12.5% of 243?"')
+    print('  python main.py "What\'s the weather in Paris?"')
+    print('  python main.py "Who is Ada Lovelace?"')
+    print('  python main.py "Translate hello to Spanish"')
+    print('  python main.py "Add 10 to the average temperature in Paris and London"')
+    print("\nServing:")
+    print("  python main.py serve --port 8000 --workers 4")
+    print("  python main.py serve --batch-size 16 --batch-wait-ms 5")
+    print("  python main.py snapshot && python main.py serve --snapshot")
+    print("\nLoad testing:")
+    print("  python main.py loadtest --rate 50 --duration 30 --warmup 5")
+    print("  python main.py loadtest --url http://127.0.0.1:8000 --json report.json")
+    print("\nRecord and replay:")
+    print("  python main.py loadtest --duration 10 --record trace.jsonl")
+    print("  python main.py replay trace.jsonl --strict")
+    print("\nBatch jobs:")
+    print("  python main.py queue put --file questions.txt")
+    print("  python main.py worker --processes 4 --exit-when-empty")
+    print("  python main.py queue results")
+    print("\nTelemetry:")
+    print("  python main.py serve --telemetry && python main.py telemetry --last 15m")
+    print("\nProfiling:")
+    print('  python main.py --profile sample "What is 2 + 2?"')
+    print("\nLogging:")
+    print("  AGENT_LOG_FORMAT=json AGENT_LOG_LEVEL=WARNING python main.py serve")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(add_help=True)
+    parser.add_argument("question", nargs="*")
+    parser.add_argument(
+        "--profile",
+        choices=MODES,
+        help="profile requests (overrides AGENT_PROFILE)",
+    )
+    parser.add_argument(
+        "--profile-every",
+        type=int,
+        default=1,
+        help="profile one in N requests",
+    )
+    parser.add_argument(
+        "--profile-out",
+        default=None,
+        help="output prefix for <prefix>.collapsed and <prefix>.txt",
+    )
+    return parser
+
+
+def build_profiler(args: argparse.Namespace):
+    if args.profile:
+        return Profiler(mode=args.profile, every=args.profile_every)
+    return Profiler.from_env()
+
+
+def serve(argv):
+    """Run the HTTP API with a pre-fork worker pool"""
+    parser = argparse.ArgumentParser(prog="main.py serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=0, help="worker processes (default: CPUs)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="group concurrent LLM calls into batches of up to N (0: off)",
+    )
+    parser.add_argument(
+        "--batch-wait-ms",
+        type=float,
+        default=5.0,
+        help="longest a call waits for its batch to fill",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=16,
+        help="requests answered at once per worker",
+    )
+    parser.add_argument(
+        "--max-queue", type=int, default=256, help="queued requests per worker"
+    )
+    parser.add_argument(
+        "--default-timeout",
+        type=float,
+        default=30.0,
+        help="deadline in seconds for requests that do not set one",
+    )
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        default=None,
+        help=f"serve tool data from a prebuilt snapshot (default: {SNAPSHOT_PATH})",
+    )
+    parser.add_argument(
+        "--plugins",
+        action="store_true",
+        help="also register tools published under the 'agent.tools' entry point",
+    )
+    parser.add_argument(
+        "--answer-cache",
+        type=float,
+        nargs="?",
+        const=AnswerCacheConfig().threshold,
+        default=None,
+        metavar="THRESHOLD",
+        help="reuse answers of near-duplicate questions (cosine similarity, "
+        "default %(const)s)",
+    )
+    parser.add_argument(
+        "--telemetry",
+        nargs="?",
+        const=TELEMETRY_DIR,
+        default=None,
+        metavar="DIR",
+        help=f"write binary per-request telemetry (default: {TELEMETRY_DIR})",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        metavar="TRACE",
+        help="append every request to a trace file for main.py replay",
+    )
+    parser.add_argument(
+        "--memory",
+        type=int,
+        nargs="?",
+        const=MemoryConfig().every,
+        default=None,
+        metavar="EVERY",
+        help="trace allocations and account one in EVERY requests in "
+        "/metrics (default %(const)s)",
+    )
+    args = parser.parse_args(argv)
+
+    batching = None
+    if args.batch_size > 0:
+        batching = BatchConfig(
+            max_batch_size=args.batch_size, max_wait=args.batch_wait_ms / 1000.0
+        )
+    server = PreforkServer(
+        agent_factory=functools.partial(
+            Agent,
+            batching=batching,
+            snapshot_path=args.snapshot,
+            plugins=args.plugins,
+            answer_cache=(
+                AnswerCacheConfig(threshold=args.answer_cache)
+                if args.answer_cache is not None
+                else None
+            ),
+            telemetry=(
+                TelemetryConfig(directory=args.telemetry)
+                if args.telemetry is not None
+                else None
+            ),
+            recorder=TraceRecorder(args.record) if args.record else None,
+            memory=MemoryConfig(every=args.memory) if args.memory else None,
+        ),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        admission=AdmissionConfig(
+            max_concurrent=args.max_concurrent,
+            max_queue=args.max_queue,
+            default_timeout=args.default_timeout,
+        ),
+    )
+    server.start()
+    host, port = server.address
+    print(
+        f"Listening on http://{host}:{port} with {server.workers} workers", flush=True
+    )
+    server.serve_forever()
+
+
+def loadtest(argv):
+    """Drive an in-process Agent or a running server with open-loop load"""
+    parser = argparse.ArgumentParser(prog="main.py loadtest")
+    parser.add_argument(
+        "--url", default=None, help="server to test (default: in-process Agent)"
+    )
+    parser.add_argument("--rate", type=float, default=20.0, help="requests/second")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "--concurrency", type=int, default=256, help="max requests in flight"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0.0,
+        help="median simulated LLM latency for the in-process Agent",
+    )
+    parser.add_argument("--json", default=None, help="also write the report here")
+    parser.add_argument(
+        "--record",
+        default=None,
+        metavar="TRACE",
+        help="record the in-process Agent's requests to a trace file",
+    )
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        rate=args.rate,
+        arrival=args.arrival,
+        warmup=args.warmup,
+        duration=args.duration,
+        concurrency=args.concurrency,
+        seed=args.seed,
+    )
+    if args.url:
+        target = HTTPTarget(args.url)
+    else:
+        recorder = TraceRecorder(args.record) if args.record else None
+        agent = Agent(use_fake_llm=True, seed=args.seed, recorder=recorder)
+        if args.llm_latency_ms > 0:
+            agent.llm_service = LLMService(
+                latency=LognormalLatency(median=args.llm_latency_ms / 1000.0),
+                seed=args.seed,
+            )
+        target = AgentTarget(agent)
+
+    report = LoadGenerator(target, config).run()
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def snapshot(argv):
+    """Build (or verify) the prebuilt tool data snapshot"""
+    parser = argparse.ArgumentParser(prog="main.py snapshot")
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="check the existing snapshot instead of building one",
+    )
+    args = parser.parse_args(argv)
+
+    registry = ToolRegistry()
+    if args.verify:
+        try:
+            snap = Snapshot(args.out, verify=True)
+        except SnapshotError as e:
+            print(e)
+            sys.exit(1)
+        stale = snap.is_stale(registry.snapshot_sources())
+        print(f"{args.out}: {'out of date' if stale else 'ok'}")
+        sys.exit(1 if stale else 0)
+
+    build_snapshot(registry.snapshot_sections(), registry.snapshot_sources(), args.out)
+    print(f"Wrote {args.out} ({os.path.getsize(args.out)} bytes)")
+
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)([smhd]?)$")
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in a duration such as ``90``, ``15m`` or ``2h``"""
+    match = _DURATION.match(text.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f"invalid duration: {text!r}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def telemetry(argv):
+    """Print latency percentiles from the telemetry log"""
+    parser = argparse.ArgumentParser(prog="main.py telemetry")
+    parser.add_argument("--dir", default=TELEMETRY_DIR)
+    parser.add_argument(
+        "--last", type=parse_duration, default=None, help="e.g. 15m, 2h, 1d"
+    )
+    parser.add_argument("--since", type=float, default=None, help="epoch seconds")
+    parser.add_argument("--until", type=float, default=None, help="epoch seconds")
+    parser.add_argument(
+        "--by",
+        default="tool,path",
+        help="comma-separated grouping fields (tool, path, outcome)",
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON rows")
+    args = parser.parse_args(argv)
+
+    by = tuple(field.strip() for field in args.by.split(",") if field.strip())
+    unknown = set(by) - {"tool", "path", "outcome"}
+    if unknown:
+        parser.error(f"cannot group by {', '.join(sorted(unknown))}")
+    start = args.since
+    if args.last is not None:
+        start = time.time() - args.last
+    rows = TelemetryReader.from_directory(args.dir).summarize(start, args.until, by)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    elif rows:
+        print(format_summary(rows, by))
+    else:
+        print(f"No telemetry records in {args.dir}")
+
+
+def replay(argv):
+    """Replay a recorded trace through the parser, tools and formatter"""
+    parser = argparse.ArgumentParser(prog="main.py replay")
+    parser.add_argument("trace", help="trace file written with --record")
+    parser.add_argument(
+        "--pacing",
+        choices=PACINGS,
+        default="fast",
+        help="as fast as possible, or at the recorded arrival times",
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="time compression for original pacing"
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="replay threads")
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        default=None,
+        help=f"serve tool data from a prebuilt snapshot (default: {SNAPSHOT_PATH})",
+    )
+    parser.add_argument("--json", default=None, help="also write the report here")
+    parser.add_argument(
+        "--strict", action="store_true", help="exit with status 1 on any mismatch"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        trace = load_trace(args.trace)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+    agent = Agent(use_fake_llm=True, snapshot_path=args.snapshot)
+    agent.warmup()
+    report = Replayer(
+        agent, trace, pacing=args.pacing, speed=args.speed, concurrency=args.concurrency
+    ).run()
+    print(format_replay_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.strict and (report["mismatched"] or report["errors"]):
+        sys.exit(1)
+
+
+def add_queue_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--queue", default=QUEUE_PATH, help=f"queue database (default: {QUEUE_PATH})"
+    )
+    parser.add_argument(
+        "--visibility-timeout",
+        type=float,
+        default=QueueConfig().visibility_timeout,
+        help="seconds a leased item stays hidden from other workers",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=QueueConfig().max_attempts,
+        help="leases per item before it is dead-lettered",
+    )
+    parser.add_argument(
+        "--no-wal",
+        action="store_true",
+        help="use a rollback journal (for queues on network filesystems)",
+    )
+
+
+def open_queue(args: argparse.Namespace) -> SQLiteWorkQueue:
+    return SQLiteWorkQueue(
+        args.queue,
+        QueueConfig(
+            visibility_timeout=args.visibility_timeout,
+            max_attempts=args.max_attempts,
+            wal=not args.no_wal,
+        ),
+    )
+
+
+def worker(argv):
+    """Answer questions pulled from a work queue"""
+    parser = argparse.ArgumentParser(prog="main.py worker")
+    add_queue_arguments(parser)
+    parser.add_argument(
+        "--processes", type=int, default=1, help="worker processes on this node"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=WorkerConfig().batch_size,
+        help="items leased per call",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=WorkerConfig().concurrency,
+        help="questions answered at once per process",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=WorkerConfig().poll_interval,
+        help="seconds between polls of an empty queue",
+    )
+    parser.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="exit once no items are pending instead of polling",
+    )
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=0.0,
+        help="median simulated LLM latency",
+    )
+    parser.add_argument(
+        "--snapshot",
+        nargs="?",
+        const=SNAPSHOT_PATH,
+        default=None,
+        help=f"serve tool data from a prebuilt snapshot (default: {SNAPSHOT_PATH})",
+    )
+    args = parser.parse_args(argv)
+
+    def make_agent():
+        agent = Agent(use_fake_llm=True, snapshot_path=args.snapshot)
+        if args.llm_latency_ms > 0:
+            agent.llm_service = LLMService(
+                latency=LognormalLatency(median=args.llm_latency_ms / 1000.0)
+            )
+        return agent
+
+    queue = open_queue(args)
+    started = time.monotonic()
+    codes = run_workers(
+        make_agent,
+        queue,
+        WorkerConfig(
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            poll_interval=args.poll_interval,
+            exit_when_empty=args.exit_when_empty,
+        ),
+        processes=args.processes,
+    )
+    elapsed = time.monotonic() - started
+    stats = queue.stats()
+    print(
+        f"{stats[DONE]} done, {stats['pending']} pending, {stats[DEAD]} dead "
+        f"after {elapsed:.1f}s"
+    )
+    sys.exit(max(codes))
+
+
+def queue_command(argv):
+    """Add items to, inspect or drain results from a work queue"""
+    parser = argparse.ArgumentParser(prog="main.py queue")
+    parser.add_argument("action", choices=("put", "stats", "results", "requeue-dead"))
+    parser.add_argument("question", nargs="*", help="questions to put")
+    add_queue_arguments(parser)
+    parser.add_argument(
+        "--file",
+        default=None,
+        help="put one question (or JSON payload object) per line; - for stdin",
+    )
+    parser.add_argument(
+        "--dead", action="store_true", help="list dead letters instead of results"
+    )
+    parser.add_argument(
+        "--after", type=int, default=0, help="only items with a larger id"
+    )
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args)
+    if args.action == "put":
+        payloads = [{"question": q} for q in args.question]
+        if args.file:
+            f = sys.stdin if args.file == "-" else open(args.file)
+            with f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        is_json = line.startswith("{")
+                        payloads.append(
+                            json.loads(line) if is_json else {"question": line}
+                        )
+        ids = queue.put_many(payloads)
+        print(f"Queued {len(ids)} items in {args.queue}")
+    elif args.action == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.action == "results":
+        state = DEAD if args.dead else DONE
+        for item in queue.finished(state, after_id=args.after, limit=args.limit):
+            print(json.dumps(item._asdict()))
+    else:
+        print(f"Requeued {queue.requeue_dead()} dead letters")
+
+
+COMMANDS = {
+    "serve": serve,
+    "loadtest": loadtest,
+    "snapshot": snapshot,
+    "telemetry": telemetry,
+    "replay": replay,
+    "worker": worker,
+    "queue": queue_command,
+}
 
 
 def main():
     """Main entry point for the agent application"""
-    if len(sys.argv) < 2:
-        print('Usage: python main.py "your question here"')
-        print("\nExample queries:")
-        print('  python main.py "What is 12.5% of 243?"')
-        print('  python main.py "What\'s the weather in Paris?"')
-        print('  python main.py "Who is Ada Lovelace?"')
-        print('  python main.py "Translate hello to Spanish"')
-        print(
-            '  python main.py "Add 10 to the average temperature in Paris and London"'
-        )
+    configure_logging()
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
+    args = build_arg_parser().parse_args()
+    if not args.question:
+        print_usage()
         sys.exit(1)
 
-    query = " ".join(sys.argv[1:])
-    agent = Agent(use_fake_llm=True)
+    query = " ".join(args.question)
+    profiler = build_profiler(args)
+    agent = Agent(use_fake_llm=True, profiler=profiler)
 
     try:
         result = agent.answer(query)
         print(result)
     except Exception as e:
-        logging.error(f"Error processing query: {e}")
+        logging.error("Error processing query: %s", e)
         print(f"An error occurred: {e}")
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.close()
+            out = args.profile_out or os.environ.get(ENV_OUT, "agent-profile")
+            profiler.write(out)
+            logging.info("Profile written to %s.collapsed and %s.txt", out, out)
 
 
 if __name__ == "__main__":
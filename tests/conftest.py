@@ -28,3 +28,19 @@ def setup_test_data():
 
         with open(kb_file, "w") as f:
             json.dump(kb_data, f, indent=2)
+
+
+class FakeClock:
+    """Clock for code that takes a ``clock`` callable; tests move ``now``"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A FakeClock starting at 0"""
+    return FakeClock()
@@ -0,0 +1,136 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agent.admission import AdmissionConfig, AdmissionController, AdmissionRejected
+
+
+def _wait_for(predicate, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > end:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+class Blocker:
+    """Holds an admission slot until released"""
+
+    def __init__(self, controller):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.thread = threading.Thread(
+            target=controller.run, args=(self._hold,), kwargs={"timeout": 10}
+        )
+        self.thread.start()
+        self.started.wait(2)
+
+    def _hold(self):
+        self.started.set()
+        self.release.wait(5)
+
+    def finish(self):
+        self.release.set()
+        self.thread.join(2)
+
+
+class TestAdmissionController:
+    def setup_method(self):
+        self.controller = AdmissionController(
+            AdmissionConfig(max_concurrent=1, max_queue=4)
+        )
+
+    def test_runs_immediately_when_idle(self):
+        assert self.controller.run(lambda x: x * 2, 21) == 42
+        stats = self.controller.stats()
+        assert stats["admitted"] == 1
+        assert stats["completed"] == 1
+        assert stats["active"] == 0
+
+    def test_unknown_priority(self):
+        with pytest.raises(ValueError):
+            self.controller.run(lambda: None, priority="urgent")
+
+    def test_rejects_when_queue_full(self):
+        controller = AdmissionController(AdmissionConfig(max_concurrent=1, max_queue=0))
+        blocker = Blocker(controller)
+        with pytest.raises(AdmissionRejected) as exc:
+            controller.run(lambda: None)
+        assert exc.value.reason == "queue_full"
+        blocker.finish()
+        assert controller.stats()["rejected_queue_full"] == 1
+
+    def test_higher_priority_served_first(self):
+        blocker = Blocker(self.controller)
+        order = []
+        threads = []
+        for priority in ("low", "normal", "high"):
+            thread = threading.Thread(
+                target=self.controller.run,
+                args=(order.append, priority),
+                kwargs={"priority": priority},
+            )
+            thread.start()
+            threads.append(thread)
+            depth = len(threads)
+            _wait_for(lambda: self.controller.stats()["queue_depth"] == depth)
+
+        assert self.controller.stats()["queue_depth_by_priority"] == {
+            "high": 1,
+            "normal": 1,
+            "low": 1,
+        }
+        blocker.finish()
+        for thread in threads:
+            thread.join(2)
+        assert order == ["high", "normal", "low"]
+
+    def test_expired_request_never_runs(self):
+        blocker = Blocker(self.controller)
+        calls = []
+        with pytest.raises(AdmissionRejected) as exc:
+            self.controller.run(calls.append, 1, timeout=0.05)
+        assert exc.value.reason == "expired"
+        blocker.finish()
+        assert calls == []
+        stats = self.controller.stats()
+        assert stats["expired"] == 1
+        assert stats["queue_depth"] == 0
+
+    def test_sheds_at_arrival_when_deadline_cannot_be_met(self):
+        self.controller.run(time.sleep, 0.05)  # learn the service time
+        blocker = Blocker(self.controller)
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected) as exc:
+            self.controller.run(lambda: None, timeout=0.02)
+        assert exc.value.reason == "deadline"
+        assert time.monotonic() - start < 0.02
+        blocker.finish()
+        assert self.controller.stats()["shed_deadline"] == 1
+
+    def test_goodput_holds_under_overload(self):
+        controller = AdmissionController(
+            AdmissionConfig(max_concurrent=2, max_queue=64)
+        )
+        service, timeout = 0.02, 0.1
+
+        def request():
+            start = time.monotonic()
+            try:
+                controller.run(time.sleep, service, timeout=timeout)
+            except AdmissionRejected:
+                return "rejected"
+            return "ok" if time.monotonic() - start <= timeout + service else "late"
+
+        # Offered load is about 5x capacity
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            outcomes = list(pool.map(lambda _: request(), range(40)))
+
+        assert outcomes.count("ok") >= 5
+        assert outcomes.count("rejected") > 0
+        assert outcomes.count("late") == 0
+        stats = controller.stats()
+        assert stats["admitted"] == outcomes.count("ok")
+        assert stats["queue_wait_ms"]["p99"] <= 1000 * timeout
@@ -97,3 +97,7 @@ class TestAgent:
             ToolResult(success=True, tool_used="other_tool", result="Some output")
         )
         assert result == "Some output"
+
+    def test_metrics_include_tool_bulkheads(self):
+        metrics = self.agent.metrics()
+        assert set(metrics["tools"]) == {"calc", "weather", "kb", "translator"}
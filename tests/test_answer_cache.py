@@ -0,0 +1,138 @@
+import pytest
+from pydantic import ValidationError
+
+from agent import answer_cache
+from agent.agent import Agent
+from agent.answer_cache import AnswerCache, AnswerCacheConfig, HashedVectorizer
+from agent.schemas import ToolPlan
+
+
+class TestAnswerCache:
+    @pytest.fixture(autouse=True)
+    def setup(self, clock):
+        self.clock = clock
+        self.cache = AnswerCache(AnswerCacheConfig(sample_rate=0.0), clock=self.clock)
+
+    def test_paraphrases_hit(self):
+        self.cache.put("weather in Paris?", "18.0°C", tool="weather")
+        for question in ("Paris weather", "what's the temperature in paris"):
+            hit = self.cache.get(question)
+            assert hit is not None
+            assert hit.answer == "18.0°C"
+            assert hit.question == "weather in Paris?"
+
+    def test_different_entities_miss(self):
+        self.cache.put("weather in Paris?", "18.0°C", tool="weather")
+        self.cache.put("Translate hello to Spanish", "hola", tool="translator")
+        assert self.cache.get("weather in London") is None
+        assert self.cache.get("Translate hello to French") is None
+
+    def test_numbers_and_operators_must_match(self):
+        self.cache.put("What is 2 + 3?", "5.0", tool="calc")
+        assert self.cache.get("what is 2+3") is not None
+        assert self.cache.get("What is 2 + 4?") is None
+        assert self.cache.get("What is 2 - 3?") is None
+
+    def test_volatile_answers_expire(self):
+        self.cache.put("weather in Paris", "18.0°C", tool="weather")
+        self.cache.put("Who is Ada Lovelace?", "mathematician", tool="kb")
+        self.clock.now = 301.0
+        assert self.cache.get("weather in Paris") is None
+        assert self.cache.get("Who is Ada Lovelace?") is not None
+        stats = self.cache.stats()
+        assert stats["expired"] == 1
+        assert stats["size"] == 1
+
+    def test_zero_ttl_disables_caching(self):
+        cache = AnswerCache(AnswerCacheConfig(volatile_ttl={"weather": 0}))
+        cache.put("weather in Paris", "18.0°C", tool="weather")
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = AnswerCache(AnswerCacheConfig(capacity=2, sample_rate=0.0))
+        cache.put("Who is Ada Lovelace?", "a")
+        cache.put("Who is Alan Turing?", "b")
+        cache.get("Who is Ada Lovelace?")
+        cache.put("Who is Grace Hopper?", "c")
+        assert cache.get("Who is Alan Turing?") is None
+        assert cache.get("Who is Ada Lovelace?").answer == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_false_hit_sampling(self):
+        cache = AnswerCache(AnswerCacheConfig(sample_rate=1.0))
+        cache.put("Who is Ada Lovelace?", "mathematician")
+        hit = cache.get("who is ada lovelace")
+        assert hit.verify
+        assert cache.check(hit, "mathematician")
+        assert not cache.check(hit, "someone else")
+        stats = cache.stats()
+        assert stats["verified"] == 2
+        assert stats["false_hits"] == 1
+        assert stats["false_hit_rate"] == 0.5
+        assert stats["recent_false_hits"][0]["fresh_answer"] == "someone else"
+        # A false hit evicts the entry
+        assert cache.get("who is ada lovelace") is None
+
+    def test_hit_rate(self):
+        self.cache.put("Who is Ada Lovelace?", "mathematician")
+        self.cache.get("who is ada lovelace")
+        self.cache.get("Who is Alan Turing?")
+        assert self.cache.stats()["hit_rate"] == 0.5
+
+    def test_python_backend_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(answer_cache, "np", None)
+        cache = AnswerCache(AnswerCacheConfig(sample_rate=0.0))
+        assert cache.stats()["backend"] == "python"
+        cache.put("weather in Paris?", "18.0°C", tool="weather")
+        cache.put("weather in London?", "15.0°C", tool="weather")
+        assert cache.get("Paris weather").answer == "18.0°C"
+        assert cache.get("weather in Rome") is None
+
+    def test_config_validation(self):
+        with pytest.raises(ValidationError):
+            AnswerCacheConfig(threshold=1.5)
+        with pytest.raises(ValidationError):
+            AnswerCacheConfig(capacity=0)
+
+
+class TestHashedVectorizer:
+    def test_unit_length_and_order_independent(self):
+        vectorizer = HashedVectorizer(dim=256)
+        a = vectorizer.vector(vectorizer.words("weather in Paris"))
+        b = vectorizer.vector(vectorizer.words("Paris weather?"))
+        assert a == b
+        assert abs(sum(w * w for w in a.values()) - 1.0) < 1e-9
+        assert vectorizer.vector(()) == {}
+
+
+class TestAgentAnswerCache:
+    def setup_method(self):
+        self.agent = Agent(
+            use_fake_llm=True, answer_cache=AnswerCacheConfig(sample_rate=0.0)
+        )
+        self.calls = []
+
+        def call_llm(prompt, timeout=None):
+            self.calls.append(prompt)
+            return ToolPlan(tool="weather", args={"city": "paris"})
+
+        self.agent.llm_service.call_llm = call_llm
+
+    def test_near_duplicate_skips_llm(self):
+        assert self.agent.answer("Weather in Paris?") == "18.0°C"
+        assert self.agent.answer("paris weather") == "18.0°C"
+        assert len(self.calls) == 1
+        assert self.agent.metrics()["answer_cache"]["hits"] == 1
+
+    def test_errors_and_sessions_are_not_cached(self):
+        self.agent.llm_service.call_llm = lambda prompt, timeout=None: None
+        self.agent.answer("Weather in Paris?")
+        assert len(self.agent.answer_cache) == 0
+
+        self.agent.answer("Weather in Paris?", session_id="s1")
+        assert self.agent.answer_cache.stats()["lookups"] == 1
+
+    def test_disabled_by_default(self):
+        agent = Agent(use_fake_llm=True)
+        assert agent.answer_cache is None
+        assert "answer_cache" not in agent.metrics()
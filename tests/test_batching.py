@@ -0,0 +1,126 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agent.agent import Agent
+from agent.batching import BatchConfig, MicroBatcher
+from agent.latency import FixedLatency
+from agent.llm import LLMService, ResponseProfile
+
+
+class RecordingBackend:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        with self.lock:
+            self.batches.append(list(items))
+        time.sleep(self.delay)
+        return [f"echo:{item}" for item in items]
+
+
+class TestMicroBatcher:
+    def setup_method(self):
+        self.backend = RecordingBackend()
+
+    def test_single_call_dispatched_after_max_wait(self):
+        batcher = MicroBatcher(self.backend, BatchConfig(max_wait=0.01))
+        start = time.perf_counter()
+        assert batcher.call("a") == "echo:a"
+        assert time.perf_counter() - start >= 0.009
+        assert self.backend.batches == [["a"]]
+        batcher.close()
+
+    def test_concurrent_calls_share_a_batch(self):
+        batcher = MicroBatcher(
+            self.backend, BatchConfig(max_batch_size=8, max_wait=0.2)
+        )
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.call, range(8)))
+        assert results == [f"echo:{i}" for i in range(8)]
+        # A full batch goes out without waiting for max_wait
+        assert [len(b) for b in self.backend.batches] == [8]
+        stats = batcher.stats()
+        assert stats["calls"] == 8
+        assert stats["batches"] == 1
+        assert stats["max_batch_size"] == 8
+        assert stats["mean_batch_size"] == 8
+        batcher.close()
+
+    def test_batches_never_exceed_limit(self):
+        batcher = MicroBatcher(
+            self.backend, BatchConfig(max_batch_size=3, max_wait=0.01)
+        )
+        futures = [batcher.submit(i) for i in range(10)]
+        assert [f.result() for f in futures] == [f"echo:{i}" for i in range(10)]
+        assert max(len(b) for b in self.backend.batches) <= 3
+        assert sum(len(b) for b in self.backend.batches) == 10
+        batcher.close()
+
+    def test_batches_grow_while_backend_is_busy(self):
+        backend = RecordingBackend(delay=0.05)
+        batcher = MicroBatcher(
+            backend, BatchConfig(max_batch_size=32, max_wait=0.0, max_inflight=1)
+        )
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(batcher.call, range(16)))
+        assert len(backend.batches) < 16
+        assert batcher.stats()["queue_delay_ms"]["p99"] > 0
+        batcher.close()
+
+    def test_backend_error_fails_every_call_in_batch(self):
+        def broken(items):
+            raise RuntimeError("backend down")
+
+        batcher = MicroBatcher(broken, BatchConfig(max_wait=0.01))
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result()
+        assert batcher.stats()["errors"] >= 1
+        batcher.close()
+
+    def test_wrong_result_count_is_an_error(self):
+        batcher = MicroBatcher(lambda items: [], BatchConfig(max_wait=0.0))
+        with pytest.raises(RuntimeError, match="returned 0 results"):
+            batcher.call("a")
+        batcher.close()
+
+    def test_closed_batcher_rejects_calls(self):
+        batcher = MicroBatcher(self.backend)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit("a")
+
+
+class TestBatchedLLM:
+    def test_batch_endpoint_charges_one_round_trip(self):
+        sleeps = []
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0),
+            latency=FixedLatency(0.1),
+            sleep=sleeps.append,
+        )
+        responses = llm.call_llm_batch(["Weather in Paris", "What is 2 + 2?"])
+        assert [r.tool for r in responses] == ["weather", "calc"]
+        assert sleeps == [0.1]
+
+    def test_agent_answers_through_batcher(self):
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(
+            profile=ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0),
+            batching=BatchConfig(max_wait=0.02),
+        )
+        questions = ["Weather in London", "What is 2 + 3?", "Weather in Dhaka"]
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            answers = list(pool.map(agent.answer, questions))
+        assert answers == ["17.0°C", "5.0", "31.0°C"]
+        batching = agent.metrics()["llm"]["batching"]
+        assert batching["calls"] == 3
+        assert batching["batches"] < 3
+        agent.llm_service.close()
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from agent.bulkhead import Bulkhead, BulkheadClosed, BulkheadConfig, BulkheadFull
+
+
+class TestBulkhead:
+    def test_call_returns_result(self):
+        bulkhead = Bulkhead("calc")
+        assert bulkhead.call(lambda x: x * 2, 21) == 42
+        assert bulkhead.stats()["calls"] == 1
+
+    def test_rejects_when_saturated(self):
+        release = threading.Event()
+        bulkhead = Bulkhead("slow", BulkheadConfig(max_concurrent=1, max_queue=1))
+        bulkhead.submit(release.wait)
+        bulkhead.submit(release.wait)
+        try:
+            with pytest.raises(BulkheadFull):
+                bulkhead.submit(release.wait)
+            assert bulkhead.stats()["rejected"] == 1
+        finally:
+            release.set()
+
+    def test_try_submit_never_queues(self):
+        release = threading.Event()
+        bulkhead = Bulkhead("slow", BulkheadConfig(max_concurrent=1, max_queue=4))
+        running = bulkhead.try_submit(release.wait)
+        try:
+            assert running is not None
+            assert bulkhead.try_submit(release.wait) is None
+            queued = bulkhead.submit(lambda: "queued")
+        finally:
+            release.set()
+        assert queued.result(1) == "queued"
+        assert bulkhead.try_submit(lambda: "free").result(1) == "free"
+        assert bulkhead.stats()["rejected"] == 0
+
+    def test_submit_after_shutdown(self):
+        bulkhead = Bulkhead("calc")
+        bulkhead.shutdown()
+        with pytest.raises(BulkheadClosed):
+            bulkhead.submit(lambda: None)
+        stats = bulkhead.stats()
+        assert stats["calls"] == 0
+        assert stats["in_flight"] == 0
+
+    def test_timeout_keeps_slot_until_call_returns(self):
+        release = threading.Event()
+        config = BulkheadConfig(max_concurrent=1, max_queue=0, initial_timeout=0.05)
+        bulkhead = Bulkhead("slow", config)
+        with pytest.raises(TimeoutError, match="timed out"):
+            bulkhead.call(release.wait)
+        with pytest.raises(BulkheadFull):
+            bulkhead.call(release.wait)
+        release.set()
+        deadline = time.time() + 2
+        while bulkhead.stats()["in_flight"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert bulkhead.call(lambda: "ok") == "ok"
+        assert bulkhead.stats()["timed_out"] == 1
+
+    def test_timeout_adapts_to_observed_latency(self):
+        config = BulkheadConfig(
+            initial_timeout=5.0, min_timeout=0.01, min_samples=16, timeout_multiplier=2
+        )
+        bulkhead = Bulkhead("fast", config)
+        for _ in range(32):
+            bulkhead.call(lambda: None)
+        assert bulkhead.current_timeout() == pytest.approx(0.01)
+
+        # Slow calls time out at first but are still recorded when they finish
+        for _ in range(32):
+            bulkhead.submit(time.sleep, 0.02).result()
+        assert 0.04 <= bulkhead.current_timeout() < 1.0
+
+    def test_adaptive_timeout_excludes_queue_wait(self):
+        config = BulkheadConfig(max_concurrent=1, initial_timeout=0.3)
+        bulkhead = Bulkhead("calc", config)
+        bulkhead.submit(time.sleep, 0.2)
+        # Queued plus running takes longer than the adaptive timeout
+        assert bulkhead.call(time.sleep, 0.2) is None
+        assert bulkhead.stats()["timed_out"] == 0
+
+    def test_queue_wait_bounded_by_adaptive_timeout(self):
+        release = threading.Event()
+        config = BulkheadConfig(max_concurrent=1, initial_timeout=0.05)
+        bulkhead = Bulkhead("slow", config)
+        bulkhead.submit(release.wait)
+        try:
+            start = time.perf_counter()
+            with pytest.raises(TimeoutError, match="free worker"):
+                bulkhead.call(lambda: "late")
+            assert time.perf_counter() - start < 1.0
+        finally:
+            release.set()
+        bulkhead.shutdown(wait=True)
+        stats = bulkhead.stats()
+        assert stats["completed"] == 1
+        assert stats["cancelled"] == 1
+        assert stats["timed_out"] == 1
+
+    def test_queue_wait_bounded_by_caller_timeout(self):
+        release = threading.Event()
+        bulkhead = Bulkhead("slow", BulkheadConfig(max_concurrent=1))
+        bulkhead.submit(release.wait)
+        try:
+            queued = bulkhead.submit(lambda: "late")
+            with pytest.raises(TimeoutError, match="free worker"):
+                bulkhead.wait(queued, timeout=0.05)
+            assert queued.cancelled()
+            assert bulkhead.stats()["in_flight"] == 1
+        finally:
+            release.set()
+
+    def test_config_validation(self):
+        with pytest.raises(ValidationError):
+            BulkheadConfig(max_concurrent=0)
+        with pytest.raises(ValidationError):
+            BulkheadConfig(min_timeout=2, max_timeout=1)
@@ -0,0 +1,192 @@
+import threading
+import time
+
+import pytest
+
+from agent import deadline
+from agent.agent import Agent
+from agent.batching import BatchConfig, MicroBatcher
+from agent.deadline import Deadline, DeadlineExceeded
+from agent.latency import FixedLatency
+from agent.llm import LLMService, ResponseProfile
+from agent.schemas import ToolResult
+from agent.tool_registry import ToolRegistry
+from agent.tools.args import ArgSpec
+from agent.tools.base import BaseTool
+from agent.tools.knowledge_base import KnowledgeBaseTool
+from agent.tools.math_parser import evaluate
+
+TOOL_PLANS = ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0)
+DIRECT = ResponseProfile(tool_plan=0, malformed=0, structured=0, direct=1)
+
+
+class SlowWeatherTool(BaseTool):
+    """Stands in for the weather tool; checks the deadline between steps"""
+
+    args_schema = (ArgSpec(name="city"),)
+
+    def __init__(self, steps=50, step=0.01):
+        self.steps = steps
+        self.step = step
+        self.completed = 0
+
+    @property
+    def name(self):
+        return "weather"
+
+    def run(self, args):
+        for _ in range(self.steps):
+            deadline.check("weather lookup")
+            time.sleep(self.step)
+            self.completed += 1
+        return 20.0
+
+
+class TestDeadline:
+    def test_resolve(self):
+        assert Deadline.resolve() is None
+        now = time.monotonic()
+        assert Deadline.resolve(deadline=now + 5).at == now + 5
+        earliest = Deadline.resolve(deadline=now + 5, timeout=1)
+        assert earliest.at < now + 2
+
+    def test_remaining_and_check(self):
+        budget = Deadline.after(0)
+        assert budget.expired()
+        assert budget.remaining() == 0
+        with pytest.raises(DeadlineExceeded):
+            budget.check()
+
+    def test_scope(self):
+        assert deadline.current() is None
+        budget = Deadline.after(10)
+        with deadline.scope(budget):
+            assert deadline.current() is budget
+            deadline.check()
+        assert deadline.current() is None
+
+
+class TestLLMDeadline:
+    def test_call_gives_up_at_deadline(self):
+        sleeps = []
+        llm = LLMService(latency=FixedLatency(5.0), sleep=sleeps.append)
+        with pytest.raises(TimeoutError):
+            llm.call_llm("What is 2 + 2?", timeout=0.05)
+        assert len(sleeps) == 1 and sleeps[0] <= 0.05
+
+    def test_call_within_budget(self):
+        llm = LLMService(latency=FixedLatency(0.01), sleep=lambda s: None)
+        assert llm.call_llm("What is 2 + 2?", timeout=1.0) is not None
+
+    def test_stream_stops_at_deadline(self):
+        llm = LLMService(profile=DIRECT, tokens_per_second=100)
+        tokens = []
+        with pytest.raises(TimeoutError):
+            for token in llm.stream_llm("Who is Ada Lovelace?", timeout=0.05):
+                tokens.append(token)
+        # The full answer is ten tokens, about 0.1s at this rate
+        assert 0 < len(tokens) < 10
+
+    def test_batched_call_is_cancelled_before_dispatch(self):
+        release = threading.Event()
+        sent = []
+
+        def backend(items):
+            sent.extend(items)
+            release.wait(5)
+            return items
+
+        batcher = MicroBatcher(
+            backend, BatchConfig(max_batch_size=1, max_wait=0.0, max_inflight=1)
+        )
+        first = batcher.submit("first")
+        with pytest.raises(TimeoutError):
+            batcher.call("late", timeout=0.05)
+        release.set()
+        assert first.result(2) == "first"
+        batcher.close()
+        assert sent == ["first"]
+        assert batcher.stats()["cancelled"] == 1
+
+
+class TestToolDeadline:
+    def test_no_budget_left_skips_run(self):
+        tool = SlowWeatherTool()
+        result = tool.execute({"city": "paris"}, timeout=0)
+        assert not result.success
+        assert "ran out of time" in result.error
+        assert tool.completed == 0
+
+    def test_run_stops_cooperatively(self):
+        tool = SlowWeatherTool()
+        result = tool.execute({"city": "paris"}, timeout=0.05)
+        assert not result.success
+        assert tool.completed < tool.steps
+
+    def test_without_timeout_runs_to_completion(self):
+        tool = SlowWeatherTool(steps=2, step=0)
+        assert tool.execute({"city": "paris"}).result == 20.0
+
+    def test_builtin_tools_check_deadline(self):
+        expired = Deadline(time.monotonic() - 1.0)
+        expression = "+".join(["1"] * 1000)
+        assert evaluate(expression) == 1000.0
+        kb = KnowledgeBaseTool()
+        with deadline.scope(expired):
+            with pytest.raises(DeadlineExceeded, match="Calculation"):
+                evaluate(expression)
+            with pytest.raises(DeadlineExceeded, match="Knowledge base"):
+                kb.search("grace hopper")
+
+    def test_execute_without_timeout_argument(self):
+        class LegacyTool(BaseTool):
+            name = "legacy"
+
+            def execute(self, args):
+                return ToolResult(success=True, result="ok", tool_used=self.name)
+
+            def validate_args(self, args):
+                return True
+
+        registry = ToolRegistry()
+        registry.register_tool(LegacyTool())
+        tool = registry.get_tool("legacy")
+        assert registry.execute(tool, {}, timeout=1.0).result == "ok"
+        # Not registered, so run without a bulkhead
+        assert ToolRegistry().execute(tool, {}, timeout=1.0).result == "ok"
+
+
+class TestAgentDeadline:
+    def test_slow_llm_returns_timeout_fallback(self):
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(latency=FixedLatency(2.0))
+        start = time.monotonic()
+        answer = agent.answer("What is 2 + 2?", timeout=0.05)
+        assert time.monotonic() - start < 0.5
+        assert answer.startswith("Error: Request timed out")
+
+    def test_slow_tool_returns_timeout_result(self):
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(profile=TOOL_PLANS)
+        tool = SlowWeatherTool()
+        agent.tool_registry.register_tool(tool)
+        start = time.monotonic()
+        answer = agent.answer("Weather in Paris", timeout=0.1)
+        assert time.monotonic() - start < 0.3
+        assert answer.startswith("Error:")
+        assert "time" in answer
+
+    def test_direct_answer_within_budget(self):
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(profile=DIRECT, latency=FixedLatency(0.01))
+        answer = agent.answer("Who is Ada Lovelace?", timeout=1.0)
+        assert "mathematician" in answer
+
+    def test_expired_deadline_skips_tool(self):
+        agent = Agent(use_fake_llm=True)
+        agent.llm_service = LLMService(profile=TOOL_PLANS)
+        tool = SlowWeatherTool()
+        agent.tool_registry.register_tool(tool)
+        answer = agent.answer("Weather in Paris", deadline=time.monotonic() - 1)
+        assert answer.startswith("Error: Request timed out")
+        assert tool.completed == 0
@@ -1,4 +1,11 @@
-from agent.llm import LLMService
+import random
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+from agent.latency import FixedLatency, LognormalLatency, TraceLatency
+from agent.llm import LLMService, ResponseProfile
 from agent.schemas import ToolPlan, ToolType
 
 
@@ -30,7 +37,7 @@ class TestLLMService:
 
     def test_call_llm_returns_tool_plan(self, monkeypatch):
         # Force random roll to return a tool plan
-        monkeypatch.setattr("random.random", lambda: 0.1)
+        monkeypatch.setattr(self.llm._rng, "random", lambda: 0.1)
         result = self.llm.call_llm("What is the weather in London?")
         assert isinstance(result, ToolPlan)
         assert result.tool in [
@@ -41,19 +48,19 @@ class TestLLMService:
         ]
 
     def test_call_llm_returns_malformed_json(self, monkeypatch):
-        monkeypatch.setattr("random.random", lambda: 0.4)
+        monkeypatch.setattr(self.llm._rng, "random", lambda: 0.4)
         result = self.llm.call_llm("What is 2+2?")
         assert isinstance(result, str)
         assert "tool" in result
 
     def test_call_llm_returns_structured_format(self, monkeypatch):
-        monkeypatch.setattr("random.random", lambda: 0.7)
+        monkeypatch.setattr(self.llm._rng, "random", lambda: 0.7)
         result = self.llm.call_llm("Add 12.5% of 243")
         assert isinstance(result, str)
         assert result.startswith("TOOL:calc")
 
     def test_call_llm_returns_direct_answer(self, monkeypatch):
-        monkeypatch.setattr("random.random", lambda: 0.85)
+        monkeypatch.setattr(self.llm._rng, "random", lambda: 0.85)
         result = self.llm.call_llm("Who is Ada Lovelace?")
         assert isinstance(result, str)
         assert "Ada Lovelace" in result or result.startswith(
@@ -67,10 +74,132 @@ class TestLLMService:
 
         self.llm._generate_tool_plan = bad_generate_tool_plan
         monkeypatch.setattr(
-            "random.random", lambda: 0.1
+            self.llm._rng, "random", lambda: 0.1
         )  # Always triggers tool plan path
 
         with caplog.at_level("WARNING"):
             result = self.llm.call_llm("weather")
             assert result is None
             assert "Error generating tool plan" in caplog.text
+
+
+class TestSeededFakeLLM:
+    def test_same_seed_is_reproducible(self):
+        prompts = ["What is 2+2?", "Weather in London", "Who is Ada Lovelace?"] * 10
+        first = LLMService(seed=42)
+        second = LLMService(seed=42)
+        assert [first.call_llm(p) for p in prompts] == [
+            second.call_llm(p) for p in prompts
+        ]
+
+    def test_instances_do_not_share_rng(self):
+        llm = LLMService(seed=7)
+        expected = LLMService(seed=7).call_llm("What is 1+1?")
+        for _ in range(5):
+            LLMService(seed=7).call_llm("noise")
+        assert llm.call_llm("What is 1+1?") == expected
+
+    def test_threads_draw_from_separate_streams(self):
+        llm = LLMService(seed=3)
+        streams = []
+
+        def draw():
+            streams.append(llm._rng)
+
+        threads = [threading.Thread(target=draw) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        assert len({id(rng) for rng in streams}) == 3
+        # The first thread to draw replays the plain seed
+        assert streams[0].random() == random.Random(3).random()
+        assert streams[1].random() != streams[2].random()
+
+    def test_profile_all_direct(self):
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=0, malformed=0, structured=0, direct=1),
+        )
+        for _ in range(20):
+            assert llm.call_llm("Hi there").startswith("I think you are asking")
+
+    def test_profile_all_structured(self):
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=0, malformed=0, structured=1, direct=0),
+        )
+        assert llm.call_llm("anything") == 'TOOL:calc EXPR="12.5% of 243"'
+
+    def test_profile_rejects_all_zero(self):
+        with pytest.raises(ValidationError):
+            ResponseProfile(tool_plan=0, malformed=0, structured=0, direct=0)
+
+    def test_default_profile_mix(self):
+        llm = LLMService(seed=3)
+        n = 4000
+        plans = sum(isinstance(llm.call_llm("weather"), ToolPlan) for _ in range(n))
+        assert 0.30 < plans / n < 0.40
+
+
+class TestLatencyModels:
+    def test_fixed_latency_sleeps(self):
+        slept = []
+        llm = LLMService(seed=1, latency=FixedLatency(0.25), sleep=slept.append)
+        llm.call_llm("What is 2+2?")
+        assert slept == [0.25]
+
+    def test_token_rate_adds_generation_time(self):
+        slept = []
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=0, malformed=0, structured=1, direct=0),
+            latency=FixedLatency(0.1),
+            tokens_per_second=10,
+            sleep=slept.append,
+        )
+        llm.call_llm("x")
+        # 'TOOL:calc EXPR="12.5% of 243"' is four whitespace tokens
+        assert slept == [pytest.approx(0.1 + 4 / 10)]
+
+    def test_stream_yields_tokens_at_rate(self):
+        slept = []
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=0, malformed=0, structured=1, direct=0),
+            latency=FixedLatency(0.1),
+            tokens_per_second=20,
+            sleep=slept.append,
+        )
+        chunks = list(llm.stream_llm("x"))
+        assert "".join(chunks) == 'TOOL:calc EXPR="12.5% of 243"'
+        assert slept == [0.1] + [0.05] * len(chunks)
+
+    def test_stream_tool_plan_as_json(self):
+        llm = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0),
+        )
+        text = "".join(llm.stream_llm("Weather in London"))
+        assert ToolPlan.model_validate_json(text).args == {"city": "london"}
+
+    def test_lognormal_is_seeded(self):
+        model = LognormalLatency(median=0.5, sigma=0.8)
+        a = [model.sample(random.Random(5)) for _ in range(3)]
+        b = [model.sample(random.Random(5)) for _ in range(3)]
+        assert a == b
+        assert all(0 < x <= model.cap for x in a)
+
+    def test_trace_latency_replays_and_wraps(self, tmp_path):
+        trace = tmp_path / "trace.txt"
+        trace.write_text("0.1\n0.2\n0.3\n")
+        model = TraceLatency.from_file(trace)
+        rng = random.Random(0)
+        assert [model.sample(rng) for _ in range(4)] == [0.1, 0.2, 0.3, 0.1]
+
+    def test_invalid_latency_config(self):
+        with pytest.raises(ValueError):
+            FixedLatency(-1)
+        with pytest.raises(ValueError):
+            TraceLatency([])
+        with pytest.raises(ValueError):
+            LLMService(tokens_per_second=0)
@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+
+import pytest
+
+from agent.agent import Agent
+from agent.loadgen import (
+    AgentTarget,
+    FailedAnswer,
+    HTTPTarget,
+    LoadConfig,
+    LoadGenerator,
+    QueryClass,
+    format_report,
+)
+from agent.schemas import ToolPlan, ToolType
+from agent.server import AgentHTTPServer, create_listener
+
+
+class FlakyTarget:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, question):
+        with self._lock:
+            self.calls += 1
+        if question == "fail":
+            raise RuntimeError("boom")
+        return "ok"
+
+
+class TestSchedule:
+    def test_constant_arrivals(self):
+        config = LoadConfig(rate=10, arrival="constant", warmup=1, duration=1)
+        offsets = [a[0] for a in LoadGenerator(FlakyTarget(), config).schedule()]
+        assert len(offsets) == 19
+        assert offsets[0] == pytest.approx(0.1)
+        assert offsets[1] - offsets[0] == pytest.approx(0.1)
+
+    def test_poisson_rate_and_seed(self):
+        config = LoadConfig(rate=200, warmup=0, duration=10, seed=3)
+        arrivals = LoadGenerator(FlakyTarget(), config).schedule()
+        assert 1800 < len(arrivals) < 2200
+        assert arrivals == LoadGenerator(FlakyTarget(), config).schedule()
+
+    def test_mix_weights(self):
+        mix = [
+            QueryClass(name="a", weight=3, questions=["qa"]),
+            QueryClass(name="b", weight=1, questions=["qb"]),
+        ]
+        config = LoadConfig(rate=1000, warmup=0, duration=4, seed=1, mix=mix)
+        names = [a[1] for a in LoadGenerator(FlakyTarget(), config).schedule()]
+        assert 0.7 < names.count("a") / len(names) < 0.8
+
+    def test_empty_mix_rejected(self):
+        with pytest.raises(ValueError):
+            LoadConfig(mix=[])
+
+
+class TestLoadGenerator:
+    def test_report_per_class_and_warmup_excluded(self):
+        mix = [
+            QueryClass(name="good", weight=1, questions=["hi"]),
+            QueryClass(name="bad", weight=1, questions=["fail"]),
+        ]
+        config = LoadConfig(
+            rate=200, arrival="constant", warmup=0.1, duration=0.2, seed=0, mix=mix
+        )
+        target = FlakyTarget()
+        report = LoadGenerator(target, config).run()
+
+        assert target.calls == 59
+        overall = report["overall"]
+        assert overall["requests"] == 40
+        assert report["classes"]["bad"]["error_rate"] == 1.0
+        assert report["classes"]["good"]["errors"] == 0
+        assert set(overall["latency_ms"]) == {"p50", "p90", "p99", "p99.9", "mean"}
+        json.dumps(report)
+        assert "overall" in format_report(report)
+
+    def test_latency_counts_from_scheduled_time(self):
+        """A stalled system shows up in latency even though each call is fast"""
+
+        def stall_once(question, state={"stalled": False}):
+            if not state["stalled"]:
+                state["stalled"] = True
+                time.sleep(0.2)
+
+        config = LoadConfig(
+            rate=100, arrival="constant", warmup=0, duration=0.3, concurrency=1
+        )
+        report = LoadGenerator(stall_once, config).run()
+        overall = report["overall"]
+        # Requests scheduled during the stall waited for the single worker
+        assert overall["latency_ms"]["p50"] > 50
+        assert overall["max_send_lag_ms"] > 100
+
+    def test_in_process_agent(self):
+        config = LoadConfig(rate=100, warmup=0, duration=0.2, seed=1)
+        target = AgentTarget(Agent(use_fake_llm=True, seed=1))
+        report = LoadGenerator(target, config).run()
+        assert report["overall"]["requests"] > 0
+        assert report["overall"]["errors"] == 0
+
+    def test_failed_answers_count_as_errors(self):
+        agent = Agent(use_fake_llm=True)
+
+        def timeout(prompt, timeout=None):
+            raise TimeoutError("LLM call timed out")
+
+        agent.llm_service.call_llm = timeout
+        target = AgentTarget(agent)
+        with pytest.raises(FailedAnswer, match="timeout"):
+            target("What is 2 + 2?")
+
+        config = LoadConfig(rate=100, warmup=0, duration=0.1, seed=1)
+        generator = LoadGenerator(target, config)
+        report = generator.run()
+        assert report["overall"]["error_rate"] == 1.0
+        assert {sample.error for sample in generator.samples} == {"timeout"}
+
+
+class TestHTTPTarget:
+    def setup_method(self):
+        agent = Agent(use_fake_llm=True)
+        plan = ToolPlan(tool=ToolType.WEATHER, args={"city": "london"})
+        agent.llm_service.call_llm = lambda q, timeout=None: plan
+        self.server = AgentHTTPServer(create_listener("127.0.0.1", 0), agent)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.socket.getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_posts_questions(self):
+        target = HTTPTarget(self.url)
+        assert target("Weather in London") == "17.0°C"
+
+    def test_failed_answers_raise(self):
+        plan = ToolPlan.model_construct(tool="nope", args={})
+        self.server.agent.llm_service.call_llm = lambda q, timeout=None: plan
+        with pytest.raises(FailedAnswer, match="unknown_tool"):
+            HTTPTarget(self.url)("Weather in London")
+
+    def test_http_errors_raise(self):
+        target = HTTPTarget(self.url + "/missing")
+        with pytest.raises(RuntimeError):
+            target("Weather in London")
+
+    def test_rejects_other_schemes(self):
+        with pytest.raises(ValueError):
+            HTTPTarget("https://example.com")
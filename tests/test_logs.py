@@ -0,0 +1,179 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from agent import logs
+from agent.logs import (
+    AsyncLogging,
+    JsonFormatter,
+    RateLimitFilter,
+    TextFormatter,
+    configure_logging,
+)
+
+
+def _record(msg="Invalid tool type: %s", args=("x",), level=logging.WARNING):
+    return logging.LogRecord("agent.parser", level, __file__, 1, msg, args, None)
+
+
+class BlockingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.unblock = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+class TestRateLimitFilter:
+    @pytest.fixture(autouse=True)
+    def setup(self, clock):
+        self.clock = clock
+        self.filter = RateLimitFilter(burst=3, interval=10, clock=self.clock)
+
+    def test_limits_per_template(self):
+        passed = [self.filter.filter(_record(args=(i,))) for i in range(10)]
+        assert passed.count(True) == 3
+        assert self.filter.suppressed_total == 7
+        # A different template has its own budget
+        assert self.filter.filter(_record(msg="Error parsing dict response: %s"))
+
+    def test_next_window_reports_suppressed_count(self):
+        for i in range(5):
+            self.filter.filter(_record(args=(i,)))
+        self.clock.now = 10
+        record = _record()
+        assert self.filter.filter(record)
+        assert record.suppressed == 2
+
+    def test_errors_are_not_limited(self):
+        records = [_record(level=logging.ERROR) for _ in range(10)]
+        assert all(self.filter.filter(r) for r in records)
+
+    def test_summaries(self):
+        for i in range(5):
+            self.filter.filter(_record(args=(i,)))
+        (summary,) = self.filter.summaries()
+        assert summary.getMessage() == (
+            "Suppressed 2 similar messages: Invalid tool type: %s"
+        )
+        assert self.filter.summaries() == []
+
+    def test_invalid_config(self):
+        with pytest.raises(ValueError):
+            RateLimitFilter(burst=0)
+
+
+class TestFormatters:
+    def test_json(self):
+        record = _record()
+        record.suppressed = 4
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "Invalid tool type: x"
+        assert entry["level"] == "WARNING"
+        assert entry["logger"] == "agent.parser"
+        assert entry["suppressed"] == 4
+
+    def test_text_mentions_suppressed(self):
+        record = _record()
+        record.suppressed = 4
+        line = TextFormatter("%(message)s").format(record)
+        assert line == "Invalid tool type: x (4 similar messages suppressed)"
+
+
+class TestAsyncLogging:
+    def setup_method(self):
+        self.logger = logging.getLogger("test.async_logging")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def teardown_method(self):
+        self.logger.handlers.clear()
+        self.logger.propagate = True
+
+    def test_slow_writer_does_not_block_callers(self):
+        target = BlockingHandler()
+        async_logging = AsyncLogging(target, queue_size=5)
+        self.logger.addHandler(async_logging.handler)
+        async_logging.start()
+
+        for i in range(20):
+            self.logger.info("message %d", i)
+        stats = async_logging.stats()
+        assert stats["dropped"] > 0
+
+        target.unblock.set()
+        async_logging.stop()
+        assert 0 < len(target.records) < 20
+        assert target.records[0].getMessage() == "message 0"
+
+    def test_formatting_happens_on_writer(self):
+        stream = io.StringIO()
+        target = logging.StreamHandler(stream)
+        target.setFormatter(TextFormatter("%(message)s"))
+        async_logging = AsyncLogging(target, rate_limit=RateLimitFilter(burst=1))
+        self.logger.addHandler(async_logging.handler)
+        async_logging.start()
+
+        for i in range(3):
+            self.logger.warning("Invalid tool type: %s", i)
+        async_logging.stop()
+        assert stream.getvalue().splitlines() == [
+            "Invalid tool type: 0",
+            "Suppressed 2 similar messages: Invalid tool type: %s",
+        ]
+
+
+def test_configure_logging_json():
+    root = logging.getLogger()
+    saved = (list(root.handlers), root.level)
+    stream = io.StringIO()
+    try:
+        configure_logging(level="INFO", json_format=True, stream=stream)
+        logging.getLogger("agent.test").info("hello %s", "world")
+        logs.shutdown()
+        assert json.loads(stream.getvalue())["message"] == "hello world"
+        assert logs.stats()["dropped"] == 0
+    finally:
+        logs.shutdown()
+        root.handlers[:] = saved[0]
+        root.setLevel(saved[1])
+        logs._active = None
+
+
+def test_configure_logging_registers_one_exit_hook(monkeypatch):
+    hooks = []
+    monkeypatch.setattr(logs.atexit, "register", hooks.append)
+    monkeypatch.setattr(logs, "_atexit_registered", False)
+    root = logging.getLogger()
+    saved = (list(root.handlers), root.level)
+    try:
+        for _ in range(3):
+            configure_logging(level="INFO", stream=io.StringIO())
+        assert hooks == [logs.shutdown]
+    finally:
+        logs.shutdown()
+        root.handlers[:] = saved[0]
+        root.setLevel(saved[1])
+        logs._active = None
+
+
+def test_drops_counted_from_many_threads():
+    handler = logs.AsyncLogHandler(queue_size=1)
+    handler.enqueue(_record())
+
+    def flood():
+        for _ in range(1000):
+            handler.enqueue(_record())
+
+    threads = [threading.Thread(target=flood) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.dropped == 8000
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from agent.tools.calculator import CalculatorTool
+from agent.tools.math_parser import ExpressionError, evaluate, tokenize
+
+
+class TestMathParser:
+    @pytest.mark.parametrize(
+        "expr, expected",
+        [
+            ("2 + 3", 5.0),
+            ("15 + 27 * 3", 96.0),
+            ("(15 + 27) * 3", 126.0),
+            ("2 ^ 3 ^ 2", 512.0),
+            ("2 ** 3", 8.0),
+            ("-2 ^ 2", -4.0),
+            ("10 - -3", 13.0),
+            ("12.5% of 243", 30.375),
+            ("What is 12.5% of 243?", 30.375),
+            ("15% of 200 plus 3", 33.0),
+            ("50%", 0.5),
+            ("add 10 to 5", 15.0),
+            ("Add 10 to 5 times 2", 20.0),
+            ("subtract 3 from 10", 7.0),
+            ("8 divided by 2 multiplied by 3", 12.0),
+            ("7 minus 2 plus 1", 6.0),
+            ("average of 10, 20 and 30", 20.0),
+            ("mean of 1, 2, and 3", 2.0),
+            ("the sum of 4 and 5", 9.0),
+            ("1,000 + 2,500.5", 3500.5),
+            ("average of 1,000, 3,000", 2000.0),
+            ("average of 100,200,300", 200.0),
+            ("sum of 1,5,10", 16.0),
+            ("sum of 1,000 and 2,000", 3000.0),
+            ("2,000 + average of 10,20", 2015.0),
+            ("what's 6 x 7?", 42.0),
+            (".5 + .25", 0.75),
+        ],
+    )
+    def test_evaluates(self, expr, expected):
+        assert evaluate(expr) == pytest.approx(expected)
+
+    @pytest.mark.parametrize(
+        "expr",
+        [
+            "",
+            "2 +",
+            "(1 + 2",
+            "1 2",
+            "add 10",
+            "average 1, 2",
+            "invalid_expr",
+            "__import__('os').system('ls')",
+            "2 and 3",
+            "10 multiplied 2",
+        ],
+    )
+    def test_rejects(self, expr):
+        with pytest.raises(ExpressionError):
+            evaluate(expr)
+
+    def test_deep_nesting_is_rejected(self):
+        with pytest.raises(ExpressionError, match="nested"):
+            evaluate("(" * 500 + "1" + ")" * 500)
+
+    def test_tokenizer_is_lazy(self):
+        tokens = tokenize("1 + 2 $")
+        assert next(tokens) == ("num", 1.0)
+        assert next(tokens) == ("op", "+")
+
+    def test_parse_cost_is_linear(self):
+        def cost(terms):
+            expr = " + ".join(["1"] * terms)
+            start = time.perf_counter()
+            assert evaluate(expr) == terms
+            return time.perf_counter() - start
+
+        cost(1000)  # warm up
+        small, large = cost(5000), cost(50000)
+        assert large < small * 30
+
+    def test_calculator_uses_parser(self):
+        result = CalculatorTool().execute({"expr": "What is 2 + 3?"})
+        assert result.success
+        assert result.result == 5.0
@@ -0,0 +1,113 @@
+import tracemalloc
+
+import pytest
+
+from agent import profiling
+from agent.agent import Agent
+from agent.memory import MemoryConfig, MemorySample, MemoryTracker
+
+CALC = '{"tool": "calc", "args": {"expr": "2+2"}}'
+
+
+class TestMemorySample:
+    def setup_method(self):
+        self.was_tracing = tracemalloc.is_tracing()
+        if not self.was_tracing:
+            tracemalloc.start()
+
+    def teardown_method(self):
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+    def test_stage_peak_and_retained(self):
+        sample = MemorySample()
+        kept = []
+        with profiling.observe(sample):
+            sample.enter("request")
+            with profiling.stage("parse"):
+                kept.append(bytearray(100_000))
+            with profiling.stage("tool"):
+                bytearray(500_000)
+            sample.exit("request")
+
+        parse_peak, parse_retained = sample.stages["parse"]
+        tool_peak, tool_retained = sample.stages["tool"]
+        assert parse_retained >= 100_000
+        assert parse_peak >= 100_000
+        assert tool_peak >= 500_000
+        assert tool_retained < 100_000
+        # The request saw the tool's peak even though it was reset inside
+        assert sample.peak >= 500_000
+        assert sample.retained >= 100_000
+
+    def test_without_observer_stages_untimed(self):
+        sample = MemorySample()
+        with profiling.stage("parse"):
+            pass
+        assert sample.stages == {}
+
+
+class TestMemoryTracker:
+    def setup_method(self):
+        self.tracker = None
+
+    def teardown_method(self):
+        if self.tracker is not None:
+            self.tracker.close()
+
+    def make_agent(self, **config):
+        agent = Agent(use_fake_llm=True, memory=MemoryConfig(**config))
+        agent.llm_service.call_llm = lambda prompt, timeout=None: CALC
+        self.tracker = agent.memory
+        return agent
+
+    def test_metrics(self):
+        agent = self.make_agent(every=1, snapshot_interval=None)
+        for _ in range(3):
+            assert agent.answer("What is 2 + 2?", session_id="s") == "4.0"
+
+        memory = agent.metrics()["memory"]
+        assert memory["tracing"]
+        assert memory["requests"] == memory["sampled"] == 3
+        assert memory["request"]["count"] == 3
+        assert memory["request"]["peak_max"] > 0
+        assert {"llm", "parse", "tool", "format"} <= set(memory["stages"])
+        assert memory["tools"]["calc"]["count"] == 3
+        caches = memory["caches"]
+        assert caches["prompt_prefix"]["entries"] == 1
+        assert caches["tool_catalog"]["bytes"] > 0
+        assert caches["sessions"]["entries"] == 1
+        assert caches["sessions"]["bytes"] > 0
+
+    def test_samples_one_in_every(self):
+        agent = self.make_agent(every=4, snapshot_interval=None)
+        for _ in range(8):
+            agent.answer("What is 2 + 2?")
+        stats = self.tracker.stats()
+        assert (stats["requests"], stats["sampled"]) == (8, 2)
+
+    def test_growth_report(self):
+        self.tracker = MemoryTracker(MemoryConfig(snapshot_interval=None, top=5))
+        leak = []
+        assert self.tracker.snapshot() == {}  # baseline
+        for interval in range(1, 3):
+            leak.extend(bytearray(1000) for _ in range(1000))
+            growth = self.tracker.snapshot()
+            top = growth["top"][0]
+            assert __file__ in top["site"]
+            assert top["size_diff"] >= 1_000_000
+            assert top["intervals_growing"] == interval
+        assert self.tracker.stats()["growth"]["total_growth"] >= 1_000_000
+
+    def test_close_stops_tracing(self):
+        if tracemalloc.is_tracing():
+            pytest.skip("tracemalloc already enabled for this process")
+        self.tracker = MemoryTracker(MemoryConfig(snapshot_interval=0.01))
+        assert tracemalloc.is_tracing()
+        self.tracker.close()
+        assert not tracemalloc.is_tracing()
+        assert self.tracker.stats()["tracing"] is False
+
+    def test_config_validation(self):
+        with pytest.raises(ValueError):
+            MemoryConfig(every=0)
@@ -1,4 +1,12 @@
-from agent.parser import ResponseParser
+import json
+import threading
+import time
+
+import pytest
+
+import agent.parser as parser_module
+from agent import json_backends
+from agent.parser import ParserLimits, ResponseParser
 from agent.schemas import ToolPlan, ToolType
 
 
@@ -69,3 +77,266 @@ class TestResponseParser:
                 "Invalid tool type in structured format: invalidtool" in m
                 for m in caplog.messages
             )
+
+
+def _reference_parse(response: str):
+    """The original fixed-order string parser, used as an oracle"""
+    try:
+        data = json.loads(response)
+        plan = ResponseParser._parse_dict_response(data)
+        if plan:
+            return plan
+    except json.JSONDecodeError:
+        fixed = ResponseParser._fix_common_json_errors(response)
+        if fixed != response:
+            try:
+                plan = ResponseParser._parse_dict_response(json.loads(fixed))
+                if plan:
+                    return plan
+            except json.JSONDecodeError:
+                pass
+    return ResponseParser._try_parse_structured(response) or response.strip()
+
+
+CORPUS = [
+    '{"tool": "weather", "args": {"city": "paris"}}',
+    '{"tool": "weather", "args": {"city": "Pa ris" }',
+    '{"tool": "calc", "args": {"expr": "1+1"}',
+    '{"tool": "weather" "args": {"city": "london"}}',
+    'tool: "calc", args: {expr: "2+2"}',
+    'TOOL:calc EXPR="12.5% of 243"',
+    "  TOOL:weather CITY=paris",
+    'Sure! TOOL:kb Q="ada lovelace"',
+    '{"tool": "calc", "args": {"expr": "TOOL:weather CITY=x"}}',
+    '{"note": "TOOL:calc EXPR=\\"1+1\\""}',
+    '{"tool": "nope", "args": {}} TOOL:calc EXPR="3"',
+    '["tool", "args"]',
+    '"tool and args"',
+    "  This is a direct answer  ",
+    "",
+    "{",
+    '\n\t{"tool": "kb", "args": {"q": "turing"}}',
+]
+
+
+class TestAdaptiveStrategies:
+    def setup_method(self):
+        ResponseParser.reset_strategy_stats()
+
+    @pytest.mark.parametrize("response", CORPUS)
+    def test_matches_reference_parser(self, response):
+        assert ResponseParser.parse_response(response) == _reference_parse(response)
+
+    @pytest.mark.parametrize("response", CORPUS)
+    def test_matches_reference_with_structured_first(self, response, monkeypatch):
+        stats = parser_module._strategy_stats.backend("structured-first")
+        monkeypatch.setattr(
+            stats, "_order", ["structured", "json", "json_repair"], raising=True
+        )
+        result = ResponseParser.parse_response(response, backend="structured-first")
+        assert result == _reference_parse(response)
+
+    def test_tool_prefix_never_reaches_json(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("json.loads should not be called")
+
+        monkeypatch.setattr(ResponseParser.json_backend(), "loads", fail)
+        result = ResponseParser.parse_response('TOOL:calc EXPR="1+1"')
+        assert result.tool == ToolType.CALC
+        result = ResponseParser.parse_response(memoryview(b'TOOL:calc EXPR="1+1"'))
+        assert result.tool == ToolType.CALC
+
+    def test_order_adapts_per_backend(self):
+        for _ in range(128):
+            ResponseParser.parse_response('TOOL:calc EXPR="1+1"', backend="tooly")
+            ResponseParser.parse_response('{"tool": "kb", "args": {"q": "x"}}')
+
+        tooly = ResponseParser.strategy_stats("tooly")
+        assert tooly["order"][0] == "structured"
+        assert tooly["strategies"]["structured"]["hit_rate"] == 1.0
+        assert tooly["strategies"]["json"]["attempts"] == 0
+        # Skipped by the classifier until the reorder, then never visited
+        assert tooly["strategies"]["json"]["skipped"] == 64
+
+        default = ResponseParser.strategy_stats("default")
+        assert default["order"][0] == "json"
+        assert set(ResponseParser.strategy_stats()) == {"tooly", "default"}
+
+    def test_counts_from_many_threads(self):
+        def parse():
+            for _ in range(100):
+                ResponseParser.parse_response('TOOL:calc EXPR="1+1"', backend="mt")
+
+        threads = [threading.Thread(target=parse) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = ResponseParser.strategy_stats("mt")
+        assert stats["parses"] == 800
+        assert stats["strategies"]["structured"]["hits"] == 800
+        assert stats["order"][0] == "structured"
+        # Exited threads are folded into one total
+        assert not parser_module._strategy_stats.backend("mt")._shards
+
+    def test_fallback_counted(self):
+        ResponseParser.parse_response("plain text", backend="b")
+        assert ResponseParser.strategy_stats("b")["fallbacks"] == 1
+
+
+class TestParserLimits:
+    def setup_method(self):
+        ResponseParser.reset_strategy_stats()
+
+    def teardown_method(self):
+        ResponseParser.set_limits(None)
+
+    @pytest.mark.parametrize(
+        "response",
+        [
+            "{" + "a" * 1_000_000,
+            "{" + '" "a' * 250_000,
+            "TOOL:" * 200_000,
+            'TOOL:calc EXPR="' + "x" * 1_000_000,
+        ],
+    )
+    def test_pathological_inputs_are_cheap(self, response):
+        ResponseParser.set_limits(ParserLimits(max_input_chars=None))
+        start = time.perf_counter()
+        ResponseParser.parse_response(response)
+        assert time.perf_counter() - start < 1.0
+
+    def test_long_responses_are_truncated(self):
+        ResponseParser.set_limits(ParserLimits(max_input_chars=10))
+        result = ResponseParser.parse_response("  hello world, this is long", "b")
+        assert result == "hello wo"
+        assert ResponseParser.strategy_stats("b")["truncated"] == 1
+
+    def test_plan_before_the_cap_survives_truncation(self):
+        ResponseParser.set_limits(ParserLimits(max_input_chars=100))
+        result = ResponseParser.parse_response('TOOL:calc EXPR="1+1" ' + "x" * 500)
+        assert result.tool == ToolType.CALC
+        assert result.args == {"expr": "1+1"}
+
+    def test_structured_scans_every_marker(self):
+        result = ResponseParser._try_parse_structured(
+            "TOOL: TOOL:x TOOL:kb Q='ada" + " " * 10 + 'TOOL:weather CITY="paris"'
+        )
+        assert result.tool == ToolType.WEATHER
+        assert result.args == {"city": "paris"}
+
+    def test_structured_value_is_bounded_by_window(self):
+        ResponseParser.set_limits(ParserLimits(structured_window=32))
+        result = ResponseParser._try_parse_structured("TOOL:kb Q=" + "a" * 100)
+        assert result.args == {"q": "a" * 22}
+        assert ResponseParser._try_parse_structured('TOOL:kb Q="' + "a" * 100) is None
+
+    def test_unquoted_keys_are_still_fixed(self):
+        fixed = ResponseParser._fix_common_json_errors('{tool: "calc", a1:b2:"x"}')
+        assert fixed == '{"tool": "calc", "a1":"b2":"x"}'
+
+
+class TestBytesInput:
+    def setup_method(self):
+        ResponseParser.reset_strategy_stats()
+
+    def teardown_method(self):
+        ResponseParser.set_json_backend(None)
+
+    @pytest.mark.parametrize("backend", json_backends.available())
+    @pytest.mark.parametrize("response", CORPUS)
+    def test_bytes_match_str(self, response, backend):
+        ResponseParser.set_json_backend(backend)
+        expected = _reference_parse(response)
+        raw = response.encode("utf-8")
+        assert ResponseParser.parse_response(raw) == expected
+        assert ResponseParser.parse_response(bytearray(raw)) == expected
+        assert ResponseParser.parse_response(memoryview(raw)) == expected
+
+    def test_memoryview_json_is_not_copied(self, monkeypatch):
+        seen = []
+        backend = ResponseParser.json_backend()
+        loads = backend.loads
+        monkeypatch.setattr(
+            backend, "loads", lambda data: seen.append(data) or loads(data)
+        )
+        buffer = bytearray(b'  {"tool": "kb", "args": {"q": "turing"}}')
+        result = ResponseParser.parse_response(memoryview(buffer))
+        assert result.tool == ToolType.KB
+        assert isinstance(seen[0], memoryview)
+
+    def test_invalid_utf8_falls_back_to_text(self):
+        assert ResponseParser.parse_response(b"caf\xe9 ") == "caf\ufffd"
+
+    def test_bytes_are_truncated(self):
+        ResponseParser.set_limits(ParserLimits(max_input_chars=5))
+        try:
+            assert ResponseParser.parse_response(memoryview(b"hello world")) == "hello"
+        finally:
+            ResponseParser.set_limits(None)
+
+
+class TestJSONBackends:
+    def test_stdlib_always_available(self):
+        assert json_backends.available()[-1] == "json"
+        assert json_backends.get_backend("json").loads(memoryview(b"[1]")) == [1]
+
+    def test_fastest_is_default(self, monkeypatch):
+        monkeypatch.delenv(json_backends.ENV_BACKEND, raising=False)
+        assert json_backends.get_backend().name == json_backends.available()[0]
+
+    def test_env_selects_backend(self, monkeypatch):
+        monkeypatch.setenv(json_backends.ENV_BACKEND, "json")
+        assert json_backends.get_backend().name == "json"
+
+    @pytest.mark.parametrize("name", json_backends.available())
+    def test_malformed_input_raises_value_error(self, name):
+        with pytest.raises(ValueError):
+            json_backends.get_backend(name).loads(b'{"tool": ')
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            json_backends.get_backend("yaml")
+
+    @pytest.mark.parametrize("name", json_backends.available())
+    @pytest.mark.parametrize(
+        "text",
+        [
+            r'{"q": "\ud800"}',
+            '{"x": NaN, "y": -Infinity}',
+            '{"x": 1e400}',
+            '{"x": 0.1, "s": "99999999999999999999"}',
+        ],
+    )
+    def test_matches_stdlib(self, name, text):
+        loads = json_backends.get_backend(name).loads
+        expected = json.loads(text)
+        assert repr(loads(text)) == repr(expected)
+        assert repr(loads(memoryview(text.encode()))) == repr(expected)
+
+    def test_malformed_input_decoded_once(self):
+        calls = []
+
+        def fast_loads(data):
+            calls.append(data)
+            raise ValueError("unexpected character")
+
+        loads = json_backends._with_stdlib_fallback(fast_loads)
+        with pytest.raises(ValueError, match="unexpected character"):
+            loads(b'{"tool": calc}')
+        assert len(calls) == 1
+        assert loads(b"[NaN]")[0] != 0.0  # handed to the stdlib
+
+
+class TestJSONBackendParity:
+    def teardown_method(self):
+        ResponseParser.set_json_backend(None)
+
+    @pytest.mark.parametrize("backend", json_backends.available())
+    def test_lone_surrogate_still_a_plan(self, backend):
+        ResponseParser.set_json_backend(backend)
+        result = ResponseParser.parse_response(
+            r'{"tool": "kb", "args": {"q": "\ud800"}}'
+        )
+        assert isinstance(result, ToolPlan)
+        assert result.args == {"q": "\ud800"}
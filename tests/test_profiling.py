@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from agent import profiling
+from agent.agent import Agent
+from agent.profiling import Profiler
+from agent.schemas import ToolPlan, ToolType
+
+
+def _slow_weather_agent(profiler):
+    agent = Agent(use_fake_llm=True, profiler=profiler)
+    plan = ToolPlan(tool=ToolType.WEATHER, args={"city": "paris"})
+    agent.llm_service.call_llm = lambda q: plan
+
+    def slow_temperature(city):
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+        return 18.0
+
+    agent.tool_registry.get_tool("weather")._get_temperature = slow_temperature
+    return agent
+
+
+class TestProfiler:
+    def test_sampler_attributes_stages_and_tools(self, tmp_path):
+        profiler = Profiler(mode="sample", interval=0.001)
+        agent = _slow_weather_agent(profiler)
+        try:
+            assert agent.answer("Weather in Paris") == "18.0°C"
+        finally:
+            profiler.close()
+
+        lines = profiler.collapsed()
+        assert any(
+            line.startswith("request;tool;tool:weather;") and "slow_temperature" in line
+            for line in lines
+        )
+        assert profiler.stage_seconds["tool:weather"] >= 0.05
+
+        profiler.write(str(tmp_path / "prof"))
+        assert (tmp_path / "prof.collapsed").read_text().strip()
+        assert "Stage wall time" in (tmp_path / "prof.txt").read_text()
+
+    def test_cprofile_mode_summary(self):
+        profiler = Profiler(mode="cprofile")
+        agent = _slow_weather_agent(profiler)
+        agent.answer("Weather in Paris")
+        summary = profiler.summary(top=5)
+        assert "Profiled 1 of 1 requests" in summary
+        assert "Top 5 functions" in summary
+        assert profiler.collapsed()
+
+    def test_one_in_n_sampling(self):
+        profiler = Profiler(mode="cprofile", every=3)
+        agent = Agent(use_fake_llm=True, profiler=profiler)
+        for _ in range(7):
+            agent.answer("What is 1 + 1?")
+        assert profiler.requests == 7
+        assert profiler.profiled == 3
+
+    def test_from_env(self):
+        assert Profiler.from_env({}) is None
+        assert Profiler.from_env({"AGENT_PROFILE": "off"}) is None
+        profiler = Profiler.from_env(
+            {"AGENT_PROFILE": "1", "AGENT_PROFILE_EVERY": "10"}
+        )
+        assert profiler.mode == "sample"
+        assert profiler.every == 10
+
+    def test_invalid_config(self):
+        with pytest.raises(ValueError):
+            Profiler(mode="perf")
+        with pytest.raises(ValueError):
+            Profiler(every=0)
+
+    def test_helpers_are_noops_outside_profiled_requests(self):
+        fn = len
+        assert profiling.bind(fn, "tool:x") is fn
+        with profiling.stage("llm"):
+            pass
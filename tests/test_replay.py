@@ -0,0 +1,154 @@
+import json
+import time
+
+import pytest
+
+import main
+from agent.agent import Agent
+from agent.replay import (
+    Replayer,
+    TraceRecorder,
+    decode_response,
+    encode_response,
+    format_replay_report,
+    load_trace,
+)
+from agent.schemas import ToolPlan
+
+RESPONSES = [
+    '{"tool": "calc", "args": {"expr": "2+2"}}',
+    ToolPlan(tool="weather", args={"city": "paris"}),
+    "The answer is 42.",
+    b'{"tool": "calc", "args": {"expr": "3*3"}}',
+    None,
+]
+
+
+class TestResponseEncoding:
+    @pytest.mark.parametrize("response", RESPONSES + [{"tool": "calc", "args": {}}])
+    def test_round_trip(self, response):
+        encoded = json.loads(json.dumps(encode_response(response)))
+        assert decode_response(encoded) == response
+
+
+class TestRecordReplay:
+    def setup_method(self):
+        self.recorder = None
+
+    def teardown_method(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def record(self, tmp_path):
+        path = str(tmp_path / "trace.jsonl")
+        self.recorder = TraceRecorder(path)
+        agent = Agent(use_fake_llm=True, recorder=self.recorder)
+        responses = iter(RESPONSES)
+        agent.llm_service.call_llm = lambda prompt, timeout=None: next(responses)
+        answers = [agent.answer(f"question {i}") for i in range(len(RESPONSES))]
+        self.recorder.close()
+        return path, answers
+
+    def test_records_pipeline(self, tmp_path):
+        path, answers = self.record(tmp_path)
+        trace = load_trace(path)
+        assert trace.header["format"] == "agent-trace"
+        assert len(trace.records) == 5
+        first = trace.records[0]
+        assert first["question"] == "question 0"
+        assert first["path"] == "json"
+        assert first["plan"] == {"tool": "calc", "args": {"expr": "2+2"}}
+        assert first["tool_result"]["result"] == 4.0
+        assert first["answer"] == answers[0] == "4.0"
+        assert first["outcome"] == "ok"
+        assert set(first["stages_ms"]) >= {"llm", "parse", "tool", "format"}
+        assert trace.records[2]["plan"] is None
+        assert trace.records[4]["outcome"] == "no_response"
+
+    def test_replay_matches(self, tmp_path):
+        path, _ = self.record(tmp_path)
+        report = Replayer(Agent(use_fake_llm=True), load_trace(path)).run()
+        assert report["replayed"] == 4
+        assert report["skipped"] == 1
+        assert report["matched"] == 4
+        assert report["mismatched"] == report["plan_changes"] == report["errors"] == 0
+        assert report["stages_ms"]["tool"]["replayed"]["p50"] > 0.0
+        assert "4 matched" in format_replay_report(report)
+
+    def test_replay_detects_tool_change(self, tmp_path):
+        path, _ = self.record(tmp_path)
+        agent = Agent(use_fake_llm=True)
+        calc = agent.tool_registry.get_tool("calc")
+        calc.run = lambda args: 5.0
+        report = Replayer(agent, load_trace(path), concurrency=4).run()
+        assert report["mismatched"] == 2
+        mismatch = report["mismatches"][0]
+        assert (mismatch["recorded"], mismatch["replayed"]) == ("4.0", "5.0")
+
+    def test_replay_detects_parser_change(self, tmp_path, monkeypatch):
+        path, _ = self.record(tmp_path)
+        agent = Agent(use_fake_llm=True)
+        monkeypatch.setattr(
+            agent.parser, "parse_response", lambda response, backend=None: None
+        )
+        report = Replayer(agent, load_trace(path)).run()
+        assert report["plan_changes"] == 3
+        assert report["matched"] == 0
+
+    def test_original_pacing(self, tmp_path):
+        path = str(tmp_path / "trace.jsonl")
+        recorder = TraceRecorder(path)
+        agent = Agent(use_fake_llm=True, recorder=recorder)
+        agent.llm_service.call_llm = lambda prompt, timeout=None: "hi"
+        agent.answer("a")
+        time.sleep(0.2)
+        agent.answer("b")
+        recorder.close()
+
+        trace = load_trace(path)
+        started = time.perf_counter()
+        report = Replayer(agent, trace, pacing="original", speed=2.0).run()
+        assert time.perf_counter() - started >= 0.09
+        assert report["matched"] == 2
+
+    def test_appends_to_existing_trace(self, tmp_path):
+        path, _ = self.record(tmp_path)
+        recorder = TraceRecorder(path)
+        agent = Agent(use_fake_llm=True, recorder=recorder)
+        agent.llm_service.call_llm = lambda prompt, timeout=None: "hi"
+        agent.answer("again")
+        recorder.close()
+        assert len(load_trace(path).records) == 6
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "other.jsonl"
+        path.write_text('{"hello": 1}\n')
+        with pytest.raises(ValueError):
+            load_trace(str(path))
+        with pytest.raises(ValueError):
+            Replayer(
+                Agent(use_fake_llm=True),
+                load_trace(self.record(tmp_path)[0]),
+                pacing="slow",
+            )
+
+
+class TestReplayCommand:
+    def test_strict_exit_status(self, tmp_path, capsys):
+        path = str(tmp_path / "trace.jsonl")
+        recorder = TraceRecorder(path)
+        agent = Agent(use_fake_llm=True, recorder=recorder)
+        agent.llm_service.call_llm = lambda prompt, timeout=None: "hi"
+        agent.answer("a")
+        recorder.close()
+
+        main.replay([path, "--strict"])
+        assert "1 matched" in capsys.readouterr().out
+
+        lines = open(path).read().splitlines()
+        record = json.loads(lines[1])
+        record["answer"] = "something else"
+        with open(path, "w") as f:
+            f.write("\n".join([lines[0], json.dumps(record)]) + "\n")
+        with pytest.raises(SystemExit):
+            main.replay([path, "--strict"])
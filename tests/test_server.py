@@ -0,0 +1,154 @@
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from agent.admission import AdmissionConfig, AdmissionController
+from agent.agent import Agent
+from agent.schemas import ToolPlan, ToolType
+from agent.server import AgentHTTPServer, create_listener
+
+
+def _get(url):
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+def _post(url, body):
+    req = urllib.request.Request(url, data=body, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+class TestAgentHTTPServer:
+    def setup_method(self):
+        self.agent = Agent(use_fake_llm=True)
+        plan = ToolPlan(tool=ToolType.WEATHER, args={"city": "london"})
+        self.agent.llm_service.call_llm = lambda q, timeout=None: plan
+        self.server = AgentHTTPServer(create_listener("127.0.0.1", 0), self.agent)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.server.socket.getsockname()[:2]
+        self.base = f"http://{host}:{port}"
+
+    def teardown_method(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_answer(self):
+        body = json.dumps({"question": "Weather in London"}).encode()
+        assert _post(f"{self.base}/answer", body) == (
+            200,
+            {"answer": "17.0°C", "outcome": "ok"},
+        )
+
+    def test_bad_requests(self):
+        assert _post(f"{self.base}/answer", b"not json")[0] == 400
+        assert _post(f"{self.base}/answer", b'{"question": 1}')[0] == 400
+        assert _post(f"{self.base}/other", b"{}")[0] == 404
+        assert (
+            _post(f"{self.base}/answer", b'{"question": "x", "priority": "?"}')[0]
+            == 400
+        )
+        assert (
+            _post(f"{self.base}/answer", b'{"question": "x", "timeout": 0}')[0] == 400
+        )
+        assert (
+            _post(f"{self.base}/answer", b'{"question": "x", "timeout": true}')[0]
+            == 400
+        )
+
+    def test_bad_content_length(self):
+        conn = http.client.HTTPConnection(*self.server.socket.getsockname()[:2])
+        try:
+            conn.putrequest("POST", "/answer")
+            conn.putheader("Content-Length", "abc")
+            conn.endheaders()
+            resp = conn.getresponse()
+            assert resp.status == 400
+            assert json.loads(resp.read()) == {"error": "Invalid request body"}
+        finally:
+            conn.close()
+
+    def test_shed_requests_get_503(self):
+        self.server.admission = AdmissionController(
+            AdmissionConfig(max_concurrent=1, max_queue=0)
+        )
+        release = threading.Event()
+        self.agent.llm_service.call_llm = (
+            lambda q, timeout=None: release.wait(5) and None
+        )
+        first = threading.Thread(
+            target=_post, args=(f"{self.base}/answer", b'{"question": "x"}')
+        )
+        first.start()
+        deadline = time.monotonic() + 2
+        while self.server.admission.stats()["active"] == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+
+        status, body = _post(f"{self.base}/answer", b'{"question": "y"}')
+        release.set()
+        first.join(5)
+        assert status == 503
+        assert body["reason"] == "queue_full"
+
+    def test_health_and_metrics(self):
+        status, body = _get(f"{self.base}/healthz")
+        assert status == 200
+        assert body["pid"] == os.getpid()
+        _post(f"{self.base}/answer", b'{"question": "x"}')
+        status, metrics = _get(f"{self.base}/metrics")
+        assert metrics["tools"]["weather"]["calls"] == 1
+        assert metrics["admission"]["completed"] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_prefork_workers_share_socket_and_restart():
+    proc = subprocess.Popen(
+        [sys.executable, "main.py", "serve", "--port", "0", "--workers", "2"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        line = proc.stdout.readline()
+        port = int(re.search(r":(\d+) ", line).group(1))
+        url = f"http://127.0.0.1:{port}/healthz"
+
+        def worker_pids(timeout=10.0):
+            pids = set()
+            deadline = time.time() + timeout
+            while len(pids) < 2 and time.time() < deadline:
+                try:
+                    pids.add(_get(url)[1]["pid"])
+                except OSError:
+                    time.sleep(0.05)
+            return pids
+
+        pids = worker_pids()
+        assert len(pids) == 2
+        assert proc.pid not in pids
+
+        victim = pids.pop()
+        os.kill(victim, signal.SIGKILL)
+        time.sleep(1.5)  # restart backoff for short-lived workers
+        new_pids = worker_pids()
+        assert victim not in new_pids
+        assert len(new_pids) == 2
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    assert proc.returncode == 0
@@ -0,0 +1,127 @@
+import pytest
+
+from agent.agent import Agent
+from agent.llm import LLMService, ResponseProfile
+from agent.sessions import Prompt, PromptPrefixCache, SessionStore
+
+
+class TestSessionStore:
+    @pytest.fixture(autouse=True)
+    def setup(self, clock):
+        self.clock = clock
+        self.store = SessionStore(max_sessions=3, idle_ttl=60, clock=self.clock)
+
+    def test_unknown_session_has_empty_history(self):
+        prompt = self.store.build_prompt("new", "hi", "PREFIX\n")
+        assert prompt == Prompt("PREFIX\n", "", "hi")
+        assert len(self.store) == 0
+
+    def test_history_contains_previous_turns(self):
+        self.store.record("s", "What is 2 + 2?", "4.0")
+        prompt = self.store.build_prompt("s", "and times 3?", "")
+        assert "User: What is 2 + 2?\nAssistant: 4.0\n" in prompt.history
+        assert prompt.last_question == "What is 2 + 2?"
+        assert prompt.render().endswith("User: and times 3?\nAssistant:")
+
+    def test_history_is_cached_until_next_turn(self):
+        self.store.record("s", "q1", "a1")
+        first = self.store.build_prompt("s", "q2", "").history
+        assert self.store.build_prompt("s", "q2", "").history is first
+        self.store.record("s", "q2", "a2")
+        assert "q2" in self.store.build_prompt("s", "q3", "").history
+
+    def test_lru_eviction(self):
+        for sid in ("a", "b", "c"):
+            self.store.record(sid, "q", "a")
+        self.store.build_prompt("a", "q", "")  # touch a
+        self.store.record("d", "q", "a")
+        assert self.store.build_prompt("b", "q", "").history == ""
+        assert self.store.build_prompt("a", "q", "").history != ""
+        assert self.store.stats()["evicted_lru"] == 1
+
+    def test_byte_bound(self):
+        store = SessionStore(max_bytes=2000, clock=self.clock)
+        for i in range(20):
+            store.record(f"s{i}", "q" * 100, "a" * 100)
+        stats = store.stats()
+        assert stats["bytes"] <= 2000
+        assert 0 < stats["sessions"] < 20
+
+    def test_idle_sessions_expire(self):
+        self.store.record("s", "q", "a")
+        self.clock.now = 61
+        assert self.store.build_prompt("s", "q", "").history == ""
+        assert self.store.stats()["evicted_idle"] == 1
+
+    def test_sweep(self):
+        self.store.record("a", "q", "a")
+        self.clock.now = 30
+        self.store.record("b", "q", "a")
+        self.clock.now = 70
+        assert self.store.sweep() == 1
+        assert len(self.store) == 1
+
+    def test_old_turns_are_summarized(self):
+        store = SessionStore(max_turns=2, clock=self.clock)
+        for i in range(5):
+            store.record("s", f"question {i}", f"answer {i}")
+        history = store.build_prompt("s", "next", "").history
+        assert "Earlier in this conversation:" in history
+        assert "- question 0 -> answer 0" in history
+        assert "User: question 4" in history
+        assert "User: question 2\n" not in history
+        assert store.stats()["summarized_turns"] == 3
+
+    def test_summary_is_capped(self):
+        store = SessionStore(max_turns=1, summary_tokens=20, clock=self.clock)
+        for i in range(50):
+            store.record("s", f"question {i}", f"answer {i}")
+        history = store.build_prompt("s", "next", "").history
+        assert "question 0 " not in history
+        assert "question 48" in history
+
+    def test_drop_releases_bytes(self):
+        self.store.record("s", "q", "a")
+        self.store.drop("s")
+        assert self.store.stats()["bytes"] == 0
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            SessionStore(max_sessions=0)
+
+
+class TestPromptPrefixCache:
+    def test_renders_once_per_catalog(self):
+        agent = Agent(use_fake_llm=True)
+        cache = PromptPrefixCache(agent.tool_registry.catalog_json)
+        first = cache.get()
+        assert cache.get() is first
+        assert cache.renders == 1
+        assert '"name":"calc"' in first
+
+        agent.tool_registry.register_tool(agent.tool_registry.get_tool("weather"))
+        cache.get()
+        assert cache.renders == 2
+
+
+class TestAgentSessions:
+    def setup_method(self):
+        self.agent = Agent(use_fake_llm=True)
+        self.agent.llm_service = LLMService(
+            seed=1,
+            profile=ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0),
+        )
+
+    def test_follow_up_uses_previous_turn(self):
+        assert self.agent.answer("Weather in Paris", session_id="s") == "18.0°C"
+        assert self.agent.answer("and in London?", session_id="s") == "17.0°C"
+
+    def test_without_session_nothing_is_recorded(self):
+        self.agent.answer("Weather in Paris")
+        assert self.agent.metrics()["sessions"]["sessions"] == 0
+
+    def test_metrics_include_sessions(self):
+        self.agent.answer("Weather in Paris", session_id="s")
+        stats = self.agent.metrics()["sessions"]
+        assert stats["sessions"] == 1
+        assert stats["bytes"] > 0
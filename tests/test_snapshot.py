@@ -0,0 +1,185 @@
+import json
+import os
+
+import pytest
+
+from agent.agent import Agent
+from agent.snapshot import (
+    Snapshot,
+    SnapshotError,
+    build,
+    encode_entries,
+    encode_map,
+    load_or_build,
+)
+from agent.tool_registry import ToolRegistry
+from agent.tools import KnowledgeBaseTool, TranslatorTool, WeatherTool
+
+
+class TestSnapshotFile:
+    def setup_method(self):
+        self.sections = {
+            "map": encode_map([(b"b", b"2"), (b"a", b"1"), (b"c", b"3")]),
+            "entries": encode_entries(
+                [("ada lovelace", "mathematician"), ("alan turing", "computing")]
+            ),
+        }
+
+    def test_lookups(self, tmp_path):
+        path = str(tmp_path / "s.snapshot")
+        build(self.sections, [], path)
+        snapshot = Snapshot(path, verify=True)
+
+        table = snapshot.map("map", decode_value=int)
+        assert dict(table) == {"a": 1, "b": 2, "c": 3}
+        assert table.get("b") == 2
+        assert table.get("zz") is None
+        assert "c" in table
+
+        entries = snapshot.entries("entries")
+        assert len(entries) == 2
+        assert entries[0] == ("ada lovelace", "mathematician")
+        assert list(entries)[1] == ("alan turing", "computing")
+        with pytest.raises(IndexError):
+            entries[2]
+        assert snapshot.map("missing") is None
+
+    def test_rejects_bad_files(self, tmp_path):
+        path = tmp_path / "s.snapshot"
+        with pytest.raises(SnapshotError):
+            Snapshot(str(path))
+        path.write_bytes(b"not a snapshot at all, just some bytes")
+        with pytest.raises(SnapshotError):
+            Snapshot(str(path))
+
+    def test_checksums(self, tmp_path):
+        path = tmp_path / "s.snapshot"
+        build(self.sections, [], str(path))
+        data = bytearray(path.read_bytes())
+
+        data[-1] ^= 0xFF  # in the last section, "map"
+        path.write_bytes(bytes(data))
+        snapshot = Snapshot(str(path))  # sections are checked on first read
+        assert snapshot.entries("entries")[0][0] == "ada lovelace"
+        with pytest.raises(SnapshotError, match="'map' checksum"):
+            snapshot.map("map")["a"]
+        snapshot.close()
+        with pytest.raises(SnapshotError, match="'map' checksum"):
+            Snapshot(str(path), verify=True)
+
+        data[40] ^= 0xFF
+        path.write_bytes(bytes(data))
+        with pytest.raises(SnapshotError, match="index"):
+            Snapshot(str(path))
+
+    def test_rebuilt_when_source_changes(self, tmp_path):
+        source = tmp_path / "source.json"
+        source.write_text("1")
+        path = str(tmp_path / "s.snapshot")
+        builds = []
+
+        def sections():
+            builds.append(source.read_text())
+            return {"map": encode_map([(b"v", source.read_text().encode())])}
+
+        assert load_or_build(sections, [str(source)], path).map("map")["v"] == "1"
+        load_or_build(sections, [str(source)], path)
+        assert builds == ["1"]
+
+        source.write_text("22")
+        assert load_or_build(sections, [str(source)], path).map("map")["v"] == "22"
+        assert builds == ["1", "22"]
+
+        # A different source list is also a change
+        load_or_build(sections, [], path)
+        assert len(builds) == 3
+
+    def test_corrupt_section_is_not_served(self, tmp_path):
+        path = tmp_path / "s.snapshot"
+        builds = []
+
+        def sections():
+            builds.append(1)
+            return self.sections
+
+        load_or_build(sections, [], str(path)).close()
+        data = bytearray(path.read_bytes())
+        data[-1] ^= 0xFF
+        path.write_bytes(bytes(data))
+
+        # Loading reads only the header and index
+        snapshot = load_or_build(sections, [], str(path))
+        assert len(builds) == 1
+        table = snapshot.map("map")
+        for _ in range(2):
+            with pytest.raises(SnapshotError):
+                table.get("a")
+        assert list(snapshot.entries("entries"))[1][0] == "alan turing"
+
+
+class TestToolSnapshot:
+    def test_tools_serve_from_snapshot(self, tmp_path):
+        path = str(tmp_path / "tools.snapshot")
+        ToolRegistry().load_snapshot(path)
+        registry = ToolRegistry()
+        snapshot = registry.load_snapshot(path)
+        assert set(snapshot.sections) == {
+            "kb",
+            "kb_keys",
+            "kb_trigrams",
+            "translator",
+            "weather",
+        }
+
+        weather = registry.get_tool("weather")
+        assert weather.execute({"city": "Dhaka"}).result == 31.0
+        assert weather.execute({"city": "nowhere"}).result == 20.0
+        translator = registry.get_tool("translator")
+        args = {"text": "thank you", "target_language": "french"}
+        assert translator.execute(args).result == "merci"
+        assert (
+            "not available"
+            in translator.execute({"text": "cat", "target_language": "french"}).result
+        )
+        kb = registry.get_tool("kb")
+        assert "mathematician" in kb.execute({"q": "Ada Lovelace"}).result
+        assert kb.execute({"q": "nobody"}).result == "No entry found."
+        assert kb.search("lovelace, ada").score == 1.0
+        assert kb.search("alan turnig").name == "alan turing"
+        assert kb._entries is None  # kb.json was never parsed
+
+    def test_snapshot_matches_in_memory_tables(self, tmp_path):
+        registry = ToolRegistry()
+        snapshot = registry.load_snapshot(str(tmp_path / "tools.snapshot"))
+        assert dict(snapshot.map("weather", decode_value=float)) == WeatherTool._TEMPS
+        assert dict(registry.get_tool("translator")._translations) == (
+            TranslatorTool._TRANSLATIONS
+        )
+        with open("data/kb.json") as f:
+            names = [e["name"].lower() for e in json.load(f)["entries"]]
+        assert [name for name, _ in snapshot.entries("kb")] == names
+
+    def test_kb_change_triggers_rebuild(self, tmp_path):
+        kb_path = tmp_path / "kb.json"
+        kb_path.write_text(
+            json.dumps({"entries": [{"name": "Grace Hopper", "summary": "admiral"}]})
+        )
+        path = str(tmp_path / "tools.snapshot")
+        registry = ToolRegistry()
+        registry.register_tool(KnowledgeBaseTool(str(kb_path)))
+        registry.load_snapshot(path)
+        assert registry.get_tool("kb").execute({"q": "grace"}).result == "admiral"
+
+        kb_path.write_text(
+            json.dumps({"entries": [{"name": "Grace Hopper", "summary": "COBOL"}]})
+        )
+        os.utime(kb_path, ns=(0, 0))
+        registry = ToolRegistry()
+        registry.register_tool(KnowledgeBaseTool(str(kb_path)))
+        registry.load_snapshot(path)
+        assert registry.get_tool("kb").execute({"q": "grace"}).result == "COBOL"
+
+    def test_agent_metrics(self, tmp_path):
+        agent = Agent(use_fake_llm=True, snapshot_path=str(tmp_path / "t.snapshot"))
+        assert agent.metrics()["snapshot"]["bytes"] > 0
+        assert "snapshot" not in Agent(use_fake_llm=True).metrics()
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from agent.agent import Agent
+from agent.bulkhead import BulkheadConfig
+from agent.latency import FixedLatency
+from agent.llm import LLMService, ResponseProfile
+from agent.speculation import Speculator, ToolPredictor
+from agent.tool_registry import ToolRegistry
+from agent.tools.args import ArgSpec
+from agent.tools.base import BaseTool
+
+TOOL_PLANS = ResponseProfile(tool_plan=1, malformed=0, structured=0, direct=0)
+DIRECT = ResponseProfile(tool_plan=0, malformed=0, structured=0, direct=1)
+
+
+class SlowWeatherTool(BaseTool):
+    args_schema = (ArgSpec(name="city", lower=True, strip=True),)
+    idempotent = True
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+
+    @property
+    def name(self):
+        return "weather"
+
+    def run(self, args):
+        self.calls += 1
+        time.sleep(self.delay)
+        return 21.0
+
+
+class TestToolPredictor:
+    def setup_method(self):
+        self.predictor = ToolPredictor()
+
+    @pytest.mark.parametrize(
+        "question,expected",
+        [
+            ("What's the weather in Paris?", ("weather", {"city": "paris"})),
+            ("Temperature in New York", ("weather", {"city": "new york"})),
+            ("Who is Ada Lovelace?", ("kb", {"q": "ada lovelace"})),
+            (
+                "Translate thank you to French",
+                ("translator", {"text": "thank you", "target_language": "french"}),
+            ),
+            ("What is 2 + 2?", None),
+            ("How is the weather?", None),
+        ],
+    )
+    def test_predictions(self, question, expected):
+        assert self.predictor.predict(question) == expected
+
+    def test_long_input_is_cheap(self):
+        start = time.perf_counter()
+        self.predictor.predict("weather in " + "a" * 200_000)
+        assert time.perf_counter() - start < 0.5
+
+
+class TestSpeculator:
+    def setup_method(self):
+        self.registry = ToolRegistry()
+        self.speculator = Speculator(self.registry)
+
+    def test_hit_uses_prefetched_result(self):
+        speculation = self.speculator.start("Weather in London?")
+        result = speculation.resolve("weather", {"city": " London "})
+        assert result.success and result.result == 17.0
+        stats = self.speculator.stats()
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == 1.0
+
+    def test_mismatch_is_discarded(self):
+        speculation = self.speculator.start("Weather in London?")
+        assert speculation.resolve("weather", {"city": "paris"}) is None
+        assert speculation.resolve("weather", {"city": "london"}) is None
+        stats = self.speculator.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 0
+
+    def test_discard_counts_wasted_work(self):
+        tool = SlowWeatherTool(delay=0.02)
+        self.registry.register_tool(tool)
+        speculation = self.speculator.start("Weather in Paris")
+        time.sleep(0.005)  # let the prefetch start
+        speculation.discard()
+        speculation.future.result(1)
+        stats = self.speculator.stats()
+        assert stats["wasted_calls"] == 1
+        assert stats["wasted_ms"] > 0
+
+    def test_wasted_work_excludes_llm_wait(self):
+        tool = SlowWeatherTool(delay=0.02)
+        self.registry.register_tool(tool)
+        speculation = self.speculator.start("Weather in Paris")
+        speculation.future.result(1)
+        time.sleep(0.2)  # the LLM call the prefetch overlapped
+        speculation.discard()
+        wasted = self.speculator.stats()["wasted_ms"]
+        assert 15 <= wasted < 150
+
+    def test_no_prediction(self):
+        assert self.speculator.start("What is 2 + 2?") is None
+        assert self.speculator.stats()["predicted"] == 0
+
+    def test_non_idempotent_tools_are_not_prefetched(self):
+        tool = SlowWeatherTool(delay=0)
+        tool.idempotent = False
+        self.registry.register_tool(tool)
+        assert self.speculator.start("Weather in Paris") is None
+        assert tool.calls == 0
+
+    def test_prefetch_never_queues_behind_real_calls(self):
+        tool = SlowWeatherTool(delay=0.2)
+        self.registry.register_tool(tool)
+        self.registry.configure_bulkhead(
+            "weather", BulkheadConfig(max_concurrent=1, max_queue=4)
+        )
+        busy = threading.Thread(
+            target=self.registry.execute, args=(tool, {"city": "paris"})
+        )
+        busy.start()
+        time.sleep(0.02)
+        # The queue has room, but a prefetch only takes a free worker slot
+        assert self.speculator.start("Weather in Paris") is None
+        stats = self.registry.bulkhead_stats()["weather"]
+        assert (stats["in_flight"], stats["rejected"]) == (1, 0)
+        busy.join()
+
+
+class TestAgentSpeculation:
+    def test_tool_overlaps_llm_call(self):
+        agent = Agent(use_fake_llm=True, speculate=True)
+        agent.llm_service = LLMService(profile=TOOL_PLANS, latency=FixedLatency(0.1))
+        agent.tool_registry.register_tool(SlowWeatherTool(delay=0.1))
+        agent.answer("Weather in Paris")  # warm the bulkhead threads
+
+        start = time.perf_counter()
+        assert agent.answer("Weather in Paris") == "21.0°C"
+        assert time.perf_counter() - start < 0.18
+        stats = agent.metrics()["speculation"]
+        assert stats["hits"] == 2
+
+    def test_direct_answer_discards_prefetch(self):
+        agent = Agent(use_fake_llm=True, speculate=True)
+        agent.llm_service = LLMService(profile=DIRECT)
+        answer = agent.answer("Who is Ada Lovelace?")
+        assert "mathematician" in answer
+        stats = agent.metrics()["speculation"]
+        assert stats["misses"] == 1
+        assert stats["wasted_calls"] + stats["cancelled"] == 1
+
+    def test_disabled_by_default(self):
+        assert "speculation" not in Agent(use_fake_llm=True).metrics()
@@ -0,0 +1,289 @@
+import json
+import os
+import struct
+import sys
+import time
+
+import pytest
+
+import main
+from agent import profiling, telemetry
+from agent.agent import Agent
+from agent.parser import ResponseParser
+from agent.schemas import ToolPlan
+from agent.telemetry import (
+    TelemetryConfig,
+    TelemetryLog,
+    TelemetryReader,
+    format_summary,
+    list_files,
+    question_hash,
+)
+
+STAGES = {"llm": 0.002, "tool": 0.001}
+
+
+class TestTelemetryLog:
+    def setup_method(self):
+        self.log = None
+
+    def teardown_method(self):
+        if self.log is not None:
+            self.log.close()
+
+    def make_log(self, tmp_path, **kwargs):
+        self.log = TelemetryLog(TelemetryConfig(directory=str(tmp_path), **kwargs))
+        return self.log
+
+    def test_records_round_trip(self, tmp_path):
+        log = self.make_log(tmp_path)
+        log.record("Weather?", 0.005, STAGES, "weather", "json", "ok", ts=100.0)
+        log.record("2+2", 0.001, {}, None, "cache", "cache_hit", ts=200.0)
+        log.flush()
+
+        records = list(TelemetryReader.from_directory(str(tmp_path)).records())
+        assert len(records) == 2
+        first = records[0]
+        assert first.ts == 100.0
+        assert first.qhash == question_hash("Weather?")
+        assert first.total_ms == pytest.approx(5.0)
+        assert first.llm_ms == pytest.approx(2.0)
+        assert first.cache_ms == 0.0
+        assert (first.tool, first.path, first.outcome) == ("weather", "json", "ok")
+        assert records[1].outcome == "cache_hit"
+
+        reader = TelemetryReader.from_directory(str(tmp_path))
+        assert [r.ts for r in reader.records(start=150.0)] == [200.0]
+        assert [r.ts for r in reader.records(end=150.0)] == [100.0]
+        assert log.stats()["written"] == 2
+
+    def test_rotation_and_pruning(self, tmp_path):
+        record_size = struct.calcsize("<dQ6fQ15sB")
+        log = self.make_log(tmp_path, max_file_bytes=16 + 3 * record_size, max_files=2)
+        for i in range(10):
+            log.record(f"q{i}", 0.001, {}, "calc", "json", "ok", ts=float(i))
+            log.flush()
+        files = list_files(str(tmp_path))
+        assert len(files) == 2
+        assert log.stats()["files"] == 4
+        # The newest files hold the newest records
+        records = list(TelemetryReader(files).records())
+        assert [r.ts for r in records] == [6.0, 7.0, 8.0, 9.0]
+
+    def test_prunes_files_of_exited_processes(self, tmp_path, monkeypatch):
+        header = struct.pack("<8sHHI", b"AGTELEM\0", 2, 64, 0)
+        for i, pid in enumerate([111, 111, 111, 222]):
+            path = tmp_path / f"telemetry-{i:020d}-{pid}.bin"
+            path.write_bytes(header)
+            (tmp_path / f"telemetry-{i:020d}-{pid}.names").write_text("")
+        monkeypatch.setattr(telemetry, "_is_alive", lambda pid: pid == 222)
+        log = self.make_log(tmp_path, max_files=2)
+        log.record("q", 0.001, {})
+        log.flush()
+        files = [f.rsplit("-", 1)[1] for f in list_files(str(tmp_path))]
+        # The newest two of the exited worker's files, the live worker's, ours
+        assert files == ["111.bin", "111.bin", "222.bin", f"{os.getpid()}.bin"]
+        assert len(list(tmp_path.glob("*.names"))) == 3
+
+    def test_long_non_ascii_tool_names(self, tmp_path):
+        log = self.make_log(tmp_path, max_file_bytes=16 + 2 * 64)
+        names = ["überwachung_" + "ä" * 20, "überwachung_" + "ä" * 20 + "ö"]
+        for i in range(4):
+            log.record("q", 0.001, {}, names[i % 2], "json_repair", "ok", ts=float(i))
+            log.flush()
+        # Each rotated file gets its own name table
+        assert len(list_files(str(tmp_path))) == 2
+        reader = TelemetryReader.from_directory(str(tmp_path))
+        records = list(reader.records())
+        assert [r.tool for r in records] == names * 2
+        assert records[0].path == "json_repair"
+        rows = reader.summarize(by=("tool",))
+        assert sorted(row["tool"] for row in rows) == sorted(names)
+
+    def test_full_queue_drops(self, tmp_path):
+        log = self.make_log(tmp_path, max_pending=2)
+        for _ in range(5):
+            log.record("q", 0.001, {})
+        assert log.stats()["dropped"] == 3
+        log.flush()
+        assert log.stats()["written"] == 2
+
+    def test_background_flush(self, tmp_path):
+        log = self.make_log(tmp_path, flush_interval=0.01)
+        log.record("q", 0.001, {})
+        deadline = time.monotonic() + 5.0
+        while log.stats()["written"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert log.stats()["written"] == 1
+
+    def test_torn_record_ignored(self, tmp_path):
+        log = self.make_log(tmp_path)
+        log.record("q", 0.001, {}, ts=1.0)
+        log.flush()
+        (path,) = list_files(str(tmp_path))
+        with open(path, "ab") as f:
+            f.write(b"\0" * 10)
+        assert len(list(TelemetryReader([path]).records())) == 1
+
+    def test_rejects_foreign_files(self, tmp_path):
+        path = tmp_path / "telemetry-00000000000000000001-1.bin"
+        path.write_bytes(b"not telemetry at all")
+        with pytest.raises(ValueError):
+            list(TelemetryReader([str(path)]).records())
+
+
+class TestSummary:
+    def write(self, tmp_path):
+        log = TelemetryLog(TelemetryConfig(directory=str(tmp_path)))
+        for i in range(1, 101):
+            log.record("q", i / 1000.0, {}, "weather", "json", "ok", ts=float(i))
+        log.record("q", 0.5, {}, "calc", "structured", "tool_error", ts=500.0)
+        log.close()
+        return TelemetryReader.from_directory(str(tmp_path))
+
+    def check(self, rows):
+        assert [row["tool"] for row in rows] == ["weather", "calc"]
+        weather = rows[0]
+        assert weather["count"] == 100
+        assert weather["p50"] == pytest.approx(50.5, abs=1.0)
+        assert weather["p99"] == pytest.approx(99.0, abs=1.0)
+        assert weather["max"] == pytest.approx(100.0)
+        assert rows[1]["path"] == "structured"
+
+    def test_python_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(telemetry, "np", None)
+        reader = self.write(tmp_path)
+        self.check(reader.summarize())
+        rows = reader.summarize(start=50.0, by=("outcome",))
+        assert {row["outcome"]: row["count"] for row in rows} == {
+            "ok": 51,
+            "tool_error": 1,
+        }
+        with pytest.raises(ImportError):
+            reader.dtype()
+
+    def test_numpy_path(self, tmp_path, monkeypatch):
+        pytest.importorskip("numpy")
+        reader = self.write(tmp_path)
+        self.check(reader.summarize())
+        # Grouped the same way as without NumPy
+        numpy = telemetry.np
+        for by in [("tool", "path"), ("outcome",), ("path", "tool", "outcome")]:
+            monkeypatch.setattr(telemetry, "np", None)
+            expected = reader.summarize(start=20.0, by=by)
+            monkeypatch.setattr(telemetry, "np", numpy)
+            assert reader.summarize(start=20.0, by=by) == expected
+        data = reader.array(start=50.0, end=60.0)
+        assert len(data) == 10
+        assert reader.tool_names()[int(data["tool_id"][0])] == "weather"
+
+    def test_format_summary(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(telemetry, "np", None)
+        rows = self.write(tmp_path).summarize()
+        text = format_summary(rows, ("tool", "path"))
+        lines = text.splitlines()
+        assert lines[0].split()[:3] == ["tool", "path", "count"]
+        assert lines[1].split()[:3] == ["weather", "json", "100"]
+
+
+class TestTelemetryCommand:
+    def test_prints_summary(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setattr(telemetry, "np", None)
+        log = TelemetryLog(TelemetryConfig(directory=str(tmp_path)))
+        log.record("q", 0.004, {}, "kb", "json", "ok")
+        log.record("q", 0.004, {}, "kb", "json", "ok", ts=time.time() - 3600)
+        log.close()
+
+        main.telemetry(["--dir", str(tmp_path), "--last", "15m", "--json"])
+        rows = json.loads(capsys.readouterr().out)
+        assert [(row["tool"], row["count"]) for row in rows] == [("kb", 1)]
+
+        main.telemetry(["--dir", str(tmp_path), "--by", "outcome"])
+        assert "ok" in capsys.readouterr().out
+
+    def test_parse_duration(self):
+        assert main.parse_duration("90") == 90.0
+        assert main.parse_duration("15m") == 900.0
+        assert main.parse_duration("2h") == 7200.0
+        with pytest.raises(Exception):
+            main.parse_duration("soon")
+
+    def test_bad_grouping(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        with pytest.raises(SystemExit):
+            main.telemetry(["--dir", str(tmp_path), "--by", "qhash"])
+
+
+class TestAgentTelemetry:
+    def setup_method(self):
+        self.agent = None
+
+    def teardown_method(self):
+        if self.agent is not None:
+            self.agent.telemetry.close()
+
+    def records(self, tmp_path):
+        self.agent.telemetry.flush()
+        return list(TelemetryReader.from_directory(str(tmp_path)).records())
+
+    def test_records_tool_path_and_stages(self, tmp_path):
+        self.agent = Agent(
+            use_fake_llm=True, telemetry=TelemetryConfig(directory=str(tmp_path))
+        )
+        self.agent.llm_service.call_llm = (
+            lambda prompt, timeout=None: '{"tool": "calc", "args": {"expr": "2+2"}}'
+        )
+        assert self.agent.answer("What is 2 + 2?") == "4.0"
+        (record,) = self.records(tmp_path)
+        assert (record.tool, record.path, record.outcome) == ("calc", "json", "ok")
+        assert record.total_ms > 0.0
+        assert record.total_ms >= record.llm_ms + record.tool_ms
+        assert self.agent.metrics()["telemetry"]["written"] == 1
+
+    def test_outcomes(self, tmp_path):
+        self.agent = Agent(
+            use_fake_llm=True, telemetry=TelemetryConfig(directory=str(tmp_path))
+        )
+        responses = iter(
+            [
+                None,
+                ToolPlan.model_construct(tool="nope", args={}),
+                ToolPlan(tool="calc", args={"expr": "1/0"}),
+                42,
+            ]
+        )
+        self.agent.llm_service.call_llm = lambda prompt, timeout=None: next(responses)
+        for _ in range(4):
+            self.agent.answer("question")
+        outcomes = [r.outcome for r in self.records(tmp_path)]
+        assert outcomes == ["no_response", "unknown_tool", "tool_error", "unparsed"]
+
+    def test_disabled_by_default(self):
+        agent = Agent(use_fake_llm=True)
+        assert agent.telemetry is None
+        assert "telemetry" not in agent.metrics()
+
+
+class TestParsePath:
+    def test_paths(self):
+        plan = ToolPlan(tool="calc", args={"expr": "1"})
+        assert ResponseParser.parse(plan).path == "plan"
+        assert ResponseParser.parse({"tool": "calc", "args": {}}).path == "dict"
+        json_text = '{"tool": "calc", "args": {"expr": "1+1"}}'
+        assert ResponseParser.parse(json_text).path == "json"
+        assert ResponseParser.parse('TOOL:calc EXPR="1+1"').path == "structured"
+        assert ResponseParser.parse("a direct answer") == ("a direct answer", "text")
+        assert ResponseParser.parse(42) == (None, "none")
+
+
+class TestStageTimings:
+    def test_collects_stage_durations(self):
+        with profiling.timings() as times:
+            with profiling.stage("llm"):
+                time.sleep(0.002)
+            with profiling.stage("llm"):
+                pass
+        assert times["llm"] >= 0.002
+        with profiling.stage("tool"):
+            pass
+        assert "tool" not in times
@@ -0,0 +1,204 @@
+import json
+import time
+
+import pytest
+
+import agent.tool_registry as registry_module
+from agent.agent import Agent
+from agent.parser import ResponseParser
+from agent.schemas import ToolPlan
+from agent.tool_index import ToolIndex, terms
+from agent.tool_registry import ToolRegistry
+from agent.tools.args import ArgSpec
+from agent.tools.base import BaseTool
+
+
+def make_tool(tool_name, description, keywords=(), arg="text"):
+    class GeneratedTool(BaseTool):
+        args_schema = (ArgSpec(name=arg),)
+
+        @property
+        def name(self):
+            return tool_name
+
+        def run(self, args):
+            return f"{tool_name}:{args[arg]}"
+
+    GeneratedTool.description = description
+    GeneratedTool.keywords = tuple(keywords)
+    return GeneratedTool()
+
+
+class TestToolIndex:
+    def setup_method(self):
+        self.index = ToolIndex()
+        self.index.add("weather", ["temperature"], "Current weather for a city")
+        self.index.add("stock_price", ["shares"], "Latest price of a stock ticker")
+        self.index.add("flight_status", [], "Status of a flight by number")
+
+    def test_terms(self):
+        assert terms("What's the price of 2 stocks?") == ["price", "2", "stock"]
+        assert terms("10 + 5%") == ["10", "+", "5", "%"]
+
+    def test_ranks_by_relevance(self):
+        assert self.index.search("Stock price of ACME", 2)[0][0] == "stock_price"
+        assert [n for n, _ in self.index.search("temperature in Paris", 3)] == [
+            "weather"
+        ]
+        assert self.index.search("nothing relevant", 3) == []
+
+    def test_name_outweighs_description(self):
+        self.index.add("city_guide", [], "Things to see in a weather-beaten city")
+        assert self.index.search("weather", 1)[0][0] == "weather"
+
+    def test_reindex_and_remove(self):
+        self.index.add("weather", [], "Rainfall totals")
+        assert self.index.search("temperature", 1) == []
+        self.index.remove("flight_status")
+        assert self.index.search("flight", 1) == []
+        assert len(self.index) == 2
+
+    def test_update_publishes_new_state(self):
+        before = self.index._state
+        postings = dict(before.postings["weather"])
+        self.index.update(
+            add=[("weather", [], "Rainfall totals"), ("radar", [], "Weather radar")],
+            remove=["stock_price"],
+        )
+        # A search already holding the old state still sees it unchanged
+        assert before.postings["weather"] == postings
+        assert "stock_price" in before.terms
+        assert [n for n, _ in self.index.search("weather radar", 3)] == [
+            "radar",
+            "weather",
+        ]
+        assert self.index.search("shares", 1) == []
+
+
+class TestIndexedCatalog:
+    def setup_method(self):
+        self.registry = ToolRegistry(catalog_top_k=3)
+
+    def test_small_catalog_is_listed_in_full(self):
+        registry = ToolRegistry()
+        assert registry.catalog_json("weather in paris") is registry.catalog_json()
+
+    def test_large_catalog_lists_top_k(self):
+        for i in range(200):
+            self.registry.register_tool(
+                make_tool(f"tool_{i}", f"Generic helper number {i}", ["widget"])
+            )
+        self.registry.register_tool(
+            make_tool("stock_price", "Latest price of a stock", ["shares"], "ticker")
+        )
+        catalog = self.registry.catalog_json("What's the stock price of ACME?")
+        names = [entry["name"] for entry in json.loads(catalog)]
+        assert names[0] == "stock_price"
+        assert len(names) <= 3
+        assert catalog is self.registry.catalog_json("stock price for ACME")
+
+        full = json.loads(self.registry.catalog_json())
+        assert len(full) == 205
+
+    def test_builtin_tools_selected(self):
+        select = self.registry.select_tools
+        assert select("Weather in Paris")[0] == "weather"
+        assert select("Translate hello to Spanish")[0] == "translator"
+        assert select("What is 2 + 3?")[0] == "calc"
+        assert select("Who is Ada Lovelace?")[0] == "kb"
+
+    def test_selection_cost_stays_flat(self):
+        for i in range(3000):
+            self.registry.register_tool(
+                make_tool(f"tool_{i}", f"Helper {i} for topic{i % 500}")
+            )
+        start = time.perf_counter()
+        for _ in range(200):
+            self.registry.catalog_json("temperature in paris")
+        assert time.perf_counter() - start < 0.5
+
+    def test_invalid_top_k(self):
+        with pytest.raises(ValueError):
+            ToolRegistry(catalog_top_k=0)
+
+
+class TestOpenToolIdentity:
+    def test_registered_tools_can_be_planned(self):
+        registry = ToolRegistry()
+        registry.register_tool(make_tool("stock_quote", "Stock quotes"))
+        plan = ResponseParser.parse_response(
+            '{"tool": "stock_quote", "args": {"text": "acme"}}', tools=registry
+        )
+        assert plan == ToolPlan.model_validate(
+            {"tool": "stock_quote", "args": {"text": "acme"}},
+            context={"tools": registry},
+        )
+        structured = ResponseParser.parse_response(
+            'TOOL:stock_quote TEXT="acme"', tools=registry
+        )
+        assert structured.tool == "stock_quote"
+
+    def test_names_are_scoped_to_their_registry(self):
+        registry = ToolRegistry()
+        registry.register_tool(make_tool("stock_quote", "Stock quotes"))
+        response = '{"tool": "stock_quote", "args": {"text": "acme"}}'
+        # Neither another registry nor the built-in default knows it
+        assert ResponseParser.parse_response(response, tools=ToolRegistry()) == (
+            response
+        )
+        assert ResponseParser.parse_response(response) == response
+
+        assert registry.unregister_tool("stock_quote")
+        assert "stock_quote" not in registry
+        assert ResponseParser.parse_response(response, tools=registry) == response
+        assert not registry.unregister_tool("stock_quote")
+
+    def test_unregistered_names_rejected(self):
+        assert ResponseParser.parse_response('{"tool": "unheard_of", "args": {}}') == (
+            '{"tool": "unheard_of", "args": {}}'
+        )
+
+    def test_agent_runs_plugin_tool(self, monkeypatch):
+        agent = Agent(use_fake_llm=True)
+        agent.tool_registry.register_tool(make_tool("echo_plugin", "Echo"))
+        agent.llm_service.call_llm = (
+            lambda q, timeout=None: '{"tool": "echo_plugin", "args": {"text": "hi"}}'
+        )
+        assert agent.answer("echo hi") == "echo_plugin:hi"
+
+
+class FakeEntryPoint:
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+
+    def load(self):
+        if isinstance(self.target, Exception):
+            raise self.target
+        return self.target
+
+
+class TestPlugins:
+    def test_load_plugins(self, monkeypatch, caplog):
+        tool_class = type(make_tool("plugin_a", "Plugin A"))
+        instance = make_tool("plugin_b", "Plugin B")
+        entry_points = {
+            "agent.tools": [
+                FakeEntryPoint("a", tool_class),
+                FakeEntryPoint("b", instance),
+                FakeEntryPoint("broken", ImportError("no module")),
+                FakeEntryPoint("wrong", dict),
+            ]
+        }
+        monkeypatch.setattr(
+            registry_module, "entry_points", lambda group: entry_points.get(group, [])
+        )
+        registry = ToolRegistry()
+        with caplog.at_level("WARNING"):
+            assert registry.load_plugins() == ["plugin_a", "plugin_b"]
+        assert registry.get_tool("plugin_b") is instance
+        assert any("broken" in m for m in caplog.messages)
+        assert any("wrong" in m for m in caplog.messages)
+
+        agent_plugins = Agent(use_fake_llm=True, plugins=True).tool_registry
+        assert agent_plugins.get_tool("plugin_a") is not None
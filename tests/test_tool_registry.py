@@ -1,5 +1,30 @@
+import json
+import threading
+import time
+
+import pytest
+
+from agent.bulkhead import BulkheadConfig
 from agent.tool_registry import ToolRegistry
+from agent.tools.args import ArgSpec
+from agent.tools.base import BaseTool
 from agent.tools.calculator import CalculatorTool
+from agent.tools.weather import WeatherTool
+
+
+class NamedEchoTool(BaseTool):
+    description = "Echo the input"
+    args_schema = (ArgSpec(name="text"),)
+
+    def __init__(self, name):
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    def run(self, args):
+        return args["text"]
 
 
 class TestToolRegistry:
@@ -34,3 +59,117 @@ class TestToolRegistry:
 
         retrieved_tool = self.registry.get_tool("mock")
         assert retrieved_tool is mock_tool
+
+    def test_execute_runs_tool(self):
+        tool = self.registry.get_tool("calc")
+        result = self.registry.execute(tool, {"expr": "2 + 3"})
+        assert result.success
+        assert result.result == 5.0
+        assert self.registry.bulkhead_stats()["calc"]["calls"] == 1
+
+    def test_slow_tool_does_not_starve_others(self):
+        release = threading.Event()
+        weather = self.registry.get_tool("weather")
+        weather._get_temperature = lambda city: release.wait() and 18.0
+        self.registry.configure_bulkhead(
+            "weather",
+            BulkheadConfig(max_concurrent=1, max_queue=0, initial_timeout=0.05),
+        )
+        try:
+            timed_out = self.registry.execute(weather, {"city": "paris"})
+            assert not timed_out.success
+            assert "timed out" in timed_out.error
+
+            rejected = self.registry.execute(weather, {"city": "paris"})
+            assert not rejected.success
+            assert "overloaded" in rejected.error
+
+            calc = self.registry.execute(
+                self.registry.get_tool("calc"), {"expr": "1+1"}
+            )
+            assert calc.success
+        finally:
+            release.set()
+
+    def test_catalog_json_lists_registered_tools(self):
+        catalog = json.loads(self.registry.catalog_json())
+        assert [entry["name"] for entry in catalog] == [
+            "calc",
+            "weather",
+            "kb",
+            "translator",
+        ]
+        assert self.registry.catalog_json() is self.registry.catalog_json()
+
+    def test_catalog_refreshes_on_register(self):
+        before = self.registry.catalog_json()
+
+        class EchoTool(BaseTool):
+            description = "Echo the input"
+            args_schema = (ArgSpec(name="text"),)
+
+            @property
+            def name(self):
+                return "echo"
+
+            def run(self, args):
+                return args["text"]
+
+        self.registry.register_tool(EchoTool())
+        assert "echo" in self.registry.catalog_json()
+        assert self.registry.catalog_json() != before
+
+
+class TestConcurrentRegistry:
+    def setup_method(self):
+        self.registry = ToolRegistry()
+
+    def test_list_tools_is_read_only_and_not_copied(self):
+        tools = self.registry.list_tools()
+        assert tools is self.registry.list_tools()
+        with pytest.raises(TypeError):
+            tools["calc"] = None
+
+    def test_registration_publishes_a_new_view(self):
+        before = self.registry.list_tools()
+        replacement = CalculatorTool()
+        self.registry.register_tool(replacement)
+        # Readers holding the old view keep a consistent picture
+        assert before["calc"] is not replacement
+        assert self.registry.list_tools()["calc"] is replacement
+
+    def test_register_many_tools(self):
+        tools = [NamedEchoTool(f"echo_{i}") for i in range(2000)]
+        start = time.perf_counter()
+        self.registry.register_tools(tools)
+        assert time.perf_counter() - start < 5.0
+        assert len(self.registry.list_tools()) == 2004
+        result = self.registry.execute(tools[7], {"text": "hi"})
+        assert result.result == "hi"
+        # Bulkheads limit each tool but share one pool of threads
+        pools = {b._executor for b in self.registry._state.bulkheads.values()}
+        assert len(pools) == 1
+
+    def test_hot_replace_under_traffic(self):
+        stop = threading.Event()
+        failures = []
+
+        def reader():
+            while not stop.is_set():
+                tool = self.registry.get_tool("weather")
+                result = self.registry.execute(tool, {"city": "Paris"})
+                if not result.success:
+                    failures.append(result.error)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(50):
+                self.registry.register_tool(WeatherTool())
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        assert failures == []
+        assert json.loads(self.registry.catalog_json())[1]["name"] == "weather"
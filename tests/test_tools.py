@@ -1,6 +1,12 @@
+import json
+
 import pytest
+from pydantic import ValidationError
 
 from agent.schemas import ToolResult
+from agent.tool_registry import ToolRegistry
+from agent.tools.args import ArgSpec, compile_args_schema
+from agent.tools.base import BaseTool
 from agent.tools.calculator import CalculatorTool
 from agent.tools.knowledge_base import KnowledgeBaseTool
 from agent.tools.translator import TranslatorTool
@@ -35,9 +41,10 @@ class TestCalculatorTool:
         result = self.tool.execute({"expr": "__import__('os').system('ls')"})
         assert not result.success
 
-    def test_calculate_percentage_invalid_expression(self):
-        with pytest.raises(ValueError, match="Invalid percentage expression"):
-            self.tool._calculate_percentage("abc% of xyz")
+    def test_invalid_percentage_expression(self):
+        result = self.tool.execute({"expr": "abc% of xyz"})
+        assert not result.success
+        assert result.error == "Calculation error: Unknown word 'abc'"
 
 
 class TestWeatherTool:
@@ -101,6 +108,51 @@ class TestKnowledgeBaseTool:
         result = self.tool.execute({"q": "Unknown Person"})
         assert result.success
 
+    def test_typo_tolerant_lookup(self):
+        for query in ("Ada Lovelase", "lovelace, ada", "alan turin g", "turnig"):
+            result = self.tool.execute({"q": query})
+            assert "mathematician" in result.result
+
+        match = self.tool.search("ada lovelase")
+        assert match.name == "ada lovelace"
+        assert 0.75 <= match.score < 1.0
+        assert self.tool.search("turing").score == 1.0
+        assert self.tool.search("grace hopper") is None
+
+    def test_short_words_match_exactly(self):
+        for query in ("adam", "ida", "alab"):
+            assert self.tool.search(query) is None
+            assert self.tool.execute({"q": query}).result == "No entry found."
+        assert self.tool.search("ada").score == 1.0
+
+    def test_result_carries_score(self):
+        result = self.tool.execute({"q": "Ada Lovelase"})
+        assert 0.75 <= result.score < 1.0
+        assert self.tool.execute({"q": "Ada Lovelace"}).score == 1.0
+        assert self.tool.execute({"q": "Unknown Person"}).score is None
+
+    def test_aliases(self, tmp_path):
+        kb_path = tmp_path / "kb.json"
+        kb_path.write_text(
+            json.dumps(
+                {
+                    "entries": [
+                        {"name": "Ada Lovelace", "summary": "first"},
+                        {
+                            "name": "Grace Hopper",
+                            "aliases": ["Amazing Grace"],
+                            "summary": "admiral",
+                        },
+                    ]
+                }
+            )
+        )
+        tool = KnowledgeBaseTool(str(kb_path))
+        assert tool.execute({"q": "amazing grace"}).result == "admiral"
+        assert tool.search("amazing grase").name == "grace hopper"
+        # Names still win over aliases for a plain substring
+        assert tool.execute({"q": "a"}).result == "first"
+
     def test_missing_args(self):
         result = self.tool.execute({})
         assert not result.success
@@ -169,3 +221,82 @@ class TestTranslatorTool:
             "Translation error: Simulated translation failure"
         )
         assert result.tool_used == tool.name
+
+
+class LegacyTool(BaseTool):
+    """A tool written against the original interface, without ``run``"""
+
+    @property
+    def name(self) -> str:
+        return "legacy"
+
+    def execute(self, args):
+        if not self.validate_args(args):
+            return ToolResult(
+                success=False, result="", error="bad args", tool_used=self.name
+            )
+        return ToolResult(success=True, result=args["x"] * 2, tool_used=self.name)
+
+    def validate_args(self, args):
+        return isinstance(args.get("x"), int)
+
+
+class TestLegacyTool:
+    def test_execute_override_still_works(self):
+        registry = ToolRegistry()
+        registry.register_tool(LegacyTool())
+        tool = registry.get_tool("legacy")
+        assert registry.execute(tool, {"x": 21}).result == 42
+        assert registry.execute(tool, {"x": "a"}).error == "bad args"
+
+    def test_missing_run_reported_on_call(self):
+        class NoRun(BaseTool):
+            name = "norun"
+
+        result = NoRun().execute({})
+        assert not result.success
+        assert "must implement run()" in result.error
+
+
+class TestArgSchema:
+    def test_compiled_validator_coerces(self):
+        validate = compile_args_schema(
+            (
+                ArgSpec(name="city", lower=True, strip=True),
+                ArgSpec(name="days", type="integer", required=False, default=1),
+                ArgSpec(name="scale", type="number", required=False),
+            )
+        )
+        values, error = validate({"city": "  PARIS ", "scale": 2, "extra": "x"})
+        assert error is None
+        assert values == {"city": "paris", "days": 1, "scale": 2.0}
+        assert isinstance(values["scale"], float)
+
+    def test_compiled_validator_rejects(self):
+        validate = compile_args_schema((ArgSpec(name="n", type="integer"),))
+        for bad in ({}, {"n": "1"}, {"n": True}, None, ["n"]):
+            values, error = validate(bad)
+            assert values is None
+            assert error == "Invalid arguments. Expected 'n' field with integer value."
+
+    def test_transforms_only_for_strings(self):
+        with pytest.raises(ValidationError):
+            ArgSpec(name="n", type="number", lower=True)
+
+    def test_tools_share_compiled_validator(self):
+        assert WeatherTool().validator is WeatherTool().validator
+
+    def test_error_messages_match_previous_wording(self):
+        assert TranslatorTool().execute({}).error == (
+            "Invalid arguments. Expected 'text' and 'target_language' fields."
+        )
+        assert CalculatorTool().execute({"expr": 1}).error == (
+            "Invalid arguments. Expected 'expr' field with string value."
+        )
+
+    def test_catalog_entry(self):
+        entry = TranslatorTool().catalog_entry()
+        assert entry["name"] == "translator"
+        assert entry["description"]
+        assert entry["args"]["required"] == ["text", "target_language"]
+        assert entry["args"]["properties"]["text"]["type"] == "string"
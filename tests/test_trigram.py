@@ -0,0 +1,87 @@
+import random
+import string
+
+from agent.trigram import (
+    TrigramIndex,
+    edit_distance,
+    normalize,
+    similarity,
+    trigrams,
+)
+
+
+def _naive_distance(a, b):
+    d = [
+        [i + j if not i * j else 0 for j in range(len(b) + 1)]
+        for i in range(len(a) + 1)
+    ]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(
+                d[i - 1][j] + 1,
+                d[i][j - 1] + 1,
+                d[i - 1][j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+class TestEditDistance:
+    def test_matches_full_computation_within_limit(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 8)))
+            b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 8)))
+            limit = rng.randint(0, 4)
+            expected = _naive_distance(a, b)
+            assert edit_distance(a, b, limit) == min(expected, limit + 1)
+
+    def test_examples(self):
+        assert edit_distance("lovelace", "lovelase", 2) == 1
+        assert edit_distance("kitten", "sitting", 3) == 3
+        assert edit_distance("kitten", "sitting", 2) == 3
+        assert edit_distance("turnig", "turing", 1) == 1
+
+
+class TestTrigramIndex:
+    def setup_method(self):
+        self.names = ["ada lovelace", "alan turing", "grace hopper"]
+        self.index = TrigramIndex.build(self.names)
+
+    def test_trigrams(self):
+        assert trigrams("ab") == [" ab", "ab "]
+        assert trigrams("ab", pad=False) == []
+        assert normalize("  Lovelace,  ADA! ") == "lovelace ada"
+
+    def test_containing(self):
+        assert self.index.containing("turing") == [1]
+        assert self.index.containing("xyz") == []
+        assert self.index.containing("a") is None
+        # Shared trigrams are a filter; the caller checks the substring
+        assert 0 in self.index.containing("ace")
+
+    def test_candidates_ranked_by_overlap(self):
+        ranked = self.index.candidates("ada lovelase", 2)
+        assert ranked[0][0] == 0
+        assert len(ranked) <= 2
+
+    def test_similarity(self):
+        assert similarity("lovelace ada", "ada lovelace", 0.25) == 1.0
+        assert similarity("alan turin g", "alan turing", 0.25) == 1.0
+        assert similarity("lovelase", "ada lovelace", 0.25) == 0.875
+        assert similarity("grace", "ada lovelace", 0.25) == 0.0
+        assert similarity("adam", "ada lovelace", 0.25) == 0.0
+        assert similarity("ida", "ada lovelace", 0.25) == 0.0
+        assert similarity("adam", "ada lovelace", 0.25, exact_length=0) == 0.75
+
+    def test_lookup_cost_independent_of_unrelated_entries(self):
+        rng = random.Random(1)
+        names = [
+            "".join(rng.choice(string.ascii_lowercase[:10]) for _ in range(10))
+            for _ in range(5000)
+        ]
+        index = TrigramIndex.build(names + ["ada lovelace"])
+        # Letters k-z never occur in the filler names
+        assert index.candidates("lovelace", 5)[0][0] == 5000
+        assert index.containing("lovel") == [5000]
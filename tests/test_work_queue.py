@@ -0,0 +1,256 @@
+import json
+import threading
+
+import pytest
+
+import main
+from agent.agent import Agent, Answer
+from agent.tools.calculator import CalculatorTool
+from agent.work_queue import DEAD, DONE, PENDING, QueueConfig, SQLiteWorkQueue
+from agent.worker import Worker, WorkerConfig
+
+CALC = '{"tool": "calc", "args": {"expr": "2+2"}}'
+
+
+class TestSQLiteWorkQueue:
+    @pytest.fixture(autouse=True)
+    def setup(self, clock):
+        clock.now = 1000.0
+        self.clock = clock
+        self.queue = None
+
+    def teardown_method(self):
+        if self.queue is not None:
+            self.queue.close()
+
+    def make_queue(self, tmp_path, **kwargs):
+        config = QueueConfig(visibility_timeout=30.0, retry_delay=1.0, **kwargs)
+        self.queue = SQLiteWorkQueue(str(tmp_path / "q.db"), config, clock=self.clock)
+        return self.queue
+
+    def test_lease_and_ack(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        ids = queue.put_many({"question": f"q{i}"} for i in range(3))
+        assert ids == [1, 2, 3]
+
+        leases = queue.lease(2)
+        assert [lease.payload["question"] for lease in leases] == ["q0", "q1"]
+        assert all(lease.attempts == 1 for lease in leases)
+        assert leases[0].expires == self.clock.now + 30.0
+        # Leased items are hidden from other workers
+        assert [lease.id for lease in queue.lease(5)] == [3]
+        assert queue.lease(5) == []
+
+        assert queue.ack(leases[0], {"answer": "a"})
+        assert not queue.ack(leases[0], {"answer": "again"})
+        (item,) = queue.finished()
+        assert (item.id, item.state, item.result) == (1, DONE, {"answer": "a"})
+        stats = queue.stats()
+        assert (stats[PENDING], stats[DONE], stats["in_flight"]) == (2, 1, 2)
+
+    def test_expired_lease_is_redelivered(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        queue.put({"question": "q"})
+        first = queue.lease(1)[0]
+        self.clock.now += 31.0
+        second = queue.lease(1)[0]
+        assert second.id == first.id
+        assert second.attempts == 2
+        # The first worker lost its lease and cannot settle the item
+        assert not queue.ack(first, "late")
+        assert not queue.nack(first, "late")
+        assert queue.ack(second, "ok")
+
+    def test_extend(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        queue.put({"question": "q"})
+        lease = queue.lease(1)[0]
+        self.clock.now += 20.0
+        lease = queue.extend(lease, 30.0)
+        self.clock.now += 20.0
+        assert queue.lease(1) == []
+        assert queue.ack(lease)
+
+    def test_retry_with_backoff_then_dead_letter(self, tmp_path):
+        queue = self.make_queue(tmp_path, max_attempts=3)
+        queue.put({"question": "q"})
+
+        assert queue.nack(queue.lease(1)[0], "boom 1")
+        assert queue.lease(1) == []  # backoff of 1s
+        self.clock.now += 1.0
+        assert queue.nack(queue.lease(1)[0], "boom 2")
+        self.clock.now += 1.0
+        assert queue.lease(1) == []  # backoff of 2s
+        self.clock.now += 1.0
+        lease = queue.lease(1)[0]
+        assert lease.attempts == 3
+        assert queue.nack(lease, "boom 3")
+
+        (dead,) = queue.finished(DEAD)
+        assert (dead.attempts, dead.error) == (3, "boom 3")
+        assert queue.stats()[DEAD] == 1
+
+        assert queue.requeue_dead() == 1
+        assert queue.lease(1)[0].attempts == 1
+
+    def test_abandoned_item_dead_lettered(self, tmp_path):
+        queue = self.make_queue(tmp_path, max_attempts=1)
+        queue.put({"question": "q"})
+        queue.lease(1)
+        self.clock.now += 31.0
+        assert queue.lease(1) == []
+        (dead,) = queue.finished(DEAD)
+        assert dead.error == "visibility timeout expired"
+
+    def test_nack_without_retry(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        queue.put({"question": 1})
+        assert queue.nack(queue.lease(1)[0], "bad payload", retry=False)
+        assert queue.stats()[DEAD] == 1
+
+    def test_durable_across_instances(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        queue.put({"question": "q"})
+        queue.close()
+        reopened = SQLiteWorkQueue(str(tmp_path / "q.db"), clock=self.clock)
+        assert reopened.lease(1)[0].payload == {"question": "q"}
+        reopened.close()
+
+    def test_concurrent_leases_are_disjoint(self, tmp_path):
+        queue = self.make_queue(tmp_path)
+        queue.put_many({"question": str(i)} for i in range(200))
+        leased = [[] for _ in range(4)]
+
+        def drain(slot):
+            while True:
+                leases = queue.lease(7)
+                if not leases:
+                    return
+                leased[slot].extend(lease.id for lease in leases)
+
+        threads = [threading.Thread(target=drain, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = [id_ for ids in leased for id_ in ids]
+        assert sorted(ids) == list(range(1, 201))
+
+
+class FakeAgent:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.timeouts = []
+
+    def respond(self, question, session_id=None, deadline=None, timeout=None):
+        self.timeouts.append(timeout)
+        if question in self.fail:
+            raise RuntimeError("tool exploded")
+        if question == "slow":
+            return Answer("Request timed out.", "timeout")
+        return Answer(question.upper(), "ok")
+
+
+class ExplodingCalculator(CalculatorTool):
+    def run(self, args):
+        raise RuntimeError("exploded")
+
+
+class TestWorker:
+    def setup_method(self):
+        self.queue = None
+
+    def teardown_method(self):
+        if self.queue is not None:
+            self.queue.close()
+
+    def run(self, tmp_path, agent, payloads):
+        self.queue = SQLiteWorkQueue(
+            str(tmp_path / "q.db"), QueueConfig(retry_delay=0.0, max_attempts=2)
+        )
+        self.queue.put_many(payloads)
+        config = WorkerConfig(
+            batch_size=3, concurrency=4, poll_interval=0.01, exit_when_empty=True
+        )
+        return Worker(agent, self.queue, config).run()
+
+    def test_drains_queue(self, tmp_path):
+        agent = FakeAgent()
+        stats = self.run(tmp_path, agent, [{"question": f"q{i}"} for i in range(10)])
+        assert stats == {"leased": 10, "acked": 10, "failed": 0, "lost": 0}
+        results = {
+            item.payload["question"]: item.result for item in self.queue.finished()
+        }
+        assert results["q3"] == {"answer": "Q3"}
+        # Answers are bounded by the lease
+        assert all(0 < t < 60.0 for t in agent.timeouts)
+
+    def test_failures_retried_then_dead_lettered(self, tmp_path):
+        agent = FakeAgent(fail={"bad"})
+        payloads = [{"question": "ok"}, {"question": "bad"}, {"nope": 1}]
+        stats = self.run(tmp_path, agent, payloads)
+        assert stats["acked"] == 1
+        assert stats["failed"] == 3  # "bad" twice, the invalid payload once
+        dead = {item.id: item for item in self.queue.finished(DEAD)}
+        assert dead[2].attempts == 2
+        assert dead[2].error == "RuntimeError: tool exploded"
+        assert "question" in dead[3].error
+
+    def test_failed_answers_retried(self, tmp_path):
+        stats = self.run(tmp_path, FakeAgent(), [{"question": "slow"}])
+        assert (stats["acked"], stats["failed"]) == (0, 2)
+        (dead,) = self.queue.finished(DEAD)
+        assert dead.error == "timeout: Request timed out."
+
+    def test_bool_timeout_rejected(self, tmp_path):
+        stats = self.run(tmp_path, FakeAgent(), [{"question": "q", "timeout": True}])
+        assert (stats["acked"], stats["failed"]) == (0, 1)
+        (dead,) = self.queue.finished(DEAD)
+        assert dead.attempts == 1
+        assert "timeout" in dead.error
+
+    def test_payload_timeout_respected(self, tmp_path):
+        agent = FakeAgent()
+        self.run(tmp_path, agent, [{"question": "q", "timeout": 2.5}])
+        assert agent.timeouts == [2.5]
+
+    def test_with_real_agent(self, tmp_path):
+        agent = Agent(use_fake_llm=True, seed=0)
+        stats = self.run(tmp_path, agent, [{"question": "What is 2 + 2?"}] * 5)
+        assert stats["acked"] == 5
+
+    def test_real_agent_tool_failure_dead_lettered(self, tmp_path):
+        agent = Agent(use_fake_llm=True, seed=0)
+        agent.llm_service.call_llm = lambda prompt, timeout=None: CALC
+        agent.tool_registry.register_tool(ExplodingCalculator())
+        stats = self.run(tmp_path, agent, [{"question": "What is 2 + 2?"}] * 3)
+        assert stats == {"leased": 6, "acked": 0, "failed": 6, "lost": 0}
+        dead = self.queue.finished(DEAD)
+        assert len(dead) == 3
+        assert all(item.error.startswith("tool_error: ") for item in dead)
+        assert self.queue.finished(DONE) == []
+
+
+class TestQueueCommand:
+    def test_put_stats_results(self, tmp_path, capsys):
+        path = str(tmp_path / "q.db")
+        questions = tmp_path / "questions.txt"
+        questions.write_text('Weather in Paris\n\n{"question": "2+2", "timeout": 5}\n')
+        main.queue_command(["put", "Who is Ada Lovelace?", "--queue", path])
+        main.queue_command(["put", "--file", str(questions), "--queue", path])
+        assert "Queued 2 items" in capsys.readouterr().out
+
+        main.queue_command(["stats", "--queue", path])
+        assert json.loads(capsys.readouterr().out)[PENDING] == 3
+
+        queue = SQLiteWorkQueue(path)
+        lease = queue.lease(1)[0]
+        queue.ack(lease, {"answer": "mathematician"})
+        queue.close()
+        main.queue_command(["results", "--queue", path])
+        (line,) = capsys.readouterr().out.splitlines()
+        assert json.loads(line)["result"] == {"answer": "mathematician"}
+
+    def test_config_validation(self):
+        with pytest.raises(ValueError):
+            QueueConfig(max_attempts=0)